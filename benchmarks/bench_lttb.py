@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  downsampling benchmark, the pure-Python dict LTTB that /apm/log used to run
+            against the numpy LTTB / MinMaxLTTB on timestamp arrays.
+
+            python benchmarks/bench_lttb.py [target_points]
+"""
+import sys
+import time
+import numpy as np
+from magnax.public.common import downsample_indices, lttb_indices
+
+
+def downsample_lttb_reference(data, target_points):
+    """the previous magnax.public.common.downsample_lttb, kept verbatim for comparison"""
+    n = len(data)
+    if n <= target_points or target_points < 3:
+        return data
+    sampled = [data[0]]
+    bucket_size = (n - 2) / (target_points - 2)
+    a = 0
+    for i in range(target_points - 2):
+        bucket_start = int((i + 1) * bucket_size) + 1
+        bucket_end = int((i + 2) * bucket_size) + 1
+        bucket_end = min(bucket_end, n - 1)
+        next_start = int((i + 2) * bucket_size) + 1
+        next_end = int((i + 3) * bucket_size) + 1
+        next_end = min(next_end, n)
+        if next_end > next_start:
+            avg_x = sum(j for j in range(next_start, next_end)) / (next_end - next_start)
+            avg_y = sum(data[j]['y'] for j in range(next_start, next_end)) / (next_end - next_start)
+        else:
+            avg_x = next_start
+            avg_y = data[min(next_start, n - 1)]['y']
+        max_area = -1
+        max_idx = bucket_start
+        for j in range(bucket_start, bucket_end):
+            area = abs(
+                (a - avg_x) * (data[j]['y'] - data[a]['y']) -
+                (a - j) * (avg_y - data[a]['y'])
+            )
+            if area > max_area:
+                max_area = area
+                max_idx = j
+        sampled.append(data[max_idx])
+        a = max_idx
+    sampled.append(data[-1])
+    return sampled
+
+
+def make_series(n, seed=0):
+    """a cpu-like series sampled about once a second with jitter, noise and a few spikes"""
+    rng = np.random.default_rng(seed)
+    times = 1.7e9 + np.cumsum(rng.uniform(0.9, 1.1, n))
+    values = 30 + 10 * np.sin(np.arange(n) / 500) + rng.normal(0, 3, n)
+    values[rng.integers(0, n, max(n // 10000, 1))] += 50
+    return times, np.clip(values, 0, None).astype(np.float32)
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(target_points=1000):
+    print(f'target_points={target_points}')
+    print(f'{"points":>9} {"reference":>11} {"lttb":>9} {"minmax":>9} {"speedup":>8} {"peak kept":>10} endpoints')
+    for n in (10_000, 100_000, 1_000_000):
+        times, values = make_series(n)
+        data = [{'x': t, 'y': v} for t, v in zip(times.tolist(), values.tolist())]
+        reference_time, reference = best_of(lambda: downsample_lttb_reference(data, target_points), 1)
+        lttb_time, lttb = best_of(lambda: lttb_indices(times, values, target_points), 3)
+        minmax_time, picked = best_of(lambda: downsample_indices(times, values, target_points), 3)
+        endpoints = (reference[0]['x'], reference[-1]['x']) == (times[picked[0]], times[picked[-1]]) and \
+            lttb[0] == picked[0] and lttb[-1] == picked[-1]
+        peak = values.max() == values[picked].max()
+        print(f'{n:>9} {reference_time * 1000:>9.1f}ms {lttb_time * 1000:>7.1f}ms {minmax_time * 1000:>7.1f}ms '
+              f'{reference_time / minmax_time:>7.0f}x {str(peak):>10} {"same" if endpoints else "DIFFERENT"}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
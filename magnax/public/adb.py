@@ -7,10 +7,18 @@
 @Desc    :  adb line.
 @Update  :  2025/7/14 by SoperRookie
 """
+import atexit
 import os
 import platform
+import queue
+import shlex
 import stat
 import subprocess
+import threading
+import time
+import uuid
+from loguru import logger
+from magnax.public.adb_client import AdbClient, AdbServerError, SHELL_STDIN, SHELL_STDOUT, SHELL_EXIT
 
 STATICPATH = os.path.dirname(os.path.realpath(__file__))
 DEFAULT_ADB_PATH = {
@@ -70,17 +78,326 @@ def builtin_adb_path():
     return adb_path
 
 
+def to_device_cmd(cmd):
+    """
+    Convert a host command line into the text the device shell should run.
+    `adb shell <cmd>` was historically spawned through the host shell, which
+    strips one level of quoting/escaping and runs `| grep/findstr` on the host.
+    Sessions hand the command straight to the device shell, so replay the host
+    shell's word splitting and use the device's grep instead of findstr.
+    """
+    try:
+        words = shlex.split(cmd)
+    except ValueError:
+        return cmd
+    words = [('grep' if w == 'findstr' else '|grep' if w == '|findstr' else w) for w in words]
+    return ' '.join(words)
+
+
+class SessionUnavailable(Exception):
+    """The command never reached the device, running it another way is safe"""
+
+
+class ShellSession(object):
+    """A long-lived interactive `adb shell` that runs one command at a time"""
+
+    def __init__(self, adb_path, deviceId):
+        self.deviceId = deviceId
+        self._proc = subprocess.Popen([adb_path, '-s', deviceId, 'shell'], stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    def _read_stdout(self):
+        for line in iter(self._proc.stdout.readline, b''):
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _write(self, data):
+        self._proc.stdin.write(data)
+        self._proc.stdin.flush()
+
+    def alive(self):
+        return self._proc.poll() is None
+
+    def execute(self, cmd, timeout):
+        """Run cmd on the device and return its stdout, delimited by a unique sentinel line"""
+        sentinel = '__MAGNAX_{}__'.format(uuid.uuid4().hex)
+        # stdin/stderr are detached so a command can neither swallow the next one nor
+        # leak error text into the result (the one-shot path discards stderr too)
+        script = '{{ {} ; }} </dev/null 2>/dev/null; echo; echo {}\n'.format(to_device_cmd(cmd), sentinel)
+        try:
+            self._write(script.encode('utf-8'))
+        except Exception as e:
+            raise SessionUnavailable('adb shell session write failed: {}'.format(e))
+        output = []
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError('adb shell session timeout: {}'.format(cmd))
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError('adb shell session timeout: {}'.format(cmd))
+            if line is None:
+                raise ConnectionError('adb shell session closed: {}'.format(self.deviceId))
+            text = line.decode('utf-8', errors='replace')
+            if text.rstrip('\r\n') == sentinel:
+                break
+            output.append(text)
+        return ''.join(output).strip()
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self._proc.terminate()
+            self._proc.wait(timeout=2)
+        except Exception:
+            try:
+                self._proc.kill()
+            except Exception:
+                pass
+
+
+class SocketShellSession(ShellSession):
+    """ShellSession over a shell v2 stream of the adb server, no adb process at all"""
+
+    def __init__(self, client, deviceId):
+        self.deviceId = deviceId
+        self._conn = client.open_shell(deviceId)
+        self._conn.settimeout(None)
+        self._closed = False
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    def _read_stdout(self):
+        pending = b''
+        try:
+            while True:
+                id, data = self._conn.read_packet()
+                if id == SHELL_EXIT:
+                    break
+                if id != SHELL_STDOUT:
+                    continue
+                lines = (pending + data).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    self._lines.put(line + b'\n')
+        except (OSError, AdbServerError):
+            pass
+        self._closed = True
+        self._lines.put(None)
+
+    def _write(self, data):
+        self._conn.write_packet(SHELL_STDIN, data)
+
+    def alive(self):
+        return not self._closed
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+
+class ShellStream(object):
+    """A long-running device command whose stdout is consumed line by line"""
+
+    def __init__(self, adb_path, client, deviceId, cmd):
+        self.deviceId = deviceId
+        self._conn = None
+        self._proc = None
+        try:
+            self._conn = client.open_shell(deviceId, cmd)
+            self._conn.settimeout(None)
+        except (OSError, AdbServerError) as e:
+            logger.debug('[ADB] adb server stream failed, use adb process: {}'.format(e))
+            self._proc = subprocess.Popen([adb_path, '-s', deviceId, 'shell', cmd],
+                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _read_chunks(self):
+        if self._proc is not None:
+            yield from iter(self._proc.stdout.readline, b'')
+            return
+        try:
+            while True:
+                id, data = self._conn.read_packet()
+                if id == SHELL_EXIT:
+                    break
+                if id == SHELL_STDOUT:
+                    yield data
+        except (OSError, AdbServerError):
+            pass
+
+    def lines(self):
+        """Yield decoded stdout lines until the command exits or the stream is closed"""
+        pending = b''
+        for chunk in self._read_chunks():
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode('utf-8', errors='replace').rstrip('\r')
+        if pending:
+            yield pending.decode('utf-8', errors='replace').rstrip('\r')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+
+
+class ShellSessionPool(object):
+    """Per-device pool of ShellSession, so polling does not fork one adb process per command"""
+
+    def __init__(self, factory, size=3, timeout=15, wait=1):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.wait = wait
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = dict()
+        self._opened = dict()
+        self._cond = threading.Condition(threading.Lock())
+
+    def _check_fork(self):
+        # sessions (and their reader threads) belong to the process that opened them;
+        # a forked collector must not write into its parent's pipes
+        if self._pid != os.getpid():
+            self._reset()
+
+    def acquire(self, deviceId):
+        self._check_fork()
+        deadline = time.time() + self.wait
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(deviceId, [])
+                while idle:
+                    session = idle.pop()
+                    if session.alive():
+                        return session
+                    self._opened[deviceId] -= 1
+                if self._opened.get(deviceId, 0) < self.size:
+                    self._opened[deviceId] = self._opened.get(deviceId, 0) + 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        try:
+            return self.factory(deviceId)
+        except Exception as e:
+            self._discard(deviceId)
+            raise SessionUnavailable('adb shell session open failed: {}'.format(e))
+
+    def release(self, session):
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._idle.setdefault(session.deviceId, []).append(session)
+            self._cond.notify()
+
+    def _discard(self, deviceId):
+        with self._cond:
+            self._opened[deviceId] = max(self._opened.get(deviceId, 1) - 1, 0)
+            self._cond.notify()
+
+    def run(self, deviceId, cmd):
+        """Run cmd through a pooled session, None means no session was available.
+        SessionUnavailable means cmd was not sent; any other error means it may have run on the device"""
+        session = self.acquire(deviceId)
+        if session is None:
+            return None
+        try:
+            result = session.execute(cmd, self.timeout)
+        except Exception:
+            # a failed or timed out session is out of sync with its sentinel, drop it
+            session.close()
+            self._discard(deviceId)
+            raise
+        self.release(session)
+        return result
+
+    def close(self, deviceId=None):
+        """Close the sessions of one device, or of every device"""
+        if self._pid != os.getpid():
+            self._reset()
+            return
+        with self._cond:
+            deviceIds = [deviceId] if deviceId else list(self._idle.keys())
+            sessions = []
+            for id in deviceIds:
+                sessions.extend(self._idle.pop(id, []))
+                self._opened.pop(id, None)
+        for session in sessions:
+            session.close()
+
+
 class ADB(object):
 
-    def __init__(self):
+    def __init__(self, use_session=True):
         self.adb_path = builtin_adb_path()
+        self.client = AdbClient()
+        self.sessions = ShellSessionPool(self._open_session) if use_session else None
+        atexit.register(self.close)
+
+    def _open_session(self, deviceId):
+        """Prefer a socket to the adb server, fall back to an `adb shell` process"""
+        try:
+            return SocketShellSession(self.client, deviceId)
+        except (OSError, AdbServerError) as e:
+            logger.debug('[ADB] adb server shell unavailable, use adb process: {}'.format(e))
+            return ShellSession(self.adb_path, deviceId)
 
     def shell(self, cmd, deviceId):
+        if self.sessions is not None:
+            try:
+                result = self.sessions.run(deviceId, cmd)
+                if result is not None:
+                    return result
+            except SessionUnavailable as e:
+                logger.debug('[ADB] shell session failed, fallback to one-shot shell: {}'.format(e))
+            except Exception as e:
+                # the command may already have run on the device, running a write or `am` command
+                # twice is worse than no result; callers get the empty output of a failed command
+                logger.warning('[ADB] shell session failed mid-command, not retried: {}'.format(e))
+                return ''
+        return self.shell_once(cmd, deviceId)
+
+    def shell_once(self, cmd, deviceId):
+        try:
+            stdout, _, _ = self.client.shell(deviceId, to_device_cmd(cmd))
+            return stdout.decode('utf-8', errors='replace').strip()
+        except (OSError, AdbServerError) as e:
+            logger.debug('[ADB] adb server shell failed, use adb process: {}'.format(e))
         run_cmd = f'{self.adb_path} -s {deviceId} shell {cmd}'
         result = subprocess.Popen(run_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()[
             0].decode("utf-8").strip()
         return result
+
+    def devices(self):
+        """Return [{'serial':..., 'state':..., 'model':...}, ...] of the adb server"""
+        try:
+            return self.client.devices()
+        except (OSError, AdbServerError) as e:
+            logger.debug('[ADB] adb server devices failed, use adb process: {}'.format(e))
+        result = subprocess.Popen(f'{self.adb_path} devices -l', shell=True, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE).communicate()[0].decode('utf-8')
+        lines = [line for line in result.splitlines() if line.strip() and not line.startswith('List of devices')]
+        return AdbClient.parse_devices('\n'.join(lines))
     
+    def stream(self, cmd, deviceId):
+        """Start a long-running device command, read it with ShellStream.lines()"""
+        return ShellStream(self.adb_path, self.client, deviceId, cmd)
+
     def tcp_shell(self, deviceId, cmd):
         run_cmd = f'{self.adb_path} -s {deviceId} {cmd}'
         result = os.system(run_cmd)
@@ -89,7 +406,11 @@ class ADB(object):
     def shell_noDevice(self, cmd):
         run_cmd = f'{self.adb_path} {cmd}'
         result = os.system(run_cmd)
-        return result    
+        return result
+
+    def close(self, deviceId=None):
+        if self.sessions is not None:
+            self.sessions.close(deviceId)
 
 
 
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  adb server wire protocol client (smart socket on tcp:5037).
+            Talks to the running adb server directly instead of forking the adb binary.
+"""
+import socket
+import struct
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5037
+
+# shell protocol v2 packet ids
+SHELL_STDIN = 0
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+SHELL_CLOSE_STDIN = 4
+
+
+class AdbServerError(Exception):
+    """The adb server answered FAIL or the connection broke"""
+
+
+class AdbConnection(object):
+    """One socket to the adb server, every request is `%04x<payload>` answered by OKAY/FAIL"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        # requests and shell packets are tiny, don't let Nagle hold them back
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def settimeout(self, timeout):
+        self._sock.settimeout(timeout)
+
+    def send(self, payload):
+        data = payload.encode('utf-8')
+        self._sock.sendall('{:04x}'.format(len(data)).encode('ascii') + data)
+        status = self.read_exact(4)
+        if status == b'OKAY':
+            return
+        if status == b'FAIL':
+            raise AdbServerError(self.read_string())
+        raise AdbServerError('unexpected adb server status: {}'.format(status))
+
+    def read_exact(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                raise AdbServerError('adb server closed the connection')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def read_string(self):
+        size = int(self.read_exact(4), 16)
+        return self.read_exact(size).decode('utf-8', errors='replace')
+
+    def read_all(self):
+        chunks = []
+        while True:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def read_packet(self):
+        """Read a shell v2 packet, returns (id, data)"""
+        header = self.read_exact(5)
+        id, size = struct.unpack('<BI', header)
+        return id, self.read_exact(size) if size else b''
+
+    def write_packet(self, id, data=b''):
+        self._sock.sendall(struct.pack('<BI', id, len(data)) + data)
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class AdbClient(object):
+    """Minimal adb server client: host:devices-l, host:track-devices, host:transport and shell v2"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def connect(self):
+        return AdbConnection(self.host, self.port, self.timeout)
+
+    def available(self):
+        """Whether an adb server is listening"""
+        try:
+            self.version()
+            return True
+        except (OSError, AdbServerError):
+            return False
+
+    def version(self):
+        conn = self.connect()
+        try:
+            conn.send('host:version')
+            return int(conn.read_string(), 16)
+        finally:
+            conn.close()
+
+    def devices(self):
+        """Return [{'serial':..., 'state':..., 'model':...}, ...] from host:devices-l"""
+        conn = self.connect()
+        try:
+            conn.send('host:devices-l')
+            return self.parse_devices(conn.read_string())
+        finally:
+            conn.close()
+
+    def track_devices(self):
+        """Yield the full device list every time the adb server reports a change (blocking)"""
+        conn = self.connect()
+        conn.settimeout(None)
+        try:
+            conn.send('host:track-devices')
+            while True:
+                yield self.parse_devices(conn.read_string())
+        finally:
+            conn.close()
+
+    @staticmethod
+    def parse_devices(text):
+        devices = []
+        for line in text.splitlines():
+            toks = line.split()
+            if len(toks) < 2:
+                continue
+            device = {'serial': toks[0], 'state': toks[1]}
+            for tok in toks[2:]:
+                if ':' in tok:
+                    key, value = tok.split(':', 1)
+                    device[key] = value
+            devices.append(device)
+        return devices
+
+    def transport(self, serial):
+        """Open a connection switched to the given device"""
+        conn = self.connect()
+        try:
+            conn.send('host:transport:{}'.format(serial))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def open_shell(self, serial, cmd=''):
+        """Open a shell v2 stream, an empty cmd starts an interactive device shell"""
+        conn = self.transport(serial)
+        try:
+            conn.send('shell,v2,raw:{}'.format(cmd))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def shell(self, serial, cmd):
+        """Run cmd on the device, returns (stdout, stderr, exit_code) as bytes, bytes, int"""
+        try:
+            conn = self.open_shell(serial, cmd)
+        except AdbServerError:
+            # devices without the shell_v2 feature only speak the legacy raw stream
+            conn = self.transport(serial)
+            try:
+                conn.send('shell:{}'.format(cmd))
+                return conn.read_all(), b'', 0
+            finally:
+                conn.close()
+        stdout, stderr, exit_code = [], [], 0
+        try:
+            while True:
+                try:
+                    id, data = conn.read_packet()
+                except AdbServerError:
+                    break
+                if id == SHELL_STDOUT:
+                    stdout.append(data)
+                elif id == SHELL_STDERR:
+                    stderr.append(data)
+                elif id == SHELL_EXIT:
+                    exit_code = data[0] if data else 0
+                    break
+        finally:
+            conn.close()
+        return b''.join(stdout), b''.join(stderr), exit_code
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  on-device sampling agent.
+            A small sh loop is pushed to /data/local/tmp and streams timestamped
+            /proc/stat, /proc/<pid>/stat, net/dev and gpubusy records over one adb shell,
+            so the host no longer polls and sleeps between reads.
+"""
+import datetime
+import os
+import tempfile
+from loguru import logger
+from magnax.public.adb import adb
+from magnax.public.apm import BatchSampler, CPU, GPU, Network
+from magnax.public.common import Devices, File
+
+d = Devices()
+f = File()
+
+# A <epoch> <uptime>  once, anchors device uptime to device wall clock
+# T <uptime>          starts a record
+# P <pid stat> / S <cpu line> / N <net/dev line> / G <gpubusy>
+# E                   ends a record, X: the process is gone
+# only shell builtins inside the loop, the device forks nothing but sleep per tick
+AGENT_SCRIPT = '''#!/system/bin/sh
+pid=$1
+interval=${2:-1}
+net=${3:-wlan0}
+read up idle < /proc/uptime
+echo "A $(date +%s) $up"
+while [ -d /proc/$pid ]; do
+  read up idle < /proc/uptime
+  echo "T $up"
+  read stat < /proc/$pid/stat && echo "P $stat"
+  while read line; do
+    case $line in cpu*) echo "S $line";; esac
+  done < /proc/stat
+  while read line; do
+    case $line in $net:*) echo "N $line";; esac
+  done < /proc/$pid/net/dev
+  gpu=''
+  [ -r /sys/class/kgsl/kgsl-3d0/gpubusy ] && read gpu < /sys/class/kgsl/kgsl-3d0/gpubusy
+  echo "G $gpu"
+  echo E
+  sleep $interval
+done
+echo X
+'''
+
+
+class AndroidAgent(object):
+    """Push the sampling agent to the device and turn its record stream into metrics"""
+
+    REMOTE_PATH = '/data/local/tmp/magnax_agent.sh'
+
+    def __init__(self, pkgName, deviceId, pid=None, wifi=True, interval=1):
+        self.pkgName = pkgName
+        self.deviceId = deviceId
+        self.pid = pid
+        self.net = 'wlan0' if wifi else 'rmnet_ipa0'
+        self.interval = interval
+        self._stream = None
+        self._offset = None
+        if self.pid is None:
+            self.pid = d.getPid(pkgName=self.pkgName, deviceId=self.deviceId)[0].split(':')[0]
+
+    def push(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.sh', delete=False, newline='\n') as file:
+            file.write(AGENT_SCRIPT)
+        try:
+            adb.tcp_shell(self.deviceId, f'push "{file.name}" {self.REMOTE_PATH}')
+        finally:
+            os.remove(file.name)
+        adb.shell(cmd=f'chmod 755 {self.REMOTE_PATH}', deviceId=self.deviceId)
+
+    def start(self):
+        self.push()
+        cmd = f'sh {self.REMOTE_PATH} {self.pid} {self.interval} {self.net}'
+        self._stream = adb.stream(cmd=cmd, deviceId=self.deviceId)
+        logger.info(f'[Agent] started on {self.deviceId}, pid {self.pid}')
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def deviceTime(self, uptime):
+        """device wall clock of an uptime reading"""
+        return datetime.datetime.fromtimestamp(self._offset + uptime)
+
+    def parseFrame(self, lines):
+        """turn the lines of one record into a raw snapshot"""
+        groups = {'P': [], 'S': [], 'N': [], 'G': []}
+        for line in lines:
+            tag, _, value = line.partition(' ')
+            if tag in groups:
+                groups[tag].append(value)
+        snapshot = {}
+        try:
+            snapshot['process_cpu'] = CPU.parseProcessCpuStat('\n'.join(groups['P']), self.pid)
+            snapshot['total_cpu'], snapshot['idle_cpu'] = CPU.parseTotalCpuStat('\n'.join(groups['S']))
+        except Exception as e:
+            logger.warning(f'[Agent] cpu parse failed: {e}')
+        try:
+            snapshot['send'], snapshot['recv'] = Network.parseAndroidNet('\n'.join(groups['N']), self.net)
+        except Exception as e:
+            logger.warning(f'[Agent] network parse failed: {e}')
+        # an empty G record means the device has no kgsl node
+        gpu = GPU.parseKgslGpuBusy('\n'.join(groups['G'])) if ''.join(groups['G']).strip() else None
+        snapshot['gpu'] = gpu if gpu is not None else 0.0
+        return snapshot
+
+    def frames(self):
+        """yield (device time, snapshot) for every record the agent emits"""
+        lines, uptime = [], None
+        for line in self._stream.lines():
+            tag, _, value = line.partition(' ')
+            match(tag):
+                case 'A':
+                    epoch, up = value.split()
+                    self._offset = float(epoch) - float(up)
+                case 'T':
+                    lines, uptime = [], float(value)
+                case 'E':
+                    if uptime is not None and self._offset is not None:
+                        yield self.deviceTime(uptime), self.parseFrame(lines)
+                    uptime = None
+                case 'X':
+                    logger.error('[Agent] {} : No process found'.format(self.pkgName))
+                    break
+                case _:
+                    lines.append(line)
+
+    def samples(self, noLog=False):
+        """yield cpu/network/gpu rates between consecutive records, logged with device time"""
+        prev = None
+        for apm_time, snapshot in self.frames():
+            if prev is None:
+                prev = snapshot
+                continue
+            rates = BatchSampler.computeRates(prev, snapshot)
+            appCpuRate, sysCpuRate = rates['cpu']
+            sendNum, recNum = rates['network']
+            prev = snapshot
+            result = {'time': apm_time, 'cpu': rates['cpu'], 'network': rates['network'], 'gpu': snapshot['gpu']}
+            if noLog is False:
+                f.add_log(os.path.join(f.report_dir,'cpu_app.log'), apm_time, appCpuRate)
+                f.add_log(os.path.join(f.report_dir,'cpu_sys.log'), apm_time, sysCpuRate)
+                f.add_log(os.path.join(f.report_dir,'upflow.log'), apm_time, sendNum)
+                f.add_log(os.path.join(f.report_dir,'downflow.log'), apm_time, recNum)
+                f.add_log(os.path.join(f.report_dir,'gpu.log'), apm_time, snapshot['gpu'])
+            yield result
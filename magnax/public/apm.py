@@ -3,7 +3,9 @@ import re
 import time
 import os
 import json
+import shlex
 import sys
+import threading
 from loguru import logger
 from typing import Optional
 
@@ -21,9 +23,12 @@ except ImportError:
     RemoteServiceDiscoveryService = None
     logger.warning("pymobiledevice3 not available, iOS features will be limited")
 import multiprocessing
-from magnax.public.ios_perf_adapter import PyiOSDeviceAdapter
+import numpy as np
+from magnax.public.ios_perf_adapter import PyiOSDeviceAdapter, adapters
 from magnax.public.adb import adb
 from magnax.public.common import Devices, File, Method, Platform, Scrcpy
+from magnax.public.device_tracker import tracker
+from magnax.public.store import configure
 from magnax.public.android_fps import FPSMonitor, TimeUtils
 
 d = Devices()
@@ -72,132 +77,230 @@ class Target:
     GPU = 'gpu'
     DISK = 'disk'
 
+class JiffiesCache(object):
+    """
+    Previous /proc jiffies snapshot per (consumer, deviceId, pid, kind), so a rate is one read
+    instead of read-sleep-read. Every consumer keeps its own baseline, a rate always spans the
+    time since that consumer's previous sample; baselines of dead pids or idle consumers are evicted.
+    """
+
+    def __init__(self, ttl=120):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def rate(self, key, snapshot, compute):
+        """
+        compute(prev, snapshot) against the cached snapshot and keep snapshot as the next baseline.
+        The first call only seeds the baseline and returns None; if compute returns None
+        (no jiffies elapsed yet) the baseline is kept and the last rate is returned.
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                # the app restarted under a new pid, the old pid's baseline is dead
+                consumer, deviceId, _, kind = key
+                for stale in [k for k in self._entries if k[0] == consumer and k[1] == deviceId and k[3] == kind]:
+                    del self._entries[stale]
+                self._entries[key] = (snapshot, None, now)
+                return None
+            prev, last, _ = entry
+            rate = compute(prev, snapshot)
+            if rate is None:
+                self._entries[key] = (prev, last, now)
+                return last
+            self._entries[key] = (snapshot, rate, now)
+            return rate
+
+    def _evict(self, now):
+        for key in [key for key, entry in self._entries.items() if now - entry[2] > self.ttl]:
+            del self._entries[key]
+
+    def clear(self, deviceId=None):
+        with self._lock:
+            if deviceId is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[1] == deviceId]:
+                    del self._entries[key]
+
+
+class ProcStatSnapshot(object):
+    """One /proc/stat read: user/nice/system/idle/iowait/irq/softirq jiffies per cpu line"""
+
+    FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq')
+    USER, NICE, SYSTEM, IDLE, IOWAIT, IRQ, SOFTIRQ = range(7)
+
+    def __init__(self, names, jiffies):
+        self.names = names
+        self.jiffies = jiffies
+
+    @classmethod
+    def parse(cls, text):
+        names, rows = [], []
+        for line in text.splitlines():
+            toks = line.split()
+            if len(toks) < 8 or not toks[0].startswith('cpu'):
+                continue
+            names.append(toks[0])
+            rows.append(toks[1:8])
+        return cls(names, np.array(rows, dtype=np.float64).reshape(-1, len(cls.FIELDS)))
+
+    @property
+    def coreNames(self):
+        return [name for name in self.names if name != 'cpu']
+
+    @property
+    def coreJiffies(self):
+        """rows of the online cores, without the aggregate `cpu` line"""
+        return self.jiffies[[i for i, name in enumerate(self.names) if name != 'cpu']]
+
+    def coreTotal(self):
+        return self.coreJiffies.sum(axis=1)
+
+    def coreIdle(self):
+        return self.coreJiffies[:, self.IDLE]
+
+    def totalCpu(self):
+        return float(self.coreTotal().sum())
+
+    def idleCpu(self):
+        return float(self.coreIdle().sum())
+
+    def coreDelta(self, prev):
+        """per-core jiffies elapsed since prev, cores that went offline in between are zero"""
+        index = {name: i for i, name in enumerate(prev.names)}
+        current = self.coreJiffies
+        delta = np.zeros_like(current)
+        for row, name in enumerate(self.coreNames):
+            if name in index:
+                delta[row] = current[row] - prev.jiffies[index[name]]
+        return np.clip(delta, 0, None)
+
+
 class CPU(object):
+    # baselines are keyed per consumer: by default the instance itself, the web api builds a
+    # new CPU per request and passes a stable consumer name instead
+    _jiffies = JiffiesCache()
 
-    def __init__(self, pkgName, deviceId, platform=Platform.Android, pid=None):
+
+    def __init__(self, pkgName, deviceId, platform=Platform.Android, pid=None, consumer=None):
         self.pkgName = pkgName
         self.deviceId = deviceId
         self.platform = platform
         self.pid = pid
+        self.consumer = consumer if consumer is not None else object()
         if self.pid is None and self.platform == Platform.Android:
             self.pid = d.getPid(pkgName=self.pkgName, deviceId=self.deviceId)[0].split(':')[0]
 
-    def getprocessCpuStat(self):
-        """get the cpu usage of a process at a certain time"""
-        cmd = 'cat /proc/{}/stat'.format(self.pid)
-        result = adb.shell(cmd=cmd, deviceId=self.deviceId)
+    @staticmethod
+    def parseProcessCpuStat(result, pid=None):
+        """parse utime+stime+cutime+cstime out of /proc/<pid>/stat"""
         r = re.compile("\\s+")
-        toks = r.split(result)
+        toks = r.split(result.strip())
         if len(toks) < 17:
-            logger.warning(f'[CPU] Invalid /proc/{self.pid}/stat output: {result[:100]}')
+            logger.warning(f'[CPU] Invalid /proc/{pid}/stat output: {result[:100]}')
             return 0
         processCpu = float(toks[13]) + float(toks[14]) + float(toks[15]) + float(toks[16])
         return processCpu
 
-    def getTotalCpuStat(self):
-        """get the total cpu usage at a certain time"""
+    @staticmethod
+    def parseTotalCpuStat(result):
+        """parse the (total, idle) cpu time of all cores out of /proc/stat"""
+        procStat = ProcStatSnapshot.parse(result)
+        return procStat.totalCpu(), procStat.idleCpu()
+
+    def getProcStat(self):
+        """one /proc/stat read, every total/idle/per-core value derives from it"""
         cmd = 'cat /proc/stat |{} ^cpu'.format(d.filterType())
         result = adb.shell(cmd=cmd, deviceId=self.deviceId)
-        totalCpu = 0
-        lines = result.split('\n')
-        lines.pop(0)
-        for line in lines:
-            toks = line.split()
-            if toks[1] in ['', ' ']:
-                toks.pop(1)
-            for i in range(1, 8):
-                totalCpu += float(toks[i])
-        return float(totalCpu)
+        return ProcStatSnapshot.parse(result)
+
+    def getprocessCpuStat(self):
+        """get the cpu usage of a process at a certain time"""
+        cmd = 'cat /proc/{}/stat'.format(self.pid)
+        result = adb.shell(cmd=cmd, deviceId=self.deviceId)
+        return self.parseProcessCpuStat(result, self.pid)
+
+    def getTotalCpuStat(self):
+        """get the total cpu usage at a certain time"""
+        return self.getProcStat().totalCpu()
     
     def getCpuCoreStat(self):
         """get the core cpu usage at a certain time"""
-        cmd = 'cat /proc/stat |{} ^cpu'.format(d.filterType())
-        result = adb.shell(cmd=cmd, deviceId=self.deviceId)
-        coreCpu = 0
-        coreCpuList = []
-        lines = result.split('\n')
-        lines.pop(0)
-        for line in lines:
-            toks = line.split()
-            if toks[1] in ['', ' ']:
-                toks.pop(1)
-            for i in range(1, 8):
-                coreCpu += float(toks[i])
-            coreCpuList.append(coreCpu)
-            coreCpu = 0
-        return coreCpuList
+        return self.getProcStat().coreTotal().tolist()
     
     def getCoreIdleCpuStat(self):
         """get the core idel cpu usage at a certain time"""
-        cmd = 'cat /proc/stat |{} ^cpu'.format(d.filterType())
-        result = adb.shell(cmd=cmd, deviceId=self.deviceId)
-        idleCpuList = []
-        idleCpu = 0
-        lines = result.split('\n')
-        lines.pop(0)
-        for line in lines:
-            toks = line.split()
-            if toks[1] in ['', ' ']:
-                toks.pop(1)
-            idleCpu += float(toks[4])
-            idleCpuList.append(idleCpu)
-            idleCpu = 0
-        return idleCpuList
+        return self.getProcStat().coreIdle().tolist()
     
     def getIdleCpuStat(self):
         """get the total cpu usage at a certain time"""
-        cmd = 'cat /proc/stat |{} ^cpu'.format(d.filterType())
-        result = adb.shell(cmd=cmd, deviceId=self.deviceId)
-        idleCpu = 0
-        lines = result.split('\n')
-        lines.pop(0)
-        for line in lines:
-            toks = line.split()
-            if toks[1] in ['', ' ']:
-                toks.pop(1)
-            idleCpu += float(toks[4])
-        return idleCpu
+        return self.getProcStat().idleCpu()
     
-    def getCoreCpuRate(self, cores=0,noLog=False):
-        coreCpuRateList = []
+    def getCoreCpuStats(self, cores=0, noLog=False):
+        """
+        per-core values since the previous call, the first call returns empty lists
+        rate: process cpu against the core, usage/system/iowait: utilization of the core itself
+        """
+        stats = {'rate': [], 'usage': [], 'system': [], 'iowait': []}
         try:
-            processCpuTime_1 = self.getprocessCpuStat()
-            coreCpuTotalTime_List1 = self.getCpuCoreStat()
-            time.sleep(1)
-            processCpuTime_2 = self.getprocessCpuStat()
-            coreCpuTotalTime_List2 = self.getCpuCoreStat()
-            for i in range(len(coreCpuTotalTime_List1)):
-                divisor = coreCpuTotalTime_List2[i] - coreCpuTotalTime_List1[i]
-                if divisor == 0:
-                    coreCpuRateList.append(0.0)
-                    continue
-                coreCpuRate = round(float((processCpuTime_2 - processCpuTime_1) / divisor * 100), 2)
+            snapshot = (self.getprocessCpuStat(), self.getProcStat())
+
+            def compute(prev, current):
+                processDelta = current[0] - prev[0]
+                delta = current[1].coreDelta(prev[1])
+                total = delta.sum(axis=1)
+                valid = total > 0
+                safe = np.where(valid, total, 1)
+                rate = np.where(valid, processDelta / safe * 100, 0.0)
                 if cores > 0:
-                    coreCpuRate /= cores
-                coreCpuRate = round(float(coreCpuRate), 2)
-                coreCpuRateList.append(coreCpuRate)
-                if noLog is False:
-                    apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
+                    rate = rate / cores
+                if not valid.any():
+                    return None
+                busy = total - delta[:, ProcStatSnapshot.IDLE] - delta[:, ProcStatSnapshot.IOWAIT]
+                return {
+                    'rate': np.round(rate, 2).tolist(),
+                    'usage': np.round(np.where(valid, busy / safe * 100, 0.0), 2).tolist(),
+                    'system': np.round(np.where(valid, delta[:, ProcStatSnapshot.SYSTEM] / safe * 100, 0.0), 2).tolist(),
+                    'iowait': np.round(np.where(valid, delta[:, ProcStatSnapshot.IOWAIT] / safe * 100, 0.0), 2).tolist(),
+                }
+
+            stats = self._jiffies.rate((self.consumer, self.deviceId, self.pid, 'core'), snapshot, compute) or stats
+            if noLog is False and stats['rate']:
+                apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
+                for i, coreCpuRate in enumerate(stats['rate']):
                     f.add_log(os.path.join(f.report_dir,'cpu{}.log'.format(i)), apm_time, coreCpuRate)
         except Exception as e:
             if len(d.getPid(self.deviceId, self.pkgName)) == 0:
                 logger.error('[CPU Core] {} : No process found'.format(self.pkgName))
             else:
                 logger.exception(e)
-        return coreCpuRateList    
+        return stats
+
+    def getCoreCpuRate(self, cores=0,noLog=False):
+        """process cpu rate against every core since the previous call, the first call returns []"""
+        return self.getCoreCpuStats(cores=cores, noLog=noLog)['rate']
 
     def getAndroidCpuRate(self, noLog=False):
-        """get the Android cpu rate of a process"""
+        """get the Android cpu rate of a process since the previous call, the first call returns 0, 0"""
         try:
-            processCpuTime_1 = self.getprocessCpuStat()
-            totalCpuTime_1 = self.getTotalCpuStat()
-            idleCputime_1 = self.getIdleCpuStat()
-            time.sleep(1)
-            processCpuTime_2 = self.getprocessCpuStat()
-            totalCpuTime_2 = self.getTotalCpuStat()
-            idleCputime_2 = self.getIdleCpuStat()
-            appCpuRate = round(float((processCpuTime_2 - processCpuTime_1) / (totalCpuTime_2 - totalCpuTime_1) * 100), 2)
-            sysCpuRate = round(float(((totalCpuTime_2 - idleCputime_2) - (totalCpuTime_1 - idleCputime_1)) / (totalCpuTime_2 - totalCpuTime_1) * 100), 2)
+            snapshot = (self.getprocessCpuStat(), self.getProcStat())
+
+            def compute(prev, current):
+                total = current[1].totalCpu() - prev[1].totalCpu()
+                if total <= 0:
+                    return None
+                appCpuRate = round(float((current[0] - prev[0]) / total * 100), 2)
+                sysCpuRate = round(float(((current[1].totalCpu() - current[1].idleCpu()) - (prev[1].totalCpu() - prev[1].idleCpu())) / total * 100), 2)
+                return appCpuRate, sysCpuRate
+
+            rate = self._jiffies.rate((self.consumer, self.deviceId, self.pid, 'app'), snapshot, compute)
+            if rate is None:
+                return 0, 0
+            appCpuRate, sysCpuRate = rate
             if noLog is False:
                 apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
                 f.add_log(os.path.join(f.report_dir,'cpu_app.log'), apm_time, appCpuRate)
@@ -213,8 +316,8 @@ class CPU(object):
     def getiOSCpuRate(self, noLog=False):
         """get the iOS cpu rate of a process, unit:%"""
         apm = iosPerformance(self.pkgName, self.deviceId)
-        appCpuRate = round(float(apm.getPerformance(apm.cpu)[0]), 2)
-        sysCpuRate = round(float(apm.getPerformance(apm.cpu)[1]), 2)
+        appCpuRate, sysCpuRate = apm.getPerformance(apm.cpu)
+        appCpuRate, sysCpuRate = round(float(appCpuRate), 2), round(float(sysCpuRate), 2)
         if noLog is False:
             apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
             f.add_log(os.path.join(f.report_dir,'cpu_app.log'), apm_time, appCpuRate)
@@ -226,6 +329,23 @@ class CPU(object):
         appCpuRate, systemCpuRate = self.getAndroidCpuRate(noLog) if self.platform == Platform.Android else self.getiOSCpuRate(noLog)
         return appCpuRate, systemCpuRate    
 
+def _drop_cpu_baseline(platform, added, removed):
+    """tracker listener: a reconnected device must not be compared with its old jiffies"""
+    for deviceId in removed:
+        CPU._jiffies.clear(deviceId)
+
+tracker.add_listener(_drop_cpu_baseline)
+
+
+def _close_ios_adapters(platform, added, removed):
+    """tracker listener: the DVT channels of an unplugged iOS device are dead"""
+    if platform == Platform.iOS:
+        for deviceId in removed:
+            adapters.close(deviceId)
+
+tracker.add_listener(_close_ios_adapters)
+
+
 class Memory(object):
     def __init__(self, pkgName, deviceId, platform=Platform.Android, pid=None):
         self.pkgName = pkgName
@@ -348,14 +468,20 @@ class Battery(object):
         # Get phone battery info
         cmd = 'dumpsys battery'
         output = adb.shell(cmd=cmd, deviceId=self.deviceId)
-        level = int(re.findall(u'level:\s?(\d+)', output)[0])
-        temperature = int(re.findall(u'temperature:\s?(\d+)', output)[0]) / 10
+        level, temperature = self.parseAndroidBattery(output)
         if noLog is False:
              apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
              f.add_log(os.path.join(f.report_dir,'battery_level.log'), apm_time, level)
              f.add_log(os.path.join(f.report_dir,'battery_tem.log'), apm_time, temperature)
         return level, temperature
 
+    @staticmethod
+    def parseAndroidBattery(output):
+        """parse (level, temperature) out of `dumpsys battery`"""
+        level = int(re.findall(u'level:\s?(\d+)', output)[0])
+        temperature = int(re.findall(u'temperature:\s?(\d+)', output)[0]) / 10
+        return level, temperature
+
     def getiOSBattery(self, noLog=False):
         """Get ios battery info, unit:%"""
         try:
@@ -427,6 +553,14 @@ class Network(object):
         if self.pid is None and self.platform == Platform.Android:
             self.pid = d.getPid(pkgName=self.pkgName, deviceId=self.deviceId)[0].split(':')[0]
 
+    @staticmethod
+    def parseAndroidNet(output, net):
+        """parse the (send, recv) KB of an interface out of /proc/<pid>/net/dev"""
+        m = re.search(r'{}:\s*(\d+)\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*(\d+)'.format(net), output)
+        sendNum = round(float(float(m.group(2)) / 1024), 2)
+        recNum = round(float(float(m.group(1)) / 1024), 2)
+        return sendNum, recNum
+
     def getAndroidNet(self, wifi=True):
         """Get Android send/recv data, unit:KB wlan0/rmnet_ipa0"""
         try:
@@ -439,14 +573,10 @@ class Network(object):
                 adb.shell(cmd='svc data enable', deviceId=self.deviceId)
             cmd = 'cat /proc/{}/net/dev |{} {}'.format(self.pid, d.filterType(), net)
             output_pre = adb.shell(cmd=cmd, deviceId=self.deviceId)
-            m_pre = re.search(r'{}:\s*(\d+)\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*(\d+)'.format(net), output_pre)
-            sendNum_pre = round(float(float(m_pre.group(2)) / 1024), 2)
-            recNum_pre = round(float(float(m_pre.group(1)) / 1024), 2)
+            sendNum_pre, recNum_pre = self.parseAndroidNet(output_pre, net)
             time.sleep(0.5)
             output_final = adb.shell(cmd=cmd, deviceId=self.deviceId)
-            m_final = re.search(r'{}:\s*(\d+)\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*(\d+)'.format(net), output_final)
-            sendNum_final = round(float(float(m_final.group(2)) / 1024), 2)
-            recNum_final = round(float(float(m_final.group(1)) / 1024), 2)
+            sendNum_final, recNum_final = self.parseAndroidNet(output_final, net)
             sendNum = round(float(sendNum_final - sendNum_pre), 2)
             recNum = round(float(recNum_final - recNum_pre), 2)
         except Exception as e:
@@ -468,9 +598,7 @@ class Network(object):
                 adb.shell(cmd='svc data enable', deviceId=self.deviceId)
             cmd = f'cat /proc/{self.pid}/net/dev |{d.filterType()} {net}'
             output_pre = adb.shell(cmd=cmd, deviceId=self.deviceId)
-            m = re.search(r'{}:\s*(\d+)\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*\d+\s*(\d+)'.format(net), output_pre)    
-            sendNum = round(float(float(m.group(2)) / 1024), 2)
-            recNum = round(float(float(m.group(1)) / 1024), 2)
+            sendNum, recNum = self.parseAndroidNet(output_pre, net)
         except Exception as e:
             sendNum, recNum = 0, 0
             if len(d.getPid(self.deviceId, self.pkgName)) == 0:
@@ -524,6 +652,9 @@ class FPS(object):
         self.apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
         self.monitors = None
         self.monitor_started = False
+        # newest iOS graphics sample already written to fps.log
+        self.ios_logged = time.time()
+        self.ios_streamed = False
     
     def getAndroidFps(self, noLog=False):
         """get Android Fps, unit:HZ"""
@@ -576,10 +707,26 @@ class FPS(object):
         apm = iosPerformance(self.pkgName, self.deviceId)
         fps = int(apm.getPerformance(apm.fps))
         if noLog is False:
-            apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
-            f.add_log(os.path.join(f.report_dir,'fps.log'), apm_time, fps)
+            timeline = self.getiOSFpsTimeline()
+            if timeline is None:
+                timeline = [(datetime.datetime.now().strftime('%H:%M:%S.%f'), fps)]
+            for log_time, value in timeline:
+                f.add_log(os.path.join(f.report_dir,'fps.log'), log_time, value)
         return fps, 0
 
+    def getiOSFpsTimeline(self):
+        """
+        every buffered (timestamp, fps) graphics sample since the previous call, at the time it was measured;
+        None while the graphics stream has not produced a sample yet, the caller logs its own value then
+        """
+        samples = iosPerformance(self.pkgName, self.deviceId).getGraphicsSince(self.ios_logged)
+        if samples:
+            self.ios_logged = samples[-1][0]
+            self.ios_streamed = True
+        elif not self.ios_streamed:
+            return None
+        return [(timestamp, value) for timestamp, value, _ in samples]
+
     def getFPS(self, noLog=False):
         """get fps、jank"""
         fps, jank = self.getAndroidFps(noLog) if self.platform == Platform.Android else self.getiOSFps(noLog)
@@ -599,46 +746,44 @@ class GPU(object):
         self.deviceId = deviceId
         self.platform = platform
 
+    @staticmethod
+    def parseKgslGpuBusy(result):
+        """parse the gpu busy rate out of kgsl gpubusy, None if it is unusable"""
+        # 检查是否有错误或权限问题
+        if not result or result.strip() == '' or 'No such file' in result or 'Permission denied' in result or 'Operation not permitted' in result:
+            logger.warning(f'[GPU] kgsl方法获取失败，结果: {result}')
+            return None
+        
+        # 验证数据格式
+        parts = result.strip().split()
+        if len(parts) < 2:
+            logger.warning(f'[GPU] kgsl数据格式错误: {result}')
+            return None
+        
+        # 验证数据是否为有效数字
+        try:
+            val1 = int(parts[0])
+            val2 = int(parts[1])
+        except ValueError as e:
+            logger.warning(f'[GPU] kgsl数据解析失败: {e}, 原始数据: {result}')
+            return None
+        
+        if val2 == 0:
+            logger.warning('[GPU] kgsl除数为0')
+            return None
+        
+        gpu = round(float(val1 / val2) * 100, 2)
+        logger.debug(f'[GPU] kgsl获取成功: {gpu}% (busy={val1}, total={val2})')
+        return gpu
+
     def getAndroidGpuRate(self):
         try:
             cmd = 'cat /sys/class/kgsl/kgsl-3d0/gpubusy'
             result = adb.shell(cmd=cmd, deviceId=self.deviceId)
-            
-            # 检查是否有错误或权限问题
-            if not result or result.strip() == '' or 'No such file' in result or 'Permission denied' in result or 'Operation not permitted' in result:
-                logger.warning(f'[GPU] kgsl方法获取失败，结果: {result}')
-                return self._getGpuRateFallback()
-            
-            # 验证数据格式
-            parts = result.strip().split(' ')
-            if len(parts) < 2:
-                logger.warning(f'[GPU] kgsl数据格式错误: {result}')
-                return self._getGpuRateFallback()
-            
-            # 验证数据是否为有效数字
-            try:
-                part1 = parts[0].strip()
-                part2 = parts[1].strip()
-                
-                if part1 == '' or part2 == '':
-                    logger.warning(f'[GPU] kgsl数据包含空值: part1="{part1}", part2="{part2}"')
-                    return self._getGpuRateFallback()
-                
-                val1 = int(part1)
-                val2 = int(part2)
-                
-                if val2 == 0:
-                    logger.warning('[GPU] kgsl除数为0')
-                    return self._getGpuRateFallback()
-                
-                gpu = round(float(val1 / val2) * 100, 2)
-                logger.debug(f'[GPU] kgsl获取成功: {gpu}% (busy={val1}, total={val2})')
-                return gpu
-                
-            except ValueError as e:
-                logger.warning(f'[GPU] kgsl数据解析失败: {e}, 原始数据: {result}')
+            gpu = self.parseKgslGpuBusy(result)
+            if gpu is None:
                 return self._getGpuRateFallback()
-                
+            return gpu
         except Exception as e:
             logger.error(f'[GPU] kgsl方法异常: {e}')
             return self._getGpuRateFallback()
@@ -857,6 +1002,168 @@ class ThermalSensor(object):
         else:
             logger.exception('No permission')     
 
+class BatchSampler(object):
+    """Sample cpu, network, gpu, thermal and battery of an Android app in one adb round trip per tick"""
+
+    SECTION = '==magnax:{}=='
+    SECTION_RE = re.compile(r'^==magnax:(\w+)==$')
+    THERMAL_CMD = 'for z in /sys/class/thermal/thermal_zone*; do echo $(cat $z/type) $(cat $z/temp); done'
+
+    def __init__(self, pkgName, deviceId, pid=None, wifi=True, battery=True, thermal=True):
+        self.pkgName = pkgName
+        self.deviceId = deviceId
+        self.pid = pid
+        self.net = 'wlan0' if wifi else 'rmnet_ipa0'
+        self.battery = battery
+        self.thermal = thermal
+        # cleared once the gpu section comes back empty, the device has no kgsl node (non-Adreno)
+        self.kgsl = True
+        self._prev = None
+        processList = d.getPid(pkgName=self.pkgName, deviceId=self.deviceId)
+        if self.pid is None:
+            self.pid = processList[0].split(':')[0]
+        # name of the sampled process, so a restarted app is followed to the same (sub)process
+        self.process = next((process.split(':', 1)[1] for process in processList
+                             if process.split(':')[0] == str(self.pid)), None)
+
+    def resolvePid(self):
+        """look the sampled process up again after it exited, True when it runs under a new pid"""
+        processList = d.getPid(pkgName=self.pkgName, deviceId=self.deviceId)
+        pids = {process.split(':', 1)[1]: process.split(':')[0] for process in processList}
+        pid = pids.get(self.process) or (processList[0].split(':')[0] if processList else None)
+        if pid is None or pid == str(self.pid):
+            return False
+        logger.info(f'[BatchSampler] {self.pkgName} restarted, pid {self.pid} -> {pid}')
+        self.pid = pid
+        self.process = next((name for name, value in pids.items() if value == pid), self.process)
+        return True
+
+    @property
+    def ready(self):
+        """whether a baseline exists, i.e. the next sample yields real cpu/network rates"""
+        return self._prev is not None
+
+    def buildScript(self):
+        """one compound shell script, every section is introduced by a delimiter line"""
+        sections = [
+            ('pid_stat', f'cat /proc/{self.pid}/stat'),
+            ('stat', 'cat /proc/stat'),
+            ('net', f'cat /proc/{self.pid}/net/dev'),
+        ]
+        if self.kgsl:
+            sections.append(('gpu', 'cat /sys/class/kgsl/kgsl-3d0/gpubusy'))
+        if self.thermal:
+            sections.append(('thermal', self.THERMAL_CMD))
+        if self.battery:
+            # Switch mobile phone battery to non-charging state before reading it
+            sections.append(('battery', 'dumpsys battery reset; dumpsys battery set status 1; dumpsys battery'))
+        return '; '.join('echo {}; {} 2>/dev/null'.format(self.SECTION.format(name), cmd) for name, cmd in sections)
+
+    @classmethod
+    def splitSections(cls, output):
+        """split the script output back into {section: text}"""
+        sections = {}
+        name = None
+        for line in output.splitlines():
+            match_line = cls.SECTION_RE.match(line.strip())
+            if match_line:
+                name = match_line.group(1)
+                sections[name] = []
+            elif name:
+                sections[name].append(line)
+        return {key: '\n'.join(lines) for key, lines in sections.items()}
+
+    @staticmethod
+    def parseThermal(text):
+        temp_list = list()
+        for line in text.splitlines():
+            toks = line.split()
+            if len(toks) == 2:
+                temp_list.append({'type': toks[0], 'temp': toks[1]})
+        return temp_list
+
+    @staticmethod
+    def computeRates(prev, snapshot):
+        """cpu rate and network KB between two raw snapshots"""
+        appCpuRate, sysCpuRate = 0, 0
+        if prev and 'total_cpu' in prev and 'total_cpu' in snapshot:
+            total = snapshot['total_cpu'] - prev['total_cpu']
+            if total > 0:
+                appCpuRate = round(float((snapshot['process_cpu'] - prev['process_cpu']) / total * 100), 2)
+                sysCpuRate = round(float(((snapshot['total_cpu'] - snapshot['idle_cpu']) - (prev['total_cpu'] - prev['idle_cpu'])) / total * 100), 2)
+        sendNum, recNum = 0, 0
+        if prev and 'send' in prev and 'send' in snapshot:
+            sendNum = round(float(snapshot['send'] - prev['send']), 2)
+            recNum = round(float(snapshot['recv'] - prev['recv']), 2)
+        return {'cpu': (appCpuRate, sysCpuRate), 'network': (sendNum, recNum)}
+
+    def fetch(self):
+        """run the batch script once and return {section: text}"""
+        # quote the whole script so it reaches the device shell as-is on every adb transport
+        output = adb.shell(cmd=shlex.quote(self.buildScript()), deviceId=self.deviceId)
+        return self.splitSections(output)
+
+    def sample(self, noLog=False):
+        """
+        take one snapshot and fan it out to every metric, rates are computed against the previous snapshot;
+        result['rated'] tells whether cpu/network are real rates (a baseline existed and the process is alive)
+        """
+        sections = self.fetch()
+        if len(sections.get('pid_stat', '').split()) < 17:
+            # the app exited (or the round trip failed): its counters are gone, a rate against the old
+            # baseline would be a large negative number. Start over, under the new pid if it restarted
+            self._prev = None
+            self.resolvePid()
+            return self.finish(sections, {'cpu': (0, 0), 'network': (0, 0)}, False, noLog)
+        snapshot = {}
+        try:
+            snapshot['process_cpu'] = CPU.parseProcessCpuStat(sections.get('pid_stat', ''), self.pid)
+            snapshot['total_cpu'], snapshot['idle_cpu'] = CPU.parseTotalCpuStat(sections.get('stat', ''))
+        except Exception as e:
+            logger.warning(f'[BatchSampler] cpu parse failed: {e}')
+        try:
+            snapshot['send'], snapshot['recv'] = Network.parseAndroidNet(sections.get('net', ''), self.net)
+        except Exception as e:
+            logger.warning(f'[BatchSampler] network parse failed: {e}')
+        prev, self._prev = self._prev, snapshot
+        return self.finish(sections, self.computeRates(prev, snapshot), prev is not None, noLog)
+
+    def finish(self, sections, result, rated, noLog):
+        """add the device-wide sections to the rates of one sample and log it"""
+        appCpuRate, sysCpuRate = result['cpu']
+        sendNum, recNum = result['network']
+        result['rated'] = rated
+        gpu = None
+        if self.kgsl:
+            if 'gpu' in sections and not sections['gpu'].strip():
+                # read fine but empty: no kgsl node, stop asking for it and skip GPU's 0.0 fallback round trip
+                logger.info(f'[BatchSampler] no kgsl gpubusy on {self.deviceId}, gpu reported as 0')
+                self.kgsl = False
+            else:
+                gpu = GPU.parseKgslGpuBusy(sections.get('gpu', ''))
+        result['gpu'] = gpu if gpu is not None else 0.0
+        if self.thermal:
+            result['thermal'] = self.parseThermal(sections.get('thermal', ''))
+        if self.battery:
+            try:
+                result['battery'] = Battery.parseAndroidBattery(sections.get('battery', ''))
+            except Exception as e:
+                logger.warning(f'[BatchSampler] battery parse failed: {e}')
+                result['battery'] = (0, 0)
+
+        # the first snapshot only seeds the cpu/network baseline
+        if noLog is False and rated:
+            apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
+            f.add_log(os.path.join(f.report_dir,'cpu_app.log'), apm_time, appCpuRate)
+            f.add_log(os.path.join(f.report_dir,'cpu_sys.log'), apm_time, sysCpuRate)
+            f.add_log(os.path.join(f.report_dir,'upflow.log'), apm_time, sendNum)
+            f.add_log(os.path.join(f.report_dir,'downflow.log'), apm_time, recNum)
+            f.add_log(os.path.join(f.report_dir,'gpu.log'), apm_time, result['gpu'])
+            if self.battery:
+                f.add_log(os.path.join(f.report_dir,'battery_level.log'), apm_time, result['battery'][0])
+                f.add_log(os.path.join(f.report_dir,'battery_tem.log'), apm_time, result['battery'][1])
+        return result
+
 class Energy(object):
     def __init__(self, deviceId, packageName):
         self.deviceId = deviceId
@@ -989,9 +1296,9 @@ class iosPerformance(object):
         self._adapter = None
 
     def _get_adapter(self) -> PyiOSDeviceAdapter:
-        """Get or create the PyiOSDeviceAdapter instance."""
+        """The shared adapter of this app, its DVT channel stays open between samples."""
         if self._adapter is None:
-            self._adapter = PyiOSDeviceAdapter(self.deviceId, self.pkgName)
+            self._adapter = adapters.get(self.deviceId, self.pkgName)
         return self._adapter
 
     def getPerformance(self, perfType: str):
@@ -1037,11 +1344,17 @@ class iosPerformance(object):
             else:
                 return 0
 
+    def getGraphicsSince(self, since):
+        """(timestamp, fps, gpu) samples newer than since, empty when the graphics stream is not available"""
+        try:
+            return self._get_adapter().graphics_since(since)
+        except Exception as e:
+            logger.error(f"[iOS Perf] Failed to read graphics samples: {e}")
+            return []
+
     def close(self):
-        """Clean up resources."""
-        if self._adapter:
-            self._adapter.close()
-            self._adapter = None
+        """Drop this monitor's handle, the registry closes the adapter once it is idle."""
+        self._adapter = None
 
 class initPerformanceService(object):
     CONFIG_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -1074,7 +1387,7 @@ class AppPerformanceMonitor(initPerformanceService):
 
     def __init__(self, pkgName=None, platform=Platform.Android, deviceId=None,
                  surfaceview=True, noLog=True, pid=None, record=False, collect_all=False,
-                 duration=0):
+                 duration=0, agent=False, durability=None):
         self.pkgName = pkgName
         self.deviceId = deviceId
         self.platform = platform
@@ -1084,19 +1397,32 @@ class AppPerformanceMonitor(initPerformanceService):
         self.record = record
         self.collect_all = collect_all
         self.duration = duration
+        self.agent = agent
+        self.durability = durability
         self.end_time = time.time() + self.duration
         d.devicesCheck(platform=self.platform, deviceid=self.deviceId, pkgname=self.pkgName)
         self.start()
     
+    def _iosPace(self, started):
+        """iOS reads return the newest streamed sample at once, hold the collection loops to one sample a second"""
+        if self.platform == Platform.iOS:
+            time.sleep(max(0, 1 - (time.time() - started)))
+
     def collectCpu(self):
         _cpu = CPU(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+        if self.platform == Platform.Android:
+            _cpu.getCpuRate(noLog=True)
         result = {}
         while self.get_status() == 'on':
+            if self.platform == Platform.Android:
+                time.sleep(1)
+            started = time.time()
             appCpuRate, systemCpuRate = _cpu.getCpuRate(noLog=self.noLog)
             result = {'appCpuRate': appCpuRate, 'systemCpuRate': systemCpuRate}
             logger.info(f'cpu: {result}')
             if self.collect_all is False:
                 break
+            self._iosPace(started)
             if self.duration > 0 and time.time() > self.end_time:
                 break
         return result
@@ -1104,6 +1430,8 @@ class AppPerformanceMonitor(initPerformanceService):
     def collectCoreCpu(self):
         _cpucore = CPU(self.pkgName, self.deviceId, self.platform, pid=self.pid)
         cores = d.getCpuCores(self.deviceId)
+        _cpucore.getCoreCpuRate(cores=cores, noLog=True)
+        time.sleep(1)
         value = _cpucore.getCoreCpuRate(cores=cores, noLog=self.noLog)
         result = {'cpu{}'.format(value.index(element)):element for element in  value}
         logger.info(f'cpu core: {result}')
@@ -1113,11 +1441,13 @@ class AppPerformanceMonitor(initPerformanceService):
         _memory = Memory(self.pkgName, self.deviceId, self.platform, pid=self.pid)
         result = {}
         while self.get_status() == 'on':
+            started = time.time()
             total, swap = _memory.getProcessMemory(noLog=self.noLog)
             result = {'total': total, 'swap': swap}
             logger.info(f'memory: {result}')
             if self.collect_all is False:
                 break
+            self._iosPace(started)
             if self.duration > 0 and time.time() > self.end_time:
                 break
         return result
@@ -1159,11 +1489,13 @@ class AppPerformanceMonitor(initPerformanceService):
             f.record_net('pre', data[0], data[1])
         result = {}
         while self.get_status() == 'on':
+            started = time.time()
             upFlow, downFlow = _network.getNetWorkData(wifi=wifi,noLog=self.noLog)
             result = {'send': upFlow, 'recv': downFlow}
             logger.info(f'network: {result}')
             if self.collect_all is False:
                 break
+            self._iosPace(started)
             if self.duration > 0 and time.time() > self.end_time:
                 break
         return result
@@ -1172,11 +1504,13 @@ class AppPerformanceMonitor(initPerformanceService):
         _fps = FPS(self.pkgName, self.deviceId, self.platform, self.surfaceview)
         result = {}
         while self.get_status() == 'on':
+            started = time.time()
             fps, jank = _fps.getFPS(noLog=self.noLog)
             result = {'fps': fps, 'jank': jank}
             logger.info(f'fps: {result}')
             if self.collect_all is False:
                 break
+            self._iosPace(started)
             if self.duration > 0 and time.time() > self.end_time:
                 break
         return result
@@ -1185,15 +1519,64 @@ class AppPerformanceMonitor(initPerformanceService):
         _gpu = GPU(self.pkgName, self.deviceId, self.platform)
         result = {}
         while self.get_status() == 'on':
+            started = time.time()
             gpu = _gpu.getGPU(noLog=self.noLog)
             result = {'gpu': gpu}
             logger.info(f'gpu: {result}')
             if self.collect_all is False:
                 break
+            self._iosPace(started)
             if self.duration > 0 and time.time() > self.end_time:
                 break
         return result
     
+    def collectBatch(self, wifi=True, interval=1):
+        """Android cpu/network/gpu/battery sampled by one batched shell round trip per tick"""
+        _batch = BatchSampler(self.pkgName, self.deviceId, pid=self.pid, wifi=wifi, thermal=False)
+        if self.noLog is False:
+            _network = Network(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+            data = _network.setAndroidNet(wifi=wifi)
+            f.record_net('pre', data[0], data[1])
+        _batch.sample(noLog=True)
+        next_tick = time.time() + interval
+        result = {}
+        while self.get_status() == 'on':
+            time.sleep(max(0, next_tick - time.time()))
+            next_tick += interval
+            final = _batch.sample(noLog=self.noLog)
+            result = {'appCpuRate': final['cpu'][0], 'systemCpuRate': final['cpu'][1],
+                      'send': final['network'][0], 'recv': final['network'][1],
+                      'gpu': final['gpu'], 'level': final['battery'][0], 'temperature': final['battery'][1]}
+            logger.info(f'batch: {result}')
+            if self.collect_all is False:
+                break
+            if self.duration > 0 and time.time() > self.end_time:
+                break
+        return result
+
+    def collectAgent(self, wifi=True, interval=1):
+        """Android cpu/network/gpu streamed by the on-device agent, logged with device timestamps"""
+        from magnax.public.android_agent import AndroidAgent
+        _agent = AndroidAgent(self.pkgName, self.deviceId, pid=self.pid, wifi=wifi, interval=interval)
+        if self.noLog is False:
+            _network = Network(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+            data = _network.setAndroidNet(wifi=wifi)
+            f.record_net('pre', data[0], data[1])
+        result = {}
+        _agent.start()
+        try:
+            for final in _agent.samples(noLog=self.noLog):
+                result = {'appCpuRate': final['cpu'][0], 'systemCpuRate': final['cpu'][1],
+                          'send': final['network'][0], 'recv': final['network'][1], 'gpu': final['gpu']}
+                logger.info(f'agent: {result}')
+                if self.get_status() != 'on' or self.collect_all is False:
+                    break
+                if self.duration > 0 and time.time() > self.end_time:
+                    break
+        finally:
+            _agent.stop()
+        return result
+
     def collectThermal(self):
          _thermal = ThermalSensor(self.deviceId, self.platform)
          result = _thermal.getThermalTemp()
@@ -1232,14 +1615,7 @@ class AppPerformanceMonitor(initPerformanceService):
                 summary_dict['net_send'] = summary['flow_send']
                 summary_dict['net_recv'] = summary['flow_recv']
                 summary_dict['gpu'] = summary['gpu']
-                summary_dict['cpu_charts'] = f.getCpuLog(Platform.Android, scene)
-                summary_dict['mem_charts'] = f.getMemLog(Platform.Android, scene)
-                summary_dict['mem_detail_charts'] = f.getMemDetailLog(Platform.Android, scene)
-                summary_dict['net_charts'] = f.getFlowLog(Platform.Android, scene)
-                summary_dict['battery_charts'] = f.getBatteryLog(Platform.Android, scene)
-                summary_dict['fps_charts'] = f.getFpsLog(Platform.Android, scene)['fps']
-                summary_dict['jank_charts'] = f.getFpsLog(Platform.Android, scene)['jank']
-                summary_dict['gpu_charts'] = f.getGpuLog(Platform.Android, scene)
+                summary_dict.update(f.reportCharts(Platform.Android, scene))
                 f.make_android_html(scene=scene, summary=summary_dict, report_path=report_path)
             case Platform.iOS:
                 scene = f.make_report(app=self.pkgName, devices=self.deviceId,
@@ -1261,12 +1637,7 @@ class AppPerformanceMonitor(initPerformanceService):
                 summary_dict['gpu'] = summary['gpu']
                 summary_dict['net_send'] = summary['flow_send']
                 summary_dict['net_recv'] = summary['flow_recv']
-                summary_dict['cpu_charts'] = f.getCpuLog(Platform.iOS, scene)
-                summary_dict['mem_charts'] = f.getMemLog(Platform.iOS, scene)
-                summary_dict['net_charts'] = f.getFlowLog(Platform.iOS, scene)
-                summary_dict['battery_charts'] = f.getBatteryLog(Platform.iOS, scene)
-                summary_dict['fps_charts'] = f.getFpsLog(Platform.iOS, scene)
-                summary_dict['gpu_charts'] = f.getGpuLog(Platform.iOS, scene)
+                summary_dict.update(f.reportCharts(Platform.iOS, scene))
                 f.make_ios_html(scene=scene, summary=summary_dict, report_path=report_path)
             case _:
                 raise Exception('platfrom is invalid')
@@ -1274,15 +1645,28 @@ class AppPerformanceMonitor(initPerformanceService):
     def collectAll(self, report_path=None):
         try:
             f.clear_file()
-            process_num = 8 if self.record else 7
-            pool = multiprocessing.Pool(processes=process_num)
-            pool.apply_async(self.collectCpu)
+            process_num = 7
+            if self.platform == Platform.Android:
+                process_num = 5 if self.agent else 4
+            process_num = process_num + 1 if self.record else process_num
+            # every collector process runs its own series writer, hand it the durability policy
+            pool = multiprocessing.Pool(processes=process_num, initializer=configure, initargs=(self.durability,))
             pool.apply_async(self.collectMemory)
             pool.apply_async(self.collectMemoryDetail)
-            pool.apply_async(self.collectBattery)
             pool.apply_async(self.collectFps)
-            pool.apply_async(self.collectNetwork)
-            pool.apply_async(self.collectGpu)
+            match(self.platform):
+                case Platform.Android if self.agent:
+                    # cpu, network and gpu are pushed by the on-device agent
+                    pool.apply_async(self.collectAgent)
+                    pool.apply_async(self.collectBattery)
+                case Platform.Android:
+                    # cpu, network, gpu and battery share one shell round trip per tick
+                    pool.apply_async(self.collectBatch)
+                case _:
+                    pool.apply_async(self.collectCpu)
+                    pool.apply_async(self.collectBattery)
+                    pool.apply_async(self.collectNetwork)
+                    pool.apply_async(self.collectGpu)
             if self.record:
                 pool.apply_async(Scrcpy.start_record, (self.deviceId))
             pool.close()
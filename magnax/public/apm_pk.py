@@ -3,6 +3,7 @@ import re
 import os
 import time
 from magnax.public.adb import adb
+from magnax.public.apm import JiffiesCache
 from magnax.public.common import Devices, File
 from magnax.public.android_fps import FPSMonitor, TimeUtils
 
@@ -11,6 +12,7 @@ f = File()
 
 
 class CPU_PK:
+    _jiffies = JiffiesCache()
 
     def __init__(self, pkgNameList: list, deviceId1, deviceId2):
         self.pkgNameList = pkgNameList
@@ -53,29 +55,27 @@ class CPU_PK:
         IdleCpu = float(toks[4])
         return IdleCpu
 
+    def getDeviceCpuRate(self, pkgName, deviceId):
+        """app cpu rate of one device since the previous call, the first call returns 0"""
+        pid = d.getPid(pkgName=pkgName, deviceId=deviceId)[0].split(':')[0]
+        snapshot = (self.getprocessCpuStat(pkgName=pkgName, deviceId=deviceId), self.getTotalCpuStat(deviceId=deviceId))
+
+        def compute(prev, current):
+            total = current[1] - prev[1]
+            if total <= 0:
+                return None
+            return round(float((current[0] - prev[0]) / total * 100), 2)
+
+        rate = self._jiffies.rate((deviceId, pid, 'pk'), snapshot, compute)
+        return 0 if rate is None else rate
+
     def getAndroidCpuRate(self):
         """get the Android cpu rate of a process"""
-        processCpuTime1_first = self.getprocessCpuStat(pkgName=self.pkgNameList[0], deviceId=self.deviceId1)
-        totalCpuTime1_first = self.getTotalCpuStat(deviceId=self.deviceId1)
-        time.sleep(0.5)
-        processCpuTime1_second = self.getprocessCpuStat(pkgName=self.pkgNameList[0], deviceId=self.deviceId1)
-        totalCpuTime1_second = self.getTotalCpuStat(deviceId=self.deviceId1)
-
+        appCpuRate1 = self.getDeviceCpuRate(pkgName=self.pkgNameList[0], deviceId=self.deviceId1)
         if len(self.pkgNameList) == 1:
-            processCpuTime2_first = self.getprocessCpuStat(pkgName=self.pkgNameList[0], deviceId=self.deviceId2)
-            totalCpuTime2_first = self.getTotalCpuStat(deviceId=self.deviceId2)
-            time.sleep(0.5)
-            processCpuTime2_second = self.getprocessCpuStat(pkgName=self.pkgNameList[0], deviceId=self.deviceId2)
-            totalCpuTime2_second = self.getTotalCpuStat(deviceId=self.deviceId2)
+            appCpuRate2 = self.getDeviceCpuRate(pkgName=self.pkgNameList[0], deviceId=self.deviceId2)
         else:
-            processCpuTime2_first = self.getprocessCpuStat(pkgName=self.pkgNameList[1], deviceId=self.deviceId2)
-            totalCpuTime2_first = self.getTotalCpuStat(deviceId=self.deviceId2)
-            time.sleep(0.5)
-            processCpuTime2_second = self.getprocessCpuStat(pkgName=self.pkgNameList[1], deviceId=self.deviceId2)
-            totalCpuTime2_second = self.getTotalCpuStat(deviceId=self.deviceId2)
-
-        appCpuRate1 = round(float((processCpuTime1_second - processCpuTime1_first) / (totalCpuTime1_second - totalCpuTime1_first) * 100), 2)
-        appCpuRate2 = round(float((processCpuTime2_second - processCpuTime2_first) / (totalCpuTime2_second - totalCpuTime2_first) * 100), 2)
+            appCpuRate2 = self.getDeviceCpuRate(pkgName=self.pkgNameList[1], deviceId=self.deviceId2)
         apm_time = datetime.datetime.now().strftime('%H:%M:%S.%f')
         f.add_log(os.path.join(f.report_dir, 'cpu_app1.log'), apm_time, appCpuRate1)
         f.add_log(os.path.join(f.report_dir, 'cpu_app2.log'), apm_time, appCpuRate2)
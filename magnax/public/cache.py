@@ -0,0 +1,137 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  process-wide LRU of data parsed from report scenes.
+            Entries are keyed by (scene directory, name) and carry the (mtime, size) stamp of the
+            files they were parsed from, a changed file is a miss. Finished scenes never change, so
+            the report, analysis, compare and PK pages parse every series once per process.
+"""
+import collections
+import copy
+import sys
+import threading
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def sizeof(value):
+    """approximate memory held by a cached value"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sizeof(vars(value))
+    return sys.getsizeof(value)
+
+
+def freeze(value):
+    """cached arrays are shared by every reader, nobody may write into them"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    return value
+
+
+class SceneCache(object):
+    """LRU of parsed scene data bounded by an approximate byte budget"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'evicted_bytes': 0, 'rejected': 0}
+
+    def get(self, scene, name, stamp):
+        """(True, value) when the entry was parsed from files with this stamp, (False, None) otherwise"""
+        key = (scene, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return True, entry[1]
+            if entry is not None:
+                # the scene was rewritten (renamed over, re-indexed), the old parse is garbage
+                self._remove(key)
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+            return False, None
+
+    def put(self, scene, name, stamp, value):
+        size = sizeof(value)
+        key = (scene, name)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self._stats['rejected'] += 1
+                return value
+            self._entries[key] = (stamp, freeze(value), size)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def cached(self, scene, name, stamp, loader):
+        """value of the entry, loaded and stored on a miss; a None stamp (missing files) is never cached"""
+        if stamp is None:
+            return loader()
+        hit, value = self.get(scene, name, stamp)
+        if hit:
+            return value
+        return self.put(scene, name, stamp, loader())
+
+    def cachedCopy(self, scene, name, stamp, loader):
+        """like cached, for mutable results (summary dicts) the caller may change"""
+        return copy.deepcopy(self.cached(scene, name, stamp, loader))
+
+    def drop(self, scene):
+        """forget every entry of a scene, e.g. before it is renamed or removed"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == scene]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+            stats['scenes'] = len({key[0] for key in self._entries})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        return stats
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats['evictions'] += 1
+            self._stats['evicted_bytes'] += size
+
+
+scene_cache = SceneCache()
@@ -1,7 +1,9 @@
+import datetime
 import json
 import os
 import platform
 import re
+import shlex
 import shutil
 import time
 import requests
@@ -13,7 +15,9 @@ import ssl
 import openpyxl
 import psutil
 import signal
+import threading
 import cv2
+import numpy as np
 from functools import wraps
 from jinja2 import Environment, FileSystemLoader
 
@@ -28,74 +32,105 @@ except ImportError:
     pmd3_list_devices = None
     PMD3_AVAILABLE = False
 from magnax.public.adb import adb
+from magnax.public.cache import scene_cache
+from magnax.public.device_tracker import tracker
+from magnax.public.store import (ROLLUP_TIERS, build_rollups, close_writers, column_name, compact,
+                                 extreme_points, format_times, get_writer, load_rollup, read_text_log,
+                                 readers, rollup_column, rollup_path, series_stats, store_path, to_python)
 
 
-def downsample_lttb(data: list, target_points: int) -> list:
+# above target_points * MINMAX_THRESHOLD points, LTTB only looks at the min/max preselection
+MINMAX_THRESHOLD = 32
+MINMAX_RATIO = 4
+
+
+def minmax_indices(y, n_buckets):
+    """
+    MinMax 预选：把内部点分成 n_buckets 个等长桶，每桶保留最小值和最大值的索引（含首尾点）
     """
-    LTTB (Largest Triangle Three Buckets) 降采样算法
-    专为时序数据设计，保留视觉特征（峰值、谷值、趋势）
+    n = len(y)
+    inner = n - 2
+    size = inner // n_buckets
+    if size < 2:
+        return np.arange(n)
+    body = y[1:1 + n_buckets * size].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size + 1
+    selected = [np.array([0]), offsets + body.argmin(axis=1), offsets + body.argmax(axis=1)]
+    tail = np.arange(1 + n_buckets * size, n - 1)
+    if len(tail):
+        # the remainder that did not fill a bucket keeps its own extremes
+        selected.append(tail[[y[tail].argmin(), y[tail].argmax()]])
+    selected.append(np.array([n - 1]))
+    return np.unique(np.concatenate(selected))
+
+
+def lttb_indices(x, y, target_points):
+    """
+    LTTB (Largest Triangle Three Buckets) 降采样，返回保留点的索引
+    x 为真实时间戳，桶平均值一次性向量化计算，每个桶内的三角形面积也是一次数组运算
 
     Args:
-        data: [{"x": timestamp, "y": value}, ...] 格式的时序数据
+        x: 时间戳数组（单调递增）
+        y: 数值数组
         target_points: 目标数据点数量（建议 500-2000）
 
     Returns:
-        降采样后的数据列表，保留首尾点和关键特征点
+        保留点的索引数组，首尾点始终保留
     """
-    n = len(data)
+    n = len(y)
     if n <= target_points or target_points < 3:
-        return data
-
-    # 始终保留第一个和最后一个点
-    sampled = [data[0]]
-
-    # 计算每个桶的大小
-    bucket_size = (n - 2) / (target_points - 2)
-
-    a = 0  # 上一个选中点的索引
-
-    for i in range(target_points - 2):
-        # 计算当前桶的范围
-        bucket_start = int((i + 1) * bucket_size) + 1
-        bucket_end = int((i + 2) * bucket_size) + 1
-        bucket_end = min(bucket_end, n - 1)
-
-        # 计算下一个桶的平均值（用于计算三角形面积）
-        next_start = int((i + 2) * bucket_size) + 1
-        next_end = int((i + 3) * bucket_size) + 1
-        next_end = min(next_end, n)
-
-        # 计算下一个桶的平均 x 和 y
-        if next_end > next_start:
-            avg_x = sum(j for j in range(next_start, next_end)) / (next_end - next_start)
-            avg_y = sum(data[j]['y'] for j in range(next_start, next_end)) / (next_end - next_start)
-        else:
-            avg_x = next_start
-            avg_y = data[min(next_start, n - 1)]['y']
-
-        # 在当前桶中找到与上一个点和平均点组成的三角形面积最大的点
-        max_area = -1
-        max_idx = bucket_start
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]
+    y = np.asarray(y, dtype=np.float64)
+    # bucket k of the n - 2 inner points is [starts[k], starts[k + 1])
+    starts = (np.arange(target_points - 1) * ((n - 2) / (target_points - 2))).astype(np.int64) + 1
+    starts[-1] = n - 1
+    # average point of every bucket, the last point stands in for the bucket after the last one
+    counts = np.diff(starts)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], starts[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], starts[:-1] - 1) / counts, y[-1])
+    indices = np.empty(target_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for k in range(target_points - 2):
+        lo, hi = starts[k], starts[k + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[k + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[k + 1] - y[a]))
+        a = lo + int(area.argmax())
+        indices[k + 1] = a
+    return indices
+
+
+def downsample_indices(x, y, target_points):
+    """
+    时序数据降采样索引：数据量远大于目标点数时先做 MinMax 预选，再在预选点上跑 LTTB（MinMaxLTTB）
+    """
+    n = len(y)
+    if n <= target_points or target_points < 3:
+        return np.arange(n)
+    if n > target_points * MINMAX_THRESHOLD:
+        selected = minmax_indices(np.asarray(y, dtype=np.float64), target_points * MINMAX_RATIO // 2)
+        return selected[lttb_indices(np.asarray(x)[selected], np.asarray(y)[selected], target_points)]
+    return lttb_indices(x, y, target_points)
 
-        for j in range(bucket_start, bucket_end):
-            # 计算三角形面积 (使用简化公式)
-            # 面积 = 0.5 * |x1(y2-y3) + x2(y3-y1) + x3(y1-y2)|
-            # 这里使用索引作为 x 坐标的近似
-            area = abs(
-                (a - avg_x) * (data[j]['y'] - data[a]['y']) -
-                (a - j) * (avg_y - data[a]['y'])
-            )
-            if area > max_area:
-                max_area = area
-                max_idx = j
 
-        sampled.append(data[max_idx])
-        a = max_idx
+def downsample_lttb(data: list, target_points: int) -> list:
+    """
+    LTTB 降采样 [{"x": ..., "y": ...}] 格式的数据
+    x 为 HH:MM:SS 字符串时按等间隔处理，有时间戳数组时请直接使用 downsample_indices
 
-    # 添加最后一个点
-    sampled.append(data[-1])
+    Args:
+        data: [{"x": timestamp, "y": value}, ...] 格式的时序数据
+        target_points: 目标数据点数量（建议 500-2000）
 
-    return sampled
+    Returns:
+        降采样后的数据列表，保留首尾点和关键特征点
+    """
+    if len(data) <= target_points or target_points < 3:
+        return data
+    y = np.array([item['y'] for item in data], dtype=np.float64)
+    return [data[i] for i in downsample_indices(np.arange(len(data)), y, target_points)]
 
 
 def get_ios_lockdown_client_in_common(device_id):
@@ -129,6 +164,13 @@ class Platform:
     Windows = 'Windows'
 
 class Devices:
+    # shared by every Devices instance, each module keeps its own `d = Devices()`
+    PID_CACHE_TTL = 30
+    _pid_cache = {}
+    _prop_cache = {}
+    _cache_lock = threading.Lock()
+    PROP_SECTION_RE = re.compile(r'^==magnax:(\w+)==$')
+    PROP_RE = re.compile(r'^\[(.+?)\]: \[(.*)\]$')
 
     def __init__(self, platform=Platform.Android):
         self.platform = platform
@@ -152,20 +194,72 @@ class Devices:
 
     def getDeviceIds(self):
         """Get all connected device ids"""
-        Ids = list(os.popen(f"{self.adb} devices").readlines())
-        deviceIds = []
-        for i in range(1, len(Ids) - 1):
-            id, state = Ids[i].strip().split()
-            if state == 'device':
-                deviceIds.append(id)
+        devices = tracker.devices(Platform.Android)
+        if devices is None:
+            devices = [device for device in adb.devices() if device['state'] == 'device']
+            self.syncDeviceCache([device['serial'] for device in devices], platform=Platform.Android)
+        deviceIds = [device['serial'] for device in devices]
         return deviceIds
 
+    def getDeviceProps(self, deviceId):
+        """getprop dump plus cpu/screen/wlan info of an Android device, one round trip then cached"""
+        props = self._prop_cache.get((Platform.Android, deviceId))
+        if props is not None:
+            return props
+        script = ('getprop; echo ==magnax:cpu_online==; cat /sys/devices/system/cpu/online; '
+                  'echo ==magnax:wm_size==; wm size; '
+                  'echo ==magnax:wlan==; ip addr show wlan0 | grep link/ether')
+        output = adb.shell(cmd=shlex.quote(script), deviceId=deviceId)
+        props, section = {}, None
+        for line in output.splitlines():
+            line = line.strip()
+            match_section = self.PROP_SECTION_RE.match(line)
+            if match_section:
+                section = match_section.group(1)
+                props[section] = ''
+            elif section:
+                props[section] = (props[section] + '\n' + line).strip()
+            else:
+                match_prop = self.PROP_RE.match(line)
+                if match_prop:
+                    props[match_prop.group(1)] = match_prop.group(2)
+        # nothing parsed means the device did not answer, don't cache that
+        if props.get('ro.product.model') is not None:
+            with self._cache_lock:
+                self._prop_cache[(Platform.Android, deviceId)] = props
+        return props
+
+    def getiOSDeviceValues(self, deviceId):
+        """lockdown all_values of an iOS device, cached"""
+        values = self._prop_cache.get((Platform.iOS, deviceId))
+        if values is None:
+            lockdown_client = get_ios_lockdown_client_in_common(deviceId)
+            if lockdown_client is None:
+                return None
+            values = lockdown_client.all_values
+            with self._cache_lock:
+                self._prop_cache[(Platform.iOS, deviceId)] = values
+        return values
+
+    @classmethod
+    def syncDeviceCache(cls, deviceIds, platform=Platform.Android):
+        """Drop cached properties and pids of devices of that platform that are gone"""
+        with cls._cache_lock:
+            cached = {key[1] for key in cls._prop_cache if key[0] == platform}
+        for deviceId in cached - set(deviceIds):
+            logger.info('[Devices] {} disconnected, drop its cache'.format(deviceId))
+            cls.clearDeviceCache(deviceId)
+
+    @classmethod
+    def clearDeviceCache(cls, deviceId=None):
+        with cls._cache_lock:
+            for key in [key for key in cls._prop_cache if deviceId is None or key[1] == deviceId]:
+                del cls._prop_cache[key]
+        cls.clearPidCache(deviceId)
+
     def getDevicesName(self, deviceId):
         """Get the device name of the Android corresponding device ID"""
-        try:
-            devices_name = os.popen(f'{self.adb} -s {deviceId} shell getprop ro.product.model').readlines()[0].strip()
-        except Exception:
-            devices_name = os.popen(f'{self.adb} -s {deviceId} shell getprop ro.product.model').buffer.readlines()[0].decode("utf-8").strip()
+        devices_name = self.getDeviceProps(deviceId).get('ro.product.model', '')
         return devices_name
 
     def getDevices(self):
@@ -179,35 +273,91 @@ class Devices:
         """Obtain the corresponding device id according to the Android device information"""
         if platform == Platform.Android:
             deviceId = re.sub(u"\\(.*?\\)|\\{.*?}|\\[.*?]", "", deviceinfo)
-            if deviceId not in self.getDeviceIds():
+            connected = tracker.is_connected(deviceId, platform)
+            if connected is None:
+                connected = deviceId in self.getDeviceIds()
+            if not connected:
                 raise Exception('no device found')
         else:
             deviceId = deviceinfo
         return deviceId
     
     def getSdkVersion(self, deviceId):
-        version = adb.shell(cmd='getprop ro.build.version.sdk', deviceId=deviceId)
+        version = self.getDeviceProps(deviceId).get('ro.build.version.sdk', '')
         return version
     
     def getCpuCores(self, deviceId):
         """get Android cpu cores"""
-        cmd = 'cat /sys/devices/system/cpu/online'
-        result = adb.shell(cmd=cmd, deviceId=deviceId)
+        result = self.getDeviceProps(deviceId).get('cpu_online', '')
         try:
             nums = int(result.split('-')[1]) + 1
         except:
             nums = 1
         return nums
 
+    @staticmethod
+    def parseStartTime(result):
+        """{pid: starttime} out of one or more /proc/<pid>/stat lines"""
+        starttimes = {}
+        for line in result.splitlines():
+            # comm may contain spaces, the fields after it start at field 3
+            head, _, tail = line.rpartition(')')
+            toks = tail.split()
+            if not head or len(toks) < 20:
+                continue
+            starttimes[head.split('(')[0].strip()] = toks[19]
+        return starttimes
+
+    def getStartTime(self, deviceId, pids):
+        cmd = 'cat {}'.format(' '.join('/proc/{}/stat'.format(pid) for pid in pids))
+        return self.parseStartTime(adb.shell(cmd=cmd, deviceId=deviceId))
+
     def getPid(self, deviceId, pkgName):
-        """Get the pid corresponding to the Android package name"""
+        """Get the pid corresponding to the Android package name, cached until the process restarts"""
+        key = (deviceId, pkgName)
+        with self._cache_lock:
+            entry = self._pid_cache.get(key)
+        if entry is not None:
+            expires, processList, starttimes = entry
+            if time.monotonic() < expires:
+                try:
+                    # one stat read instead of a ps scan: same pids with the same start time
+                    if self.getStartTime(deviceId, starttimes.keys()) == starttimes:
+                        return list(processList)
+                except Exception as e:
+                    logger.debug('[Devices] pid cache check failed: {}'.format(e))
+            logger.debug('[Devices] {} pid cache invalidated'.format(pkgName))
+        processList = self.scanPid(deviceId, pkgName)
+        with self._cache_lock:
+            self._pid_cache.pop(key, None)
+        if processList:
+            try:
+                pids = [process.split(':')[0] for process in processList]
+                starttimes = self.getStartTime(deviceId, pids)
+                if len(starttimes) == len(pids):
+                    with self._cache_lock:
+                        self._pid_cache[key] = (time.monotonic() + self.PID_CACHE_TTL, list(processList), starttimes)
+            except Exception as e:
+                logger.debug('[Devices] pid cache update failed: {}'.format(e))
+        return processList
+
+    @classmethod
+    def clearPidCache(cls, deviceId=None):
+        with cls._cache_lock:
+            for key in [key for key in cls._pid_cache if deviceId is None or key[0] == deviceId]:
+                del cls._pid_cache[key]
+
+    def scanPid(self, deviceId, pkgName):
+        """Get the pid corresponding to the Android package name with a full ps scan"""
         try:
             sdkversion = self.getSdkVersion(deviceId)
             if sdkversion and int(sdkversion) < 26:
-                result = os.popen(f"{self.adb} -s {deviceId} shell ps | {self.filterType()} {pkgName}").readlines()
+                result = adb.shell(cmd='ps', deviceId=deviceId).splitlines()
+                result = [process for process in result if pkgName in process]
                 processList = ['{}:{}'.format(process.split()[1],process.split()[8]) for process in result]
             else:
-                result = os.popen(f"{self.adb} -s {deviceId} shell ps -ef | {self.filterType()} {pkgName}").readlines()
+                result = adb.shell(cmd='ps -ef', deviceId=deviceId).splitlines()
+                result = [process for process in result if pkgName in process]
                 processList = ['{}:{}'.format(process.split()[1],process.split()[7]) for process in result]
             for i in range(len(processList)):
                 if processList[i].count(':') == 1:
@@ -231,18 +381,23 @@ class Devices:
 
     def getPkgname(self, deviceId):
         """Get all package names of Android devices"""
-        pkginfo = os.popen(f"{self.adb} -s {deviceId} shell pm list packages --user 0")
-        pkglist = [p.lstrip('package').lstrip(":").strip() for p in pkginfo]
+        pkginfo = adb.shell(cmd='pm list packages --user 0', deviceId=deviceId).splitlines()
+        pkglist = [p.lstrip('package').lstrip(":").strip() for p in pkginfo if p.strip()]
         if pkglist.__len__() > 0:
             return pkglist
         else:
-            pkginfo = os.popen(f"{self.adb} -s {deviceId} shell pm list packages")
-            pkglist = [p.lstrip('package').lstrip(":").strip() for p in pkginfo]
+            pkginfo = adb.shell(cmd='pm list packages', deviceId=deviceId).splitlines()
+            pkglist = [p.lstrip('package').lstrip(":").strip() for p in pkginfo if p.strip()]
             return pkglist
 
     def getDeviceInfoByiOS(self):
         """Get a list of all successfully connected iOS devices"""
-        deviceInfo = get_ios_device_udid_list()
+        devices = tracker.devices(Platform.iOS)
+        if devices is None:
+            deviceInfo = get_ios_device_udid_list()
+            self.syncDeviceCache(deviceInfo, platform=Platform.iOS)
+        else:
+            deviceInfo = [device['serial'] for device in devices]
         logger.info('Connected devices: {}'.format(deviceInfo))    
         return deviceInfo
 
@@ -278,7 +433,7 @@ class Devices:
         return ip
     
     def get_device_ip(self, deviceId):
-        content = os.popen(f"{self.adb} -s {deviceId} shell ip addr show wlan0").read()
+        content = adb.shell(cmd='ip addr show wlan0', deviceId=deviceId)
         logger.info(content)
         math_obj = re.search(r'inet\s(\d+\.\d+\.\d+\.\d+).*?wlan0', content)
         if math_obj and math_obj.group(1):
@@ -303,25 +458,23 @@ class Devices:
         result = dict()
         match(platform):
             case Platform.Android:
-                result['brand'] = adb.shell(cmd='getprop ro.product.brand', deviceId=deviceId)
-                result['name'] = adb.shell(cmd='getprop ro.product.model', deviceId=deviceId)
-                result['version'] = adb.shell(cmd='getprop ro.build.version.release', deviceId=deviceId)
-                result['serialno'] = adb.shell(cmd='getprop ro.serialno', deviceId=deviceId)
-                cmd = f'ip addr show wlan0 | {self.filterType()} link/ether'
-                wifiadr_content = adb.shell(cmd=cmd, deviceId=deviceId)                
-                result['wifiadr'] = Method._index(wifiadr_content.split(), 1, '')
+                props = self.getDeviceProps(deviceId)
+                result['brand'] = props.get('ro.product.brand', '')
+                result['name'] = props.get('ro.product.model', '')
+                result['version'] = props.get('ro.build.version.release', '')
+                result['serialno'] = props.get('ro.serialno', '')
+                result['wifiadr'] = Method._index(props.get('wlan', '').split(), 1, '')
                 result['cpu_cores'] = self.getCpuCores(deviceId)
-                result['physical_size'] = adb.shell(cmd='wm size', deviceId=deviceId).replace('Physical size:','').strip()
+                wm_size = props.get('wm_size', '').splitlines()
+                result['physical_size'] = wm_size[0].replace('Physical size:','').strip() if wm_size else ''
             case Platform.iOS:
                 try:
-                    lockdown_client = get_ios_lockdown_client_in_common(deviceId)
-                    if lockdown_client is None:
+                    # 从lockdown client获取设备信息
+                    device_info = self.getiOSDeviceValues(deviceId)
+                    if device_info is None:
                         logger.error("Failed to get lockdown client for iOS device details")
                         return {'brand': '', 'name': '', 'version': '', 'serialno': deviceId, 'wifiadr': '', 'cpu_cores': 0, 'physical_size': ''}
                     
-                    # 从lockdown client获取设备信息
-                    device_info = lockdown_client.all_values
-                    
                     result['brand'] = device_info.get("DeviceClass", "")
                     result['name'] = device_info.get("DeviceName", "")
                     result['version'] = device_info.get("ProductVersion", "")
@@ -338,13 +491,11 @@ class Devices:
     
     def getPhysicalSzieOfiOS(self, deviceId):
         try:
-            lockdown_client = get_ios_lockdown_client_in_common(deviceId)
-            if lockdown_client is None:
+            # 获取屏幕信息
+            device_info = self.getiOSDeviceValues(deviceId)
+            if device_info is None:
                 logger.error("Failed to get lockdown client for iOS screen info")
                 return ''
-            
-            # 获取屏幕信息
-            device_info = lockdown_client.all_values
             screen_width = device_info.get('ScreenWidth', 0)
             screen_height = device_info.get('ScreenHeight', 0)
             
@@ -377,8 +528,58 @@ class Devices:
         result = self.execCmd('pyidevice instruments app_lifecycle -b {}'.format(pkgname))       
         return result          
 
+def _drop_device_state(platform, added, removed):
+    """tracker listener: forget everything cached for a device once it is gone"""
+    for deviceId in removed:
+        Devices.clearDeviceCache(deviceId)
+        if platform == Platform.Android:
+            adb.close(deviceId)
+
+tracker.add_listener(_drop_device_state)
+
+
+class SceneSummary(object):
+    """result.json and the statistics of every series of a scene, built in one pass over its data"""
+
+    def __init__(self, info, stats):
+        self.info = info
+        self.stats = stats
+
+    @classmethod
+    def build(cls, file, scene):
+        info = file.readJson(scene) if file.hasResult(scene) else {}
+        stats = {}
+        for filename in file.seriesNames(scene):
+            _, values = file.readSeries(scene, filename)
+            result = series_stats(values)
+            if result is not None:
+                stats[column_name(filename)] = result
+        return cls(info, stats)
+
+    def has(self, name):
+        return name in self.stats
+
+    def get(self, name, stat, default=0):
+        """one statistic (count/sum/mean/min/max/p50/p90/p99/stddev/last) of a series, default when it is empty"""
+        return self.stats[name][stat] if name in self.stats else default
+
+
 class File:
 
+    # log series behind every chart of the analysis page, cpu_core depends on the scene's core count
+    LOG_SERIES = {
+        'cpu': ['cpu_app.log', 'cpu_sys.log'],
+        'mem': ['mem_total.log', 'mem_swap.log'],
+        'mem_detail': ['mem_java_heap.log', 'mem_native_heap.log', 'mem_code_pss.log', 'mem_stack_pss.log',
+                       'mem_graphics_pss.log', 'mem_private_pss.log', 'mem_system_pss.log'],
+        'battery': ['battery_level.log', 'battery_tem.log', 'battery_current.log', 'battery_voltage.log',
+                    'battery_power.log'],
+        'flow': ['upflow.log', 'downflow.log'],
+        'fps': ['fps.log', 'jank.log'],
+        'gpu': ['gpu.log'],
+        'disk': ['disk_used.log', 'disk_free.log'],
+    }
+
     def __init__(self, fileroot='.'):
         self.fileroot = fileroot
         self.report_dir = self.get_repordir()
@@ -409,9 +610,10 @@ class File:
         logger.info('Clean up useless files ...')
         if os.path.exists(self.report_dir):
             files_to_remove = []
+            close_writers(self.report_dir)
             for f in os.listdir(self.report_dir):
                 filename = os.path.join(self.report_dir, f)
-                if f.split(".")[-1] in ['log', 'json', 'mkv']:
+                if f.split(".")[-1] in ['log', 'json', 'mkv', 'mgx']:
                     files_to_remove.append(filename)
             
             # 先停止所有录屏进程，确保文件不被占用
@@ -436,25 +638,48 @@ class File:
                              'battery_voltage', 'battery_power','upflow','downflow','fps','gpu']
         log_file_list = android_log_file_list if platform == 'Android' else ios_log_file_list
         wb = openpyxl.Workbook()
-        # Remove the default sheet created by openpyxl
-        wb.remove(wb.active)
+        # the default sheet holds the statistics of every series
+        ws = wb.active
+        ws.title = 'summary'
+        stats = self.sceneSummary(scene)
+        columns = ['count', 'mean', 'min', 'max', 'p50', 'p90', 'p99', 'stddev']
+        ws.append(['Series'] + [column.capitalize() for column in columns])
+        for name in log_file_list:
+            if stats.has(name):
+                ws.append([name] + [stats.get(name, column) for column in columns])
         for name in log_file_list:
             ws = wb.create_sheet(title=name)
             ws.cell(row=1, column=1, value='Time')
             ws.cell(row=1, column=2, value='Value')
             row = 2  # start row (1-based, header is row 1)
-            if os.path.exists(f'{self.report_dir}/{scene}/{name}.log'):
-                with open(f'{self.report_dir}/{scene}/{name}.log', 'r', encoding='utf-8') as f:
-                    for lines in f:
-                        target = lines.split('=')
-                        for i in range(len(target)):
-                            ws.cell(row=row, column=i + 1, value=target[i])
-                        row += 1
+            log_data, _, _ = self.readLog(scene=scene, filename=f'{name}.log')
+            for point in log_data:
+                ws.cell(row=row, column=1, value=point['x'])
+                ws.cell(row=row, column=2, value=point['y'])
+                row += 1
         xlsx_path = os.path.join(self.report_dir, scene, f'{scene}.xlsx')
         wb.save(xlsx_path)
         logger.info('Exporting excel success : {}'.format(xlsx_path))
         return xlsx_path   
     
+    def reportCharts(self, platform, scene):
+        """chart payload of the HTML report, every chart built once"""
+        fps = self.getFpsLog(platform, scene)
+        charts = {
+            'cpu_charts': self.getCpuLog(platform, scene),
+            'mem_charts': self.getMemLog(platform, scene),
+            'net_charts': self.getFlowLog(platform, scene),
+            'battery_charts': self.getBatteryLog(platform, scene),
+            'gpu_charts': self.getGpuLog(platform, scene)
+        }
+        if platform == Platform.Android:
+            charts['mem_detail_charts'] = self.getMemDetailLog(platform, scene)
+            charts['fps_charts'] = fps['fps']
+            charts['jank_charts'] = fps['jank']
+        else:
+            charts['fps_charts'] = fps
+        return charts
+
     def make_android_html(self, scene, summary : dict, report_path=None):
         logger.info('Generating HTML ...')
         STATICPATH = os.path.dirname(os.path.realpath(__file__))
@@ -526,9 +751,23 @@ class File:
             file.write(content)
 
     def add_log(self, path, log_time, value):
+        """append a sample to the session store of the log's directory, the series is named after the log file"""
         if value >= 0:
-            with open(path, 'a+', encoding="utf-8") as file:
-                file.write(f'{log_time}={str(value)}' + '\n')
+            get_writer(os.path.dirname(path)).append(column_name(os.path.basename(path)),
+                                                     self.log_timestamp(log_time), value)
+
+    def log_timestamp(self, log_time):
+        """epoch seconds of a sample time: datetime, epoch, or HH:MM:SS.ffffff of today"""
+        if isinstance(log_time, datetime.datetime):
+            return log_time.timestamp()
+        if isinstance(log_time, (int, float)):
+            return float(log_time)
+        now = datetime.datetime.now()
+        stamp = datetime.datetime.combine(now.date(), datetime.datetime.strptime(log_time, '%H:%M:%S.%f').time())
+        # sampled just before midnight, written just after
+        if stamp - now > datetime.timedelta(hours=12):
+            stamp -= datetime.timedelta(days=1)
+        return stamp.timestamp()
     
     def record_net(self, type, send , recv):
         net_dict = dict()
@@ -605,6 +844,8 @@ class File:
         }
         content = json.dumps(result_dict)
         self.create_file(filename='result.json', content=content)
+        # flush buffered samples and release the session file before it is moved
+        close_writers(self.report_dir)
         report_new_dir = os.path.join(self.report_dir, f'apm_{current_time}')
         if not os.path.exists(report_new_dir):
             os.mkdir(report_new_dir)
@@ -613,7 +854,7 @@ class File:
         moved_files = []
         for f in os.listdir(self.report_dir):
             filename = os.path.join(self.report_dir, f)
-            if f.split(".")[-1] in ['log', 'json', 'mkv']:
+            if f.split(".")[-1] in ['log', 'json', 'mkv', 'mgx']:
                 # 检查文件是否真实存在且不是目录
                 if not os.path.isfile(filename):
                     logger.warning(f'跳过非文件项: {filename}')
@@ -642,6 +883,16 @@ class File:
         else:
             logger.info('没有文件需要移动')
             
+        # independent steps: charts fall back to scanning the raw series, or to LTTB without rollups
+        try:
+            compact(report_new_dir)
+        except Exception as e:
+            logger.exception(f'Compacting session data failed: {e}')
+        try:
+            build_rollups(report_new_dir)
+        except Exception as e:
+            logger.exception(f'Building rollups failed: {e}')
+
         logger.info('Generating test results success: {}'.format(report_new_dir))
         return f'apm_{current_time}'
 
@@ -664,7 +915,221 @@ class File:
         result_dict = json.loads(result_json)
         return result_dict
 
-    def readLog(self, scene, filename, max_points=0):
+    def hasResult(self, scene):
+        return os.path.exists(os.path.join(self.report_dir, scene, 'result.json'))
+
+    def seriesNames(self, scene):
+        """log file names of every series recorded in a scene"""
+        names = set()
+        with self.seriesReader(scene) as reader:
+            if reader is not None:
+                names.update('{}.log'.format(name) for name in reader.columns())
+        directory = os.path.join(self.report_dir, scene)
+        if os.path.isdir(directory):
+            names.update(name for name in os.listdir(directory) if name.endswith('.log'))
+        return sorted(names)
+
+    def sceneSummary(self, scene):
+        """the SceneSummary of a scene, shared by the summary cards, the HTML report and the Excel export"""
+        return scene_cache.cached(os.path.join(self.report_dir, scene), 'summary', self.sceneStamp(scene),
+                                  lambda: SceneSummary.build(self, scene))
+
+    def seriesReader(self, scene):
+        """
+        lease of the scene's session store reader, use as `with f.seriesReader(scene) as reader`;
+        the reader is None for scenes recorded as text logs. Readers are shared by every File of the process
+        """
+        return readers.open(store_path(os.path.join(self.report_dir, scene)))
+
+    def releaseSeries(self, scene=None):
+        """unmap the scene files (of every scene), they can't be renamed or removed on Windows while mapped"""
+        if scene:
+            readers.release(os.path.join(self.report_dir, scene))
+            scene_cache.drop(os.path.join(self.report_dir, scene))
+        else:
+            readers.release()
+
+    def fileStamp(self, path):
+        """(mtime, size) of a file, None when it is missing"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def sceneStamp(self, scene):
+        """stamps of every data file of a scene, a summary is stale when any of them changed"""
+        directory = os.path.join(self.report_dir, scene)
+        if not os.path.isdir(directory):
+            return None
+        return tuple(sorted((name, self.fileStamp(os.path.join(directory, name))) for name in os.listdir(directory)
+                            if name.split('.')[-1] in ['log', 'json', 'mgx', 'npy']))
+
+    def hasLog(self, scene, filename):
+        with self.seriesReader(scene) as reader:
+            if reader is not None and reader.has(column_name(filename)):
+                return True
+        return os.path.exists(os.path.join(self.report_dir, scene, filename))
+
+    def windowBound(self, value, first):
+        """
+        epoch of a start/end request parameter, the form is explicit:
+        @1718000000.5 epoch seconds, 90 or 90.5 seconds from the series start,
+        HH:MM:SS[.ffffff] the clock shown on the chart axis
+        """
+        if value is None or value == '':
+            return None
+        if isinstance(value, str) and value.startswith('@'):
+            return float(value[1:])
+        if isinstance(value, str) and ':' in value:
+            clock = datetime.datetime.strptime(value, '%H:%M:%S.%f' if '.' in value else '%H:%M:%S').time()
+            bound = datetime.datetime.combine(datetime.datetime.fromtimestamp(first).date(), clock).timestamp()
+            # a clock time far before the start belongs to the day after, the session ran past midnight
+            return bound + 86400 if bound < first - 43200 else bound
+        return first + float(value)
+
+    def seriesWindow(self, scene, start=None, end=None):
+        """
+        (start, end) epoch window of a scene, (None, None) when the whole series is asked for.
+        Relative bounds count from the scene start, every chart of a scene gets the same window
+        """
+        if start in (None, '') and end in (None, ''):
+            return None, None
+        first = self.sceneStart(scene)
+        return self.windowBound(start, first), self.windowBound(end, first)
+
+    def sceneStart(self, scene):
+        """epoch of the first sample of any series of a scene, 0 for an empty scene"""
+        return scene_cache.cached(os.path.join(self.report_dir, scene), 'start', self.sceneStamp(scene),
+                                  lambda: self.loadSceneStart(scene))
+
+    def loadSceneStart(self, scene):
+        starts, stored = [], set()
+        with self.seriesReader(scene) as reader:
+            if reader is not None:
+                stored = set(reader.columns())
+                if reader.start() is not None:
+                    starts.append(reader.start())
+        for filename in self.seriesNames(scene):
+            if column_name(filename) not in stored:
+                # scenes recorded as text logs
+                times, _ = self.readSeries(scene, filename)
+                if len(times):
+                    starts.append(float(times[0]))
+        return min(starts) if starts else 0
+
+    def seriesInfo(self, scene, filename):
+        """point count and time range of a series without reading its values, None when it is missing"""
+        with self.seriesReader(scene) as reader:
+            stored = reader is not None and reader.has(column_name(filename))
+            if stored:
+                count, bounds = reader.count(column_name(filename)), reader.bounds(column_name(filename))
+        if not stored:
+            if not os.path.exists(os.path.join(self.report_dir, scene, filename)):
+                return None
+            times, _ = self.readSeries(scene, filename)
+            count, bounds = len(times), (times[0], times[-1]) if len(times) else None
+        if not bounds:
+            return None
+        start, end = format_times(np.array(bounds))
+        return {'points': count, 'start': start, 'end': end}
+
+    def getLogManifest(self, platform, scene):
+        """which charts of a scene have data, so the analysis page only fetches what it shows"""
+        series = dict(self.LOG_SERIES)
+        cores = 0
+        if self.hasResult(scene):
+            cores = int(self.readJson(scene=scene).get('cores', 0) or 0)
+        series['cpu_core'] = ['cpu{}.log'.format(i) for i in range(cores)]
+        metrics = {}
+        for target, filenames in series.items():
+            info = {column_name(filename): self.seriesInfo(scene, filename) for filename in filenames}
+            info = {name: value for name, value in info.items() if value}
+            metrics[target] = {
+                'available': len(info) > 0,
+                'points': max((value['points'] for value in info.values()), default=0),
+                'series': info
+            }
+        return {'status': 1, 'scene': scene, 'platform': platform, 'metrics': metrics}
+
+    def readSeries(self, scene, filename, start=None, end=None):
+        """
+        (timestamps, values) numpy arrays of a series, limited to the [start, end] epoch window when given,
+        empty arrays when the scene has no such series
+        """
+        directory = os.path.join(self.report_dir, scene)
+        stamp = self.fileStamp(store_path(directory)), self.fileStamp(os.path.join(directory, filename))
+        stamp = stamp if any(stamp) else None
+        hit, series = scene_cache.get(directory, filename, stamp) if stamp else (False, None)
+        if not hit and (start is not None or end is not None):
+            with self.seriesReader(scene) as reader:
+                if reader is not None and reader.has(column_name(filename)):
+                    # a drill-down reads only its window off the map, the whole series is neither
+                    # materialized nor cached (it may not even fit the cache budget)
+                    return reader.read(column_name(filename), start, end)
+        if not hit:
+            # text logs are parsed whole anyway, keep them for the next window
+            series = scene_cache.cached(directory, filename, stamp, lambda: self.loadSeries(scene, filename))
+        times, values = series
+        lo = 0 if start is None else np.searchsorted(times, start, 'left')
+        hi = len(times) if end is None else np.searchsorted(times, end, 'right')
+        return times[lo:hi], values[lo:hi]
+
+    def loadSeries(self, scene, filename):
+        """parse a whole series from disk, readSeries serves it from the scene cache afterwards"""
+        with self.seriesReader(scene) as reader:
+            if reader is not None and reader.has(column_name(filename)):
+                return reader.read(column_name(filename))
+        path = os.path.join(self.report_dir, scene, filename)
+        if os.path.exists(path):
+            # scenes recorded before the session store
+            return read_text_log(path)
+        return np.empty(0), np.empty(0)
+
+    def rollupTiers(self, scene):
+        """{seconds: tier} of a finished scene, empty for scenes without rollups"""
+        # the maps are not kept: rollupSeries caches copies of the columns, a held map would block a rename
+        directory = os.path.join(self.report_dir, scene)
+        tiers = {seconds: load_rollup(directory, seconds) for seconds in ROLLUP_TIERS}
+        return {seconds: tier for seconds, tier in tiers.items() if tier is not None}
+
+    def rollupSeries(self, scene, filename, max_points, start=None, end=None):
+        """
+        (times, values, total_points) of a series from the coarsest rollup tier that still has
+        max_points extreme points, None when the raw series is small enough or there are no rollups
+        """
+        directory = os.path.join(self.report_dir, scene)
+        stamp = tuple(self.fileStamp(rollup_path(directory, seconds)) for seconds in ROLLUP_TIERS)
+        columns = scene_cache.cached(directory, 'rollup:' + filename, stamp if any(stamp) else None,
+                                     lambda: {seconds: rollup_column(tier, column_name(filename)).copy()
+                                              for seconds, tier in self.rollupTiers(scene).items()})
+        if not columns:
+            return None
+        buckets = {}
+        for seconds, column in columns.items():
+            # buckets overlapping the window
+            lo = 0 if start is None else np.searchsorted(column['time'], start - seconds, 'right')
+            hi = len(column) if end is None else np.searchsorted(column['time'], end, 'right')
+            buckets[seconds] = column[lo:hi]
+        total_points = int(buckets[min(buckets)]['count'].sum())
+        if total_points <= max_points:
+            return None
+        for seconds in sorted(buckets, reverse=True):
+            # every bucket contributes its min and max sample
+            if 2 * len(buckets[seconds]) >= max_points:
+                times, values = extreme_points(buckets[seconds])
+                inside = (times >= (start if start is not None else -np.inf)) & \
+                         (times <= (end if end is not None else np.inf))
+                times, values = times[inside], values[inside]
+                if max_points <= len(values) < total_points:
+                    return times, values, total_points
+        return None
+
+    def toPoints(self, times, values):
+        """chart points of a series, only built at the JSON boundary"""
+        return [{"x": x, "y": y} for x, y in zip(format_times(times), to_python(values))]
+
+    def readLog(self, scene, filename, max_points=0, start=None, end=None):
         """
         Read apmlog file data with optional downsampling
 
@@ -672,6 +1137,7 @@ class File:
             scene: 场景名称
             filename: 日志文件名
             max_points: 最大数据点数，0 表示不采样，默认 0
+            start/end: 时间窗口，@epoch 秒、相对场景开始的秒数或 HH:MM:SS，只读取并降采样窗口内的数据
 
         Returns:
             (log_data_list, target_data_list, total_points) 三元组
@@ -679,39 +1145,29 @@ class File:
             - target_data_list: [value, ...]
             - total_points: 原始数据点总数
         """
-        log_data_list = list()
-        target_data_list = list()
-        if os.path.exists(os.path.join(self.report_dir, scene, filename)):
-            lines = self.open_file(os.path.join(self.report_dir, scene, filename), "r")
-            for line in lines:
-                if isinstance(line.split('=')[1].strip(), int):
-                    log_data_list.append({
-                        "x": line.split('=')[0].strip(),
-                        "y": int(line.split('=')[1].strip())
-                    })
-                    target_data_list.append(int(line.split('=')[1].strip()))
-                else:
-                    log_data_list.append({
-                        "x": line.split('=')[0].strip(),
-                        "y": float(line.split('=')[1].strip())
-                    })
-                    target_data_list.append(float(line.split('=')[1].strip()))
-
-        # 记录原始数据点数量
-        total_points = len(log_data_list)
+        start, end = self.seriesWindow(scene, start, end)
+        tier = self.rollupSeries(scene, filename, max_points, start, end) if max_points > 0 else None
+        if tier is not None:
+            # 预聚合层级的极值点已接近目标分辨率，数据量与录制时长无关
+            times, values, total_points = tier
+        else:
+            times, values = self.readSeries(scene, filename, start, end)
+            # 记录原始数据点数量
+            total_points = len(values)
 
-        # 应用 LTTB 降采样
-        if max_points > 0 and len(log_data_list) > max_points:
-            log_data_list = downsample_lttb(log_data_list, max_points)
-            # 重建 target_data_list
-            target_data_list = [item['y'] for item in log_data_list]
+        # 应用 LTTB 降采样，只有保留下来的点才转成 dict
+        if max_points > 0 and len(values) > max_points:
+            keep = downsample_indices(times, values, max_points)
+            times, values = times[keep], values[keep]
 
+        log_data_list = self.toPoints(times, values)
+        target_data_list = [item['y'] for item in log_data_list]
         return log_data_list, target_data_list, total_points
         
-    def getCpuLog(self, platform, scene, max_points=0):
+    def getCpuLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        cpu_app_data, _, cpu_app_total = self.readLog(scene=scene, filename='cpu_app.log', max_points=max_points)
-        cpu_sys_data, _, cpu_sys_total = self.readLog(scene=scene, filename='cpu_sys.log', max_points=max_points)
+        cpu_app_data, _, cpu_app_total = self.readLog(scene=scene, filename='cpu_app.log', max_points=max_points, start=start, end=end)
+        cpu_sys_data, _, cpu_sys_total = self.readLog(scene=scene, filename='cpu_sys.log', max_points=max_points, start=start, end=end)
         targetDic['cpuAppData'] = cpu_app_data
         targetDic['cpuSysData'] = cpu_sys_data
         result = {
@@ -726,10 +1182,10 @@ class File:
         }
         return result
     
-    def getCpuLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getCpuLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='cpu_app.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='cpu_app.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='cpu_app.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='cpu_app.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -744,9 +1200,9 @@ class File:
         }
         return result
     
-    def getGpuLog(self, platform, scene, max_points=0):
+    def getGpuLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        gpu_data, _, total_points = self.readLog(scene=scene, filename='gpu.log', max_points=max_points)
+        gpu_data, _, total_points = self.readLog(scene=scene, filename='gpu.log', max_points=max_points, start=start, end=end)
         targetDic['gpu'] = gpu_data
         result = {
             'status': 1,
@@ -759,10 +1215,10 @@ class File:
         }
         return result
     
-    def getGpuLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getGpuLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='gpu.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='gpu.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='gpu.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='gpu.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -777,13 +1233,13 @@ class File:
         }
         return result
     
-    def getMemLog(self, platform, scene, max_points=0):
+    def getMemLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        mem_total_data, _, mem_total_total = self.readLog(scene=scene, filename='mem_total.log', max_points=max_points)
+        mem_total_data, _, mem_total_total = self.readLog(scene=scene, filename='mem_total.log', max_points=max_points, start=start, end=end)
         targetDic['memTotalData'] = mem_total_data
         total_points = mem_total_total
         if platform == Platform.Android:
-            mem_swap_data, _, mem_swap_total = self.readLog(scene=scene, filename='mem_swap.log', max_points=max_points)
+            mem_swap_data, _, mem_swap_total = self.readLog(scene=scene, filename='mem_swap.log', max_points=max_points, start=start, end=end)
             targetDic['memSwapData'] = mem_swap_data
             total_points = max(mem_total_total, mem_swap_total)
             result = {
@@ -808,7 +1264,7 @@ class File:
             }
         return result
     
-    def getMemDetailLog(self, platform, scene, max_points=0):
+    def getMemDetailLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
         total_points_list = []
         for key, filename in [
@@ -820,7 +1276,7 @@ class File:
             ('private_pss', 'mem_private_pss.log'),
             ('system_pss', 'mem_system_pss.log')
         ]:
-            data, _, total = self.readLog(scene=scene, filename=filename, max_points=max_points)
+            data, _, total = self.readLog(scene=scene, filename=filename, max_points=max_points, start=start, end=end)
             targetDic[key] = data
             total_points_list.append(total)
         max_total = max(total_points_list) if total_points_list else 0
@@ -835,13 +1291,13 @@ class File:
         }
         return result
     
-    def getCpuCoreLog(self, platform, scene, max_points=0):
+    def getCpuCoreLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
         cores = self.readJson(scene=scene).get('cores', 0)
         total_points_list = []
         if int(cores) > 0:
             for i in range(int(cores)):
-                data, _, total = self.readLog(scene=scene, filename='cpu{}.log'.format(i), max_points=max_points)
+                data, _, total = self.readLog(scene=scene, filename='cpu{}.log'.format(i), max_points=max_points, start=start, end=end)
                 targetDic['cpu{}'.format(i)] = data
                 total_points_list.append(total)
         max_total = max(total_points_list) if total_points_list else 0
@@ -857,10 +1313,10 @@ class File:
         }
         return result
     
-    def getMemLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getMemLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='mem_total.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='mem_total.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='mem_total.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='mem_total.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -875,12 +1331,12 @@ class File:
         }
         return result
     
-    def getBatteryLog(self, platform, scene, max_points=0):
+    def getBatteryLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
         total_points_list = []
         if platform == Platform.Android:
-            level_data, _, level_total = self.readLog(scene=scene, filename='battery_level.log', max_points=max_points)
-            tem_data, _, tem_total = self.readLog(scene=scene, filename='battery_tem.log', max_points=max_points)
+            level_data, _, level_total = self.readLog(scene=scene, filename='battery_level.log', max_points=max_points, start=start, end=end)
+            tem_data, _, tem_total = self.readLog(scene=scene, filename='battery_tem.log', max_points=max_points, start=start, end=end)
             targetDic['batteryLevel'] = level_data
             targetDic['batteryTem'] = tem_data
             total_points_list = [level_total, tem_total]
@@ -895,10 +1351,10 @@ class File:
                 }
             }
         else:
-            tem_data, _, tem_total = self.readLog(scene=scene, filename='battery_tem.log', max_points=max_points)
-            current_data, _, current_total = self.readLog(scene=scene, filename='battery_current.log', max_points=max_points)
-            voltage_data, _, voltage_total = self.readLog(scene=scene, filename='battery_voltage.log', max_points=max_points)
-            power_data, _, power_total = self.readLog(scene=scene, filename='battery_power.log', max_points=max_points)
+            tem_data, _, tem_total = self.readLog(scene=scene, filename='battery_tem.log', max_points=max_points, start=start, end=end)
+            current_data, _, current_total = self.readLog(scene=scene, filename='battery_current.log', max_points=max_points, start=start, end=end)
+            voltage_data, _, voltage_total = self.readLog(scene=scene, filename='battery_voltage.log', max_points=max_points, start=start, end=end)
+            power_data, _, power_total = self.readLog(scene=scene, filename='battery_power.log', max_points=max_points, start=start, end=end)
             targetDic['batteryTem'] = tem_data
             targetDic['batteryCurrent'] = current_data
             targetDic['batteryVoltage'] = voltage_data
@@ -918,14 +1374,14 @@ class File:
             }
         return result
     
-    def getBatteryLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getBatteryLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
         if platform == Platform.Android:
-            scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='battery_level.log', max_points=max_points)
-            scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='battery_level.log', max_points=max_points)
+            scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='battery_level.log', max_points=max_points, start=start, end=end)
+            scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='battery_level.log', max_points=max_points, start=start, end=end)
         else:
-            scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='batteryPower.log', max_points=max_points)
-            scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='batteryPower.log', max_points=max_points)
+            scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='batteryPower.log', max_points=max_points, start=start, end=end)
+            scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='batteryPower.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -940,10 +1396,10 @@ class File:
         }
         return result
     
-    def getFlowLog(self, platform, scene, max_points=0):
+    def getFlowLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        up_data, _, up_total = self.readLog(scene=scene, filename='upflow.log', max_points=max_points)
-        down_data, _, down_total = self.readLog(scene=scene, filename='downflow.log', max_points=max_points)
+        up_data, _, up_total = self.readLog(scene=scene, filename='upflow.log', max_points=max_points, start=start, end=end)
+        down_data, _, down_total = self.readLog(scene=scene, filename='downflow.log', max_points=max_points, start=start, end=end)
         targetDic['upFlow'] = up_data
         targetDic['downFlow'] = down_data
         max_total = max(up_total, down_total)
@@ -959,10 +1415,10 @@ class File:
         }
         return result
     
-    def getFlowSendLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getFlowSendLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='upflow.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='upflow.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='upflow.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='upflow.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -977,10 +1433,10 @@ class File:
         }
         return result
     
-    def getFlowRecvLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getFlowRecvLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='downflow.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='downflow.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='downflow.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='downflow.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -995,13 +1451,13 @@ class File:
         }
         return result
     
-    def getFpsLog(self, platform, scene, max_points=0):
+    def getFpsLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        fps_data, _, fps_total = self.readLog(scene=scene, filename='fps.log', max_points=max_points)
+        fps_data, _, fps_total = self.readLog(scene=scene, filename='fps.log', max_points=max_points, start=start, end=end)
         targetDic['fps'] = fps_data
         total_points = fps_total
         if platform == Platform.Android:
-            jank_data, _, jank_total = self.readLog(scene=scene, filename='jank.log', max_points=max_points)
+            jank_data, _, jank_total = self.readLog(scene=scene, filename='jank.log', max_points=max_points, start=start, end=end)
             targetDic['jank'] = jank_data
             total_points = max(fps_total, jank_total)
             result = {
@@ -1026,10 +1482,10 @@ class File:
             }
         return result
     
-    def getDiskLog(self, platform, scene, max_points=0):
+    def getDiskLog(self, platform, scene, max_points=0, start=None, end=None):
         targetDic = dict()
-        used_data, _, used_total = self.readLog(scene=scene, filename='disk_used.log', max_points=max_points)
-        free_data, _, free_total = self.readLog(scene=scene, filename='disk_free.log', max_points=max_points)
+        used_data, _, used_total = self.readLog(scene=scene, filename='disk_used.log', max_points=max_points, start=start, end=end)
+        free_data, _, free_total = self.readLog(scene=scene, filename='disk_free.log', max_points=max_points, start=start, end=end)
         targetDic['used'] = used_data
         targetDic['free'] = free_data
         max_total = max(used_total, free_total)
@@ -1100,10 +1556,10 @@ class File:
                  
         return initail_disk_list, current_disk_list, sum_init_disk, sum_current_disk
 
-    def getFpsLogCompare(self, platform, scene1, scene2, max_points=0):
+    def getFpsLogCompare(self, platform, scene1, scene2, max_points=0, start=None, end=None):
         targetDic = dict()
-        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='fps.log', max_points=max_points)
-        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='fps.log', max_points=max_points)
+        scene1_data, _, scene1_total = self.readLog(scene=scene1, filename='fps.log', max_points=max_points, start=start, end=end)
+        scene2_data, _, scene2_total = self.readLog(scene=scene2, filename='fps.log', max_points=max_points, start=start, end=end)
         targetDic['scene1'] = scene1_data
         targetDic['scene2'] = scene2_data
         result = {
@@ -1142,44 +1598,38 @@ class File:
                 return '{0:.2f} {1}'.format(size, suffix)
     
     def _setAndroidPerfs(self, scene):
-        """Aggregate APM data for Android"""
-
-        app = self.readJson(scene=scene).get('app')
-        devices = self.readJson(scene=scene).get('devices')
-        platform = self.readJson(scene=scene).get('platform')
-        ctime = self.readJson(scene=scene).get('ctime')
-
-        _, cpuAppData, _ = self.readLog(scene=scene, filename=f'cpu_app.log')
-        _, cpuSystemData, _ = self.readLog(scene=scene, filename=f'cpu_sys.log')
-        if cpuAppData.__len__() > 0 and cpuSystemData.__len__() > 0:
-            cpuAppRate = f'{round(sum(cpuAppData) / len(cpuAppData), 2)}%'
-            cpuSystemRate = f'{round(sum(cpuSystemData) / len(cpuSystemData), 2)}%'
+        """Aggregate APM data for Android, computed once per scene version"""
+        return scene_cache.cachedCopy(os.path.join(self.report_dir, scene), 'perfs:android', self.sceneStamp(scene),
+                                      lambda: self._aggregateAndroidPerfs(scene))
+
+    def _aggregateAndroidPerfs(self, scene):
+        summary = self.sceneSummary(scene)
+        app = summary.info.get('app')
+        devices = summary.info.get('devices')
+        platform = summary.info.get('platform')
+        ctime = summary.info.get('ctime')
+
+        if summary.has('cpu_app') and summary.has('cpu_sys'):
+            cpuAppRate = f'{round(summary.get("cpu_app", "mean"), 2)}%'
+            cpuSystemRate = f'{round(summary.get("cpu_sys", "mean"), 2)}%'
         else:
             cpuAppRate, cpuSystemRate = 0, 0
 
-        _, batteryLevelData, _ = self.readLog(scene=scene, filename=f'battery_level.log')
-        _, batteryTemlData, _ = self.readLog(scene=scene, filename=f'battery_tem.log')
-        if batteryLevelData.__len__() > 0 and batteryTemlData.__len__() > 0:
-            batteryLevel = f'{batteryLevelData[-1]}%'
-            batteryTeml = f'{batteryTemlData[-1]}°C'
+        if summary.has('battery_level') and summary.has('battery_tem'):
+            batteryLevel = f'{summary.get("battery_level", "last")}%'
+            batteryTeml = f'{summary.get("battery_tem", "last")}°C'
         else:
             batteryLevel, batteryTeml = 0, 0
 
-
-        _, totalPassData, _ = self.readLog(scene=scene, filename=f'mem_total.log')
-
-        if totalPassData.__len__() > 0:
-            _, swapPassData, _ = self.readLog(scene=scene, filename=f'mem_swap.log')
-            totalPassAvg = f'{round(sum(totalPassData) / len(totalPassData), 2)}MB'
-            swapPassAvg = f'{round(sum(swapPassData) / len(swapPassData), 2)}MB'
+        if summary.has('mem_total'):
+            totalPassAvg = f'{round(summary.get("mem_total", "mean"), 2)}MB'
+            swapPassAvg = f'{round(summary.get("mem_swap", "mean"), 2)}MB'
         else:
             totalPassAvg, swapPassAvg = 0, 0
 
-        _, fpsData, _ = self.readLog(scene=scene, filename=f'fps.log')
-        _, jankData, _ = self.readLog(scene=scene, filename=f'jank.log')
-        if fpsData.__len__() > 0:
-            fpsAvg = f'{int(sum(fpsData) / len(fpsData))}HZ/s'
-            jankAvg = f'{int(sum(jankData))}'
+        if summary.has('fps'):
+            fpsAvg = f'{int(summary.get("fps", "mean"))}HZ/s'
+            jankAvg = f'{int(summary.get("jank", "sum"))}'
         else:
             fpsAvg, jankAvg = 0, 0
 
@@ -1196,16 +1646,12 @@ class File:
         flowSend = f'{round(float(send / 1024), 2)}MB'
         flowRecv = f'{round(float(recv / 1024), 2)}MB'
 
-        _, gpuData, _ = self.readLog(scene=scene, filename='gpu.log')
-        if gpuData.__len__() > 0:
-            gpu = round(sum(gpuData) / len(gpuData), 2)
-        else:
-            gpu = 0
+        gpu = round(summary.get('gpu', 'mean'), 2)
 
-        mem_detail_flag = os.path.exists(os.path.join(self.report_dir,scene,'mem_java_heap.log'))
-        disk_flag = os.path.exists(os.path.join(self.report_dir,scene,'disk_free.log'))
+        mem_detail_flag = summary.has('mem_java_heap')
+        disk_flag = summary.has('disk_free')
         thermal_flag = os.path.exists(os.path.join(self.report_dir,scene,'init_thermal_temp.json'))
-        cpu_core_flag = os.path.exists(os.path.join(self.report_dir,scene,'cpu0.log'))
+        cpu_core_flag = summary.has('cpu0')
         apm_dict = dict()
         apm_dict['app'] = app
         apm_dict['devices'] = devices
@@ -1226,6 +1672,7 @@ class File:
         apm_dict['gpu'] = gpu
         apm_dict['thermal_flag'] = thermal_flag
         apm_dict['cpu_core_flag'] = cpu_core_flag
+        apm_dict['stats'] = summary.stats
         
         if thermal_flag:
             init_thermal_temp = json.loads(open(os.path.join(self.report_dir,scene,'init_thermal_temp.json')).read())
@@ -1236,59 +1683,49 @@ class File:
         return apm_dict
 
     def _setiOSPerfs(self, scene):
-        """Aggregate APM data for iOS"""
-
-        app = self.readJson(scene=scene).get('app')
-        devices = self.readJson(scene=scene).get('devices')
-        platform = self.readJson(scene=scene).get('platform')
-        ctime = self.readJson(scene=scene).get('ctime')
-
-        _, cpuAppData, _ = self.readLog(scene=scene, filename=f'cpu_app.log')
-        _, cpuSystemData, _ = self.readLog(scene=scene, filename=f'cpu_sys.log')
-        if cpuAppData.__len__() > 0 and cpuSystemData.__len__() > 0:
-            cpuAppRate = f'{round(sum(cpuAppData) / len(cpuAppData), 2)}%'
-            cpuSystemRate = f'{round(sum(cpuSystemData) / len(cpuSystemData), 2)}%'
+        """Aggregate APM data for iOS, computed once per scene version"""
+        return scene_cache.cachedCopy(os.path.join(self.report_dir, scene), 'perfs:ios', self.sceneStamp(scene),
+                                      lambda: self._aggregateiOSPerfs(scene))
+
+    def _aggregateiOSPerfs(self, scene):
+        summary = self.sceneSummary(scene)
+        app = summary.info.get('app')
+        devices = summary.info.get('devices')
+        platform = summary.info.get('platform')
+        ctime = summary.info.get('ctime')
+
+        if summary.has('cpu_app') and summary.has('cpu_sys'):
+            cpuAppRate = f'{round(summary.get("cpu_app", "mean"), 2)}%'
+            cpuSystemRate = f'{round(summary.get("cpu_sys", "mean"), 2)}%'
         else:
             cpuAppRate, cpuSystemRate = 0, 0
 
-        _, totalPassData, _ = self.readLog(scene=scene, filename='mem_total.log')
-        if totalPassData.__len__() > 0:
-            totalPassAvg = f'{round(sum(totalPassData) / len(totalPassData), 2)}MB'
+        if summary.has('mem_total'):
+            totalPassAvg = f'{round(summary.get("mem_total", "mean"), 2)}MB'
         else:
             totalPassAvg = 0
 
-        _, fpsData, _ = self.readLog(scene=scene, filename='fps.log')
-        if fpsData.__len__() > 0:
-            fpsAvg = f'{int(sum(fpsData) / len(fpsData))}HZ/s'
+        if summary.has('fps'):
+            fpsAvg = f'{int(summary.get("fps", "mean"))}HZ/s'
         else:
             fpsAvg = 0
 
-        _, flowSendData, _ = self.readLog(scene=scene, filename='upflow.log')
-        _, flowRecvData, _ = self.readLog(scene=scene, filename='downflow.log')
-        if flowSendData.__len__() > 0:
-            flowSend = f'{round(float(sum(flowSendData) / 1024), 2)}MB'
-            flowRecv = f'{round(float(sum(flowRecvData) / 1024), 2)}MB'
+        if summary.has('upflow'):
+            flowSend = f'{round(float(summary.get("upflow", "sum") / 1024), 2)}MB'
+            flowRecv = f'{round(float(summary.get("downflow", "sum") / 1024), 2)}MB'
         else:
             flowSend, flowRecv = 0, 0
 
-        _, batteryTemlData, _ = self.readLog(scene=scene, filename='battery_tem.log')
-        _, batteryCurrentData, _ = self.readLog(scene=scene, filename='battery_current.log')
-        _, batteryVoltageData, _ = self.readLog(scene=scene, filename='battery_voltage.log')
-        _, batteryPowerData, _ = self.readLog(scene=scene, filename='battery_power.log')
-        if batteryTemlData.__len__() > 0:
-            batteryTeml = int(batteryTemlData[-1])
-            batteryCurrent = int(sum(batteryCurrentData) / len(batteryCurrentData))
-            batteryVoltage = int(sum(batteryVoltageData) / len(batteryVoltageData))
-            batteryPower = int(sum(batteryPowerData) / len(batteryPowerData))
+        if summary.has('battery_tem'):
+            batteryTeml = int(summary.get('battery_tem', 'last'))
+            batteryCurrent = int(summary.get('battery_current', 'mean'))
+            batteryVoltage = int(summary.get('battery_voltage', 'mean'))
+            batteryPower = int(summary.get('battery_power', 'mean'))
         else:
             batteryTeml, batteryCurrent, batteryVoltage, batteryPower = 0, 0, 0, 0
 
-        _, gpuData, _ = self.readLog(scene=scene, filename='gpu.log')
-        if gpuData.__len__() > 0:
-            gpu = round(sum(gpuData) / len(gpuData), 2)
-        else:
-            gpu = 0
-        disk_flag = os.path.exists(os.path.join(self.report_dir, scene, 'disk_free.log'))
+        gpu = round(summary.get('gpu', 'mean'), 2)
+        disk_flag = summary.has('disk_free')
         apm_dict = dict()
         apm_dict['app'] = app
         apm_dict['devices'] = devices
@@ -1309,6 +1746,7 @@ class File:
         apm_dict['batteryPower'] = batteryPower
         apm_dict['gpu'] = gpu
         apm_dict['disk_flag'] = disk_flag
+        apm_dict['stats'] = summary.stats
         return apm_dict
 
     def _setpkPerfs(self, scene):
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  in-memory registry of connected devices.
+            Android is pushed by the adb server (host:track-devices), iOS is refreshed from usbmux,
+            so validating a device id is a dict lookup instead of an adb/usbmux call per request.
+"""
+import os
+import threading
+import time
+from loguru import logger
+from magnax.public.adb import adb
+
+try:
+    from pymobiledevice3.usbmux import list_devices as pmd3_list_devices
+    PMD3_AVAILABLE = True
+except ImportError:
+    pmd3_list_devices = None
+    PMD3_AVAILABLE = False
+
+
+class DeviceTracker(object):
+    """Background threads keep {serial: device} per platform, listeners hear about (dis)connects"""
+
+    def __init__(self, retry=3, ios_interval=2):
+        self.retry = retry
+        self.ios_interval = ios_interval
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._started = False
+        self._devices = {'Android': {}, 'iOS': {}}
+        self._ready = {'Android': threading.Event(), 'iOS': threading.Event()}
+
+    def _check_fork(self):
+        # threads do not survive fork, a collector process starts its own tracker
+        if self._pid != os.getpid():
+            self._reset()
+
+    def add_listener(self, callback):
+        """callback(platform, added, removed) is called from the tracker thread on every change"""
+        self._listeners.append(callback)
+
+    def start(self):
+        with self._lock:
+            self._check_fork()
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._track_android, name='magnax-track-android', daemon=True).start()
+        if PMD3_AVAILABLE:
+            threading.Thread(target=self._track_ios, name='magnax-track-ios', daemon=True).start()
+
+    def _update(self, platform, devices):
+        with self._lock:
+            previous = self._devices[platform]
+            self._devices[platform] = devices
+        added = [serial for serial in devices if serial not in previous]
+        removed = [serial for serial in previous if serial not in devices]
+        self._ready[platform].set()
+        if added or removed:
+            logger.info('[DeviceTracker] {} added: {} removed: {}'.format(platform, added, removed))
+            for callback in self._listeners:
+                try:
+                    callback(platform, added, removed)
+                except Exception as e:
+                    logger.exception(e)
+
+    def _track_android(self):
+        while True:
+            try:
+                for devices in adb.client.track_devices():
+                    self._update('Android', {device['serial']: device for device in devices if device['state'] == 'device'})
+            except Exception as e:
+                logger.debug('[DeviceTracker] adb track-devices lost: {}'.format(e))
+            # the registry is stale until the server is back, callers fall back to a live listing
+            self._ready['Android'].clear()
+            time.sleep(self.retry)
+
+    def _track_ios(self):
+        while True:
+            try:
+                self._update('iOS', {device.serial: {'serial': device.serial} for device in pmd3_list_devices()})
+            except Exception as e:
+                logger.debug('[DeviceTracker] usbmux listing failed: {}'.format(e))
+                self._ready['iOS'].clear()
+            time.sleep(self.ios_interval)
+
+    def ready(self, platform):
+        self.start()
+        return self._ready[platform].is_set()
+
+    def devices(self, platform):
+        """list of device dicts, or None when the registry is not live yet"""
+        if not self.ready(platform):
+            return None
+        with self._lock:
+            return list(self._devices[platform].values())
+
+    def is_connected(self, serial, platform):
+        """dict lookup when the registry is live, None when the caller has to ask adb/usbmux itself"""
+        if not self.ready(platform):
+            return None
+        with self._lock:
+            return serial in self._devices[platform]
+
+
+tracker = DeviceTracker()
@@ -11,29 +11,95 @@ For iOS 17+: Uses tunneld service
 For iOS < 17: Uses direct USB connection via lockdown
 """
 
+import os
 import time
 import asyncio
+import collections
+import inspect
 import threading
 from dataclasses import dataclass, field
 from typing import Tuple, Optional, Dict, Any, List
 from loguru import logger
 
 
-def _run_async(coro):
-    """Run an async coroutine in sync context."""
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
+class EventLoopThread:
+    """
+    One asyncio event loop on a daemon thread, shared by every iOS device of the process.
+
+    Coroutines (RSD/DVT work of async pymobiledevice3 versions) are scheduled onto it from any
+    thread and waited on through concurrent futures, so connections created by a coroutine stay
+    on the loop that owns them and no call pays for a fresh loop or executor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # the loop thread does not survive fork, a collector process starts its own
+        self._pid = os.getpid()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='magnax-ios-loop', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def in_loop(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop, returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def run(self, coro, timeout: Optional[float] = 30):
+        """Run a coroutine on the loop and wait for its result from sync code."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError('blocking on the iOS event loop from inside it, await the coroutine instead')
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
+
+io_loop = EventLoopThread()
+
+
+def _run_async(coro, timeout: Optional[float] = 30):
+    """Run an async coroutine in sync context, on the shared iOS event loop."""
+    return io_loop.run(coro, timeout)
+
+
+async def _await(awaitable):
+    return await awaitable
 
-    if loop and loop.is_running():
-        # We're already in an async context, create a new loop in a thread
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            future = pool.submit(asyncio.run, coro)
-            return future.result(timeout=30)
-    else:
-        return asyncio.run(coro)
+
+def _resolve(value, timeout: Optional[float] = 30):
+    """pymobiledevice3 returns coroutines from some calls depending on its version, wait for those on the shared loop."""
+    if inspect.isawaitable(value):
+        return _run_async(value if inspect.iscoroutine(value) else _await(value), timeout)
+    return value
+
+
+# Process columns the adapter reads: app matching, CPU and memory. Sysmontap sends every
+# configured column of every process each sample, the device default is several dozen.
+SYSMON_PROCESS_ATTRIBUTES = ('pid', 'name', 'execName', 'cpuUsage', 'cpuTotalUser', 'cpuTotalSystem',
+                             'physFootprint', 'memResidentSize', 'memVirtualSize')
 
 
 @dataclass
@@ -58,6 +124,18 @@ class PerformanceCache:
         return (time.time() - self.timestamp) < ttl
 
 
+@dataclass(frozen=True)
+class SysmonSnapshot:
+    """Metrics derived from one Sysmontap sample, replaced as a whole so readers never need a lock."""
+    timestamp: float
+    cpu_app: float
+    cpu_sys: float
+    memory_mb: Optional[float]
+    network_rx_kb: Optional[float]
+    network_tx_kb: Optional[float]
+    seq: int
+
+
 class PMD3PerformanceAdapter:
     """
     Unified pymobiledevice3 performance adapter.
@@ -72,35 +150,41 @@ class PMD3PerformanceAdapter:
         self.bundle_id = bundle_id
 
         self._lock = threading.RLock()
-        self._dvt = None
         self._lockdown = None
         self._rsd = None
         self._is_ios17: Optional[bool] = None
         self._init_error: Optional[str] = None
         self._target_pid: Optional[int] = None
+        self._target_name: Optional[str] = None
 
         # Cache
         self._cache = PerformanceCache()
         self._cache_ttl = 2.0
 
-        # Sysmontap data cache (shared between CPU/Memory/Network)
-        self._sysmon_data: Optional[Dict] = None
-        self._sysmon_processes: Optional[List[Dict]] = None
-        self._sysmon_time: float = 0.0
-
-        # CPU delta tracking (for calculating CPU % from cpuTotalUser/cpuTotalSystem)
+        # Sysmontap stream (shared between CPU/Memory/Network): a background thread keeps one
+        # session open on its own DVT connection and publishes the newest SysmonSnapshot
+        self._sysmon: Optional[SysmonSnapshot] = None
+        self._sysmon_ready = threading.Event()
+        self._sysmon_thread: Optional[threading.Thread] = None
+        self._sysmon_dvt = None
+        self._sysmon_wait = 10.0  # first sample of a fresh session, later reads never wait
+        self._streams_stop = threading.Event()
+        # a sample older than this means the stream died or stalled, its values are not live any more
+        self._stale_after = 5.0
+        self._stale_streams = set()
+
+        # CPU delta tracking (for calculating CPU % from cpuTotalUser/cpuTotalSystem), stream thread only
         self._last_cpu_time: float = 0.0
         self._last_cpu_total: Dict[int, int] = {}  # pid -> cpuTotalUser + cpuTotalSystem
-        self._sysmon_ttl = 1.0  # Reduced TTL for more responsive data
-
-        # Graphics data cache (shared between FPS/GPU)
-        self._graphics_data: Optional[Dict] = None
-        self._graphics_time: float = 0.0
-        self._graphics_ttl = 1.0  # Reduced TTL for more responsive data
+        self._no_match_logged = 0.0  # the app is not running: warn about it once a minute, not every sample
 
-        # Collection state tracking
-        self._collecting_sysmon = False
-        self._collecting_graphics = False
+        # Graphics stream (shared between FPS/GPU): every frame-rate/GPU message of one
+        # graphics-opengl session lands in a ring buffer of (timestamp, fps, gpu)
+        self._graphics = collections.deque(maxlen=3600)
+        self._graphics_ready = threading.Event()
+        self._graphics_thread: Optional[threading.Thread] = None
+        self._graphics_dvt = None
+        self._graphics_wait = 5.0  # first sample of a fresh session, later reads never wait
 
     def _detect_ios_version(self) -> bool:
         """Detect if device is iOS 17+."""
@@ -109,7 +193,7 @@ class PMD3PerformanceAdapter:
 
         try:
             from pymobiledevice3.lockdown import create_using_usbmux
-            lockdown = create_using_usbmux(serial=self.device_id)
+            lockdown = _resolve(create_using_usbmux(serial=self.device_id))
             version = lockdown.product_version
             if version:
                 major = int(version.split('.')[0])
@@ -122,7 +206,7 @@ class PMD3PerformanceAdapter:
         # If USB detection fails, try tunneld service (iOS 17+ only works via tunnel)
         try:
             from pymobiledevice3.tunneld.api import get_tunneld_devices
-            devices = get_tunneld_devices()
+            devices = _resolve(get_tunneld_devices())
             if devices:
                 for rsd in devices:
                     if self.device_id is None or self.device_id in str(rsd.udid):
@@ -146,7 +230,7 @@ class PMD3PerformanceAdapter:
 
             # Try to get all devices first (more reliable)
             try:
-                devices = get_tunneld_devices()
+                devices = _resolve(get_tunneld_devices())
                 if devices and len(devices) > 0:
                     for rsd in devices:
                         if self.device_id is None or self.device_id in str(rsd.udid):
@@ -193,26 +277,22 @@ class PMD3PerformanceAdapter:
         else:
             # iOS < 17 uses direct USB
             from pymobiledevice3.lockdown import create_using_usbmux
-            lockdown = create_using_usbmux(serial=self.device_id)
+            lockdown = _resolve(create_using_usbmux(serial=self.device_id))
             self._lockdown = lockdown
             dvt = DvtSecureSocketProxyService(lockdown=lockdown)
             dvt.__enter__()
             logger.info("[iOS Perf] DVT service connected via USB (iOS < 17)")
             return dvt
 
-    def _ensure_connected(self, max_retries: int = 2) -> bool:
-        """Ensure DVT service is connected with retry logic."""
+    def _connect(self, max_retries: int = 2):
+        """Open a DVT connection with retry logic, None when the device can't be reached."""
         with self._lock:
-            if self._dvt is not None:
-                return True
-
             last_error = None
             for attempt in range(max_retries):
                 try:
-                    self._dvt = self._create_dvt_service()
-                    if self._dvt:
-                        self._resolve_target_pid()
-                        return True
+                    dvt = self._create_dvt_service()
+                    if dvt:
+                        return dvt
                 except Exception as e:
                     last_error = e
                     logger.warning(f"[iOS Perf] Connection attempt {attempt + 1}/{max_retries} failed: {e}")
@@ -223,19 +303,20 @@ class PMD3PerformanceAdapter:
                 self._init_error = str(last_error)
                 logger.error(f"[iOS Perf] Failed to connect DVT service after {max_retries} attempts: {last_error}")
 
-            return False
+            return None
 
-    def _resolve_target_pid(self):
+    def _resolve_target_pid(self, dvt):
         """Try to resolve PID for bundle_id using ProcessControl."""
-        if not self._dvt or not self.bundle_id:
+        if not dvt or not self.bundle_id:
             return
 
         try:
             from pymobiledevice3.services.dvt.instruments.process_control import ProcessControl
-            proc_ctrl = ProcessControl(self._dvt)
+            proc_ctrl = ProcessControl(dvt)
             pid = proc_ctrl.process_identifier_for_bundle_identifier(self.bundle_id)
             if pid and pid > 0:
                 self._target_pid = pid
+                self._target_name = None
                 logger.info(f"[iOS Perf] Resolved PID {pid} for bundle_id {self.bundle_id}")
                 return
         except Exception as e:
@@ -243,202 +324,332 @@ class PMD3PerformanceAdapter:
 
         self._target_pid = None
 
-    def _collect_sysmontap_data(self) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
-        """
-        Collect system monitoring data via Sysmontap.
-        Returns (system_data, processes_list).
-        Uses caching to avoid repeated calls.
-        """
-        # Non-blocking check: if another thread is collecting, return cached data
-        if self._collecting_sysmon:
-            logger.debug("[iOS Perf] Sysmontap collection in progress, returning cached data")
-            return self._sysmon_data, self._sysmon_processes
-
+    def _start_stream(self, name: str):
+        """Start the sysmontap/graphics stream thread unless it runs or the adapter is closed."""
+        thread = getattr(self, f'_{name}_thread')
+        if thread is not None and thread.is_alive():
+            return
         with self._lock:
-            current_time = time.time()
-            if (self._sysmon_data is not None and
-                (current_time - self._sysmon_time) < self._sysmon_ttl):
-                return self._sysmon_data, self._sysmon_processes
-
-            if not self._ensure_connected():
-                return None, None
-
-            self._collecting_sysmon = True
+            thread = getattr(self, f'_{name}_thread')
+            if self._streams_stop.is_set() or (thread is not None and thread.is_alive()):
+                return
+            thread = threading.Thread(target=self._stream_loop, args=(name,), daemon=True,
+                                      name=f'magnax-{name}-{self.device_id}')
+            setattr(self, f'_{name}_thread', thread)
+            thread.start()
 
+    def _stream_loop(self, name: str):
+        """
+        Keep one instruments session open on its own DVT connection, reconnecting on errors, until close().
+        The two streams are the adapter's only connections, the PID lookup rides on the sysmon one.
+        """
+        stream = self._stream_sysmontap if name == 'sysmon' else self._stream_graphics
+        while not self._streams_stop.is_set():
             try:
-                from pymobiledevice3.services.dvt.instruments.sysmontap import Sysmontap
-
-                system_data = {}
-                processes = []
-                sys_attrs = None
-                proc_attrs = None
-
-                sysmon = Sysmontap(self._dvt)
-                sysmon.__enter__()
-
-                try:
-                    sample_count = 0
-                    has_system_data = False
-                    has_process_data = False
-                    processes_sample_count = 0
-
-                    for raw_data in sysmon:
-                        # Skip non-dict samples (sometimes strings are returned)
-                        if not isinstance(raw_data, dict):
-                            continue
-
-                        sample_count += 1
-
-                        # Get attribute lists (field names) - only available in first sample
-                        if sys_attrs is None:
-                            sys_attrs = raw_data.get('SystemAttributes', [])
-                            proc_attrs = raw_data.get('ProcessesAttributes', [])
-
-                        # Parse System data (network, CPU total)
-                        sys_values = raw_data.get('System')
-                        if sys_values and isinstance(sys_values, list) and sys_attrs and len(sys_values) > 0:
-                            system_data = dict(zip(sys_attrs, sys_values))
-                            has_system_data = True
-
-                            # Also capture SystemCPUUsage if available
-                            cpu_usage = raw_data.get('SystemCPUUsage', {})
-                            if cpu_usage:
-                                system_data.update(cpu_usage)
-
-                        # Capture CPUCount if available
-                        if 'CPUCount' in raw_data:
-                            system_data['CPUCount'] = raw_data.get('CPUCount', 1)
-
-                        # Parse Processes data (CPU per process, memory)
-                        proc_dict = raw_data.get('Processes')
-                        if proc_dict and isinstance(proc_dict, dict) and proc_attrs:
-                            processes_sample_count += 1
-
-                            # Skip first Processes sample - it often has cpuUsage=None
-                            if processes_sample_count == 1:
-                                logger.debug("[iOS Perf] Skipping first Processes sample")
-                                continue
-
-                            processes = []  # Clear and rebuild each time
-                            for pid, proc_values in proc_dict.items():
-                                if isinstance(proc_values, list):
-                                    proc_info = dict(zip(proc_attrs, proc_values))
-                                    proc_info['pid'] = pid
-                                    processes.append(proc_info)
-                                elif isinstance(proc_values, dict):
-                                    proc_values['pid'] = pid
-                                    processes.append(proc_values)
-                            has_process_data = True
-
-                        # Need both system data and valid process data
-                        # Processes start around sample 6, so allow up to 10 samples
-                        if (has_system_data and has_process_data) or sample_count >= 10:
-                            break
-                finally:
-                    # Close Sysmontap, ignoring "clear" errors on some iOS versions
-                    try:
-                        sysmon.__exit__(None, None, None)
-                    except Exception:
-                        pass
-
-                # Only update cache if we got USEFUL data
-                # system_data must have netBytesIn to be useful
-                # processes must have at least one entry to be useful
-                has_valid_system = bool(system_data and 'netBytesIn' in system_data)
-                has_valid_processes = bool(processes and len(processes) > 0)
-
-                if has_valid_system or has_valid_processes:
-                    if has_valid_system:
-                        self._sysmon_data = system_data
-                    if has_valid_processes:
-                        self._sysmon_processes = processes
-                    self._sysmon_time = current_time
-                    logger.debug(f"[iOS Perf] Sysmontap collected: {len(processes)} processes, "
-                                f"netBytesIn={system_data.get('netBytesIn', 'N/A')}")
-                else:
-                    logger.debug("[iOS Perf] Sysmontap returned no useful data, keeping previous cache")
-
-                self._collecting_sysmon = False
-                return system_data, processes
-
+                dvt = self._connect()
+                setattr(self, f'_{name}_dvt', dvt)
+                if dvt is None:
+                    self._streams_stop.wait(2.0)
+                    continue
+                stream(dvt)
             except Exception as e:
-                self._collecting_sysmon = False
-                error_msg = str(e)
-                logger.warning(f"[iOS Perf] Sysmontap collection failed: {e}")
-                # Close DVT on connection errors to force reconnection
-                if 'Bad file descriptor' in error_msg or 'magic' in error_msg or 'closed' in error_msg.lower():
-                    self._close_dvt()
-                return self._sysmon_data, self._sysmon_processes
-
-    def _collect_graphics_data(self) -> Optional[Dict]:
+                if not self._streams_stop.is_set():
+                    logger.warning(f"[iOS Perf] {name} stream interrupted: {e}")
+                    self._streams_stop.wait(1.0)
+            finally:
+                self._close_stream_dvt(name)
+        logger.debug(f"[iOS Perf] {name} stream stopped")
+
+    def _sysmon_snapshot(self) -> Optional[SysmonSnapshot]:
+        """Newest Sysmontap snapshot, starting the stream on first use; zeros once the stream went quiet."""
+        self._start_stream('sysmon')
+        if not self._sysmon_ready.is_set():
+            self._sysmon_ready.wait(self._sysmon_wait)
+        snapshot = self._sysmon
+        if snapshot is not None and not self._fresh('sysmon', snapshot.timestamp):
+            return SysmonSnapshot(time.time(), 0.0, 0.0, 0.0, 0.0, 0.0, snapshot.seq)
+        return snapshot
+
+    def _fresh(self, name: str, timestamp: float) -> bool:
+        """Whether a stream's newest sample is recent enough to report as live, warns once per stall."""
+        age = time.time() - timestamp
+        if age <= self._stale_after:
+            self._stale_streams.discard(name)
+            return True
+        if name not in self._stale_streams:
+            self._stale_streams.add(name)
+            logger.warning(f"[iOS Perf] {name} stream has no sample for {age:.0f}s, reporting 0")
+        return False
+
+    def _stream_sysmontap(self, dvt):
+        from pymobiledevice3.services.dvt.instruments.sysmontap import Sysmontap
+
+        system_data = {}
+        sys_attrs = None
+        proc_attrs = None
+        proc_index = {}
+        processes_sample_count = 0
+        sample_count = 0
+        seq = 0
+
+        self._resolve_target_pid(dvt)
+        sysmon = Sysmontap(dvt)
+        configured_attrs = None
+        config = getattr(sysmon, '_config', None)
+        if isinstance(config, dict) and config.get('procAttrs'):
+            # ask only for the columns we read, before the config is sent on __enter__
+            configured_attrs = [attr for attr in config['procAttrs'] if attr in SYSMON_PROCESS_ATTRIBUTES]
+            if configured_attrs:
+                config['procAttrs'] = configured_attrs
+        sysmon.__enter__()
+        logger.info("[iOS Perf] Sysmontap stream started")
+        try:
+            for raw_data in sysmon:
+                if self._streams_stop.is_set():
+                    break
+                # Skip non-dict samples (sometimes strings are returned)
+                if not isinstance(raw_data, dict):
+                    continue
+                sample_count += 1
+
+                # Get attribute lists (field names) - only available in first sample
+                if sys_attrs is None:
+                    sys_attrs = raw_data.get('SystemAttributes', [])
+                    proc_attrs = raw_data.get('ProcessesAttributes') or configured_attrs or []
+                    proc_index = {attr: i for i, attr in enumerate(proc_attrs)}
+
+                # Parse System data (network, CPU total)
+                sys_values = raw_data.get('System')
+                if sys_values and isinstance(sys_values, list) and sys_attrs and len(sys_values) > 0:
+                    system_data = dict(zip(sys_attrs, sys_values))
+
+                    # Also capture SystemCPUUsage if available
+                    cpu_usage = raw_data.get('SystemCPUUsage', {})
+                    if cpu_usage:
+                        system_data.update(cpu_usage)
+
+                # Capture CPUCount if available
+                if 'CPUCount' in raw_data:
+                    system_data['CPUCount'] = raw_data.get('CPUCount', 1)
+
+                # Parse Processes data (CPU per process, memory)
+                processes = None
+                app_proc = None
+                proc_dict = raw_data.get('Processes')
+                if proc_dict and isinstance(proc_dict, dict) and proc_attrs:
+                    processes_sample_count += 1
+
+                    # Skip first Processes sample - it often has cpuUsage=None
+                    if processes_sample_count == 1:
+                        logger.debug("[iOS Perf] Skipping first Processes sample")
+                        continue
+
+                    # rows stay raw value lists, only the app's row becomes a dict
+                    processes = proc_dict
+                    app_proc = self._target_process(proc_dict, proc_attrs)
+
+                if processes or 'netBytesIn' in system_data:
+                    seq += 1
+                    self._publish_sysmon(system_data, app_proc, processes, proc_index if processes else None,
+                                         time.time(), seq)
+                # Readers wait for the first process sample, which starts around sample 6
+                if processes or sample_count >= 10:
+                    self._sysmon_ready.set()
+        finally:
+            # Close Sysmontap, ignoring "clear" errors on some iOS versions
+            try:
+                sysmon.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _process_info(pid, proc_values, proc_attrs: List[str]) -> Dict:
+        if isinstance(proc_values, dict):
+            proc_info = dict(proc_values)
+        else:
+            proc_info = dict(zip(proc_attrs, proc_values))
+        proc_info['pid'] = pid
+        return proc_info
+
+    @staticmethod
+    def _row_value(proc_values, proc_index: Dict[str, int], attr: str):
+        """One column of a raw process row without building a dict for it."""
+        if isinstance(proc_values, dict):
+            return proc_values.get(attr)
+        at = proc_index.get(attr)
+        return proc_values[at] if at is not None and at < len(proc_values) else None
+
+    def _target_process(self, proc_dict: Dict, proc_attrs: List[str]) -> Optional[Dict]:
         """
-        Collect graphics data via Graphics service.
-        Returns dict with FPS and GPU metrics.
-        Uses caching to avoid repeated calls.
+        The app's process row as a dict. Once the PID is known only that row is materialized;
+        until then (or after the app restarted under a new PID) every row is matched by name
+        once and the PID is remembered.
         """
-        # Non-blocking check: if another thread is collecting, return cached data
-        if self._collecting_graphics:
-            logger.debug("[iOS Perf] Graphics collection in progress, returning cached data")
-            return self._graphics_data
+        if self._target_pid is not None and self._target_pid in proc_dict:
+            app_proc = self._process_info(self._target_pid, proc_dict[self._target_pid], proc_attrs)
+            # a reused PID belongs to another process
+            if self._target_name is None or app_proc.get('name') == self._target_name:
+                self._target_name = app_proc.get('name')
+                return app_proc
+            self._target_pid = self._target_name = None
+        processes = [self._process_info(pid, proc_values, proc_attrs) for pid, proc_values in proc_dict.items()
+                     if isinstance(proc_values, (list, dict))]
+        app_proc = self._find_app_process(processes)
+        if app_proc is not None and app_proc.get('pid') != self._target_pid:
+            self._target_pid = app_proc.get('pid')
+            self._target_name = app_proc.get('name')
+            logger.info(f"[iOS Perf] Tracking PID {self._target_pid} for bundle_id {self.bundle_id}")
+        return app_proc
+
+    def _publish_sysmon(self, system_data: Dict, app_proc: Optional[Dict], processes: Optional[Dict],
+                        proc_index: Optional[Dict[str, int]], sample_time: float, seq: int):
+        """Derive the metrics of one sample and swap them in as the newest snapshot."""
+        previous = self._sysmon
+        cpu_app = previous.cpu_app if previous else 0.0
+        cpu_sys = previous.cpu_sys if previous else 0.0
+        memory_mb = previous.memory_mb if previous else None
+        cpu_count = system_data.get('CPUCount', 6) if system_data else 6
+
+        if processes:
+            app_cpu = 0.0
+            sys_cpu = 0.0
+            if system_data:
+                # Try System CPU from total load first
+                total_load = system_data.get('CPU_TotalLoad', 0)
+                if total_load and total_load > 0:
+                    sys_cpu = total_load / cpu_count if cpu_count > 1 else total_load
 
-        with self._lock:
-            current_time = time.time()
-            if (self._graphics_data is not None and
-                (current_time - self._graphics_time) < self._graphics_ttl):
-                return self._graphics_data
+            if app_proc:
+                # Try cpuUsage field first
+                raw_cpu = app_proc.get('cpuUsage')
+                if raw_cpu is not None and isinstance(raw_cpu, (int, float)) and raw_cpu > 0:
+                    app_cpu = float(raw_cpu)
+                else:
+                    # Calculate from cpuTotalUser + cpuTotalSystem delta
+                    app_cpu = self._calculate_cpu_from_delta(app_proc, sample_time)
+
+                # physFootprint is the most accurate for app memory
+                mem_bytes = (app_proc.get('physFootprint', 0) or
+                             app_proc.get('memResidentSize', 0) or
+                             app_proc.get('memVirtualSize', 0) or 0)
+                if isinstance(mem_bytes, (int, float)) and mem_bytes > 0:
+                    # Convert to MB
+                    if mem_bytes > 1000000:  # Bytes
+                        memory_mb = round(mem_bytes / (1024 * 1024), 2)
+                    else:  # Already in MB or some other unit
+                        memory_mb = round(mem_bytes, 2)
+
+            # Calculate system CPU from all processes if not available
+            if sys_cpu <= 0:
+                total_cpu = 0.0
+                for pid, proc_values in processes.items():
+                    raw = self._row_value(proc_values, proc_index, 'cpuUsage')
+                    if raw is not None and isinstance(raw, (int, float)) and raw > 0:
+                        total_cpu += float(raw)
+                    else:
+                        # Use delta calculation
+                        cpu_total = ((self._row_value(proc_values, proc_index, 'cpuTotalUser') or 0) +
+                                     (self._row_value(proc_values, proc_index, 'cpuTotalSystem') or 0))
+                        total_cpu += self._cpu_from_delta(pid, cpu_total, sample_time)
+                sys_cpu = total_cpu / cpu_count if cpu_count > 0 else total_cpu
 
-            if not self._ensure_connected():
-                return None
+            # baselines of exited processes, the adapter lives as long as the device stays plugged in
+            if len(self._last_cpu_total) > len(processes):
+                for pid in [pid for pid in self._last_cpu_total if pid not in processes]:
+                    del self._last_cpu_total[pid]
 
-            self._collecting_graphics = True
+            # Update last CPU time for delta calculations
+            self._last_cpu_time = sample_time
+            cpu_app = round(app_cpu, 2)
+            cpu_sys = round(min(sys_cpu, 100.0), 2)  # Cap at 100%
+
+        network_rx_kb = previous.network_rx_kb if previous else None
+        network_tx_kb = previous.network_tx_kb if previous else None
+        if system_data and 'netBytesIn' in system_data:
+            rx_bytes = system_data.get('netBytesIn', 0) or 0
+            tx_bytes = system_data.get('netBytesOut', 0) or 0
+            if self._cache._last_net_time > 0:
+                time_delta = sample_time - self._cache._last_net_time
+                if time_delta > 0:
+                    rx_delta = max(0, rx_bytes - self._cache._last_net_rx_bytes)
+                    tx_delta = max(0, tx_bytes - self._cache._last_net_tx_bytes)
+                    # Convert to KB/s
+                    network_rx_kb = round((rx_delta / 1024) / time_delta, 2)
+                    network_tx_kb = round((tx_delta / 1024) / time_delta, 2)
+            # Store for next delta calculation
+            self._cache._last_net_rx_bytes = rx_bytes
+            self._cache._last_net_tx_bytes = tx_bytes
+            self._cache._last_net_time = sample_time
+
+        self._sysmon = SysmonSnapshot(sample_time, cpu_app, cpu_sys, memory_mb, network_rx_kb, network_tx_kb, seq)
+
+    def _stream_graphics(self, dvt):
+        from pymobiledevice3.services.dvt.instruments.graphics import Graphics
+
+        graphics = Graphics(dvt)
+        graphics.__enter__()
+        logger.info("[iOS Perf] Graphics stream started")
+        try:
+            sample_count = 0
+            for data in graphics:
+                if self._streams_stop.is_set():
+                    break
+                if not data or not isinstance(data, dict):
+                    continue
+                sample_count += 1
+                fps = data.get('CoreAnimationFramesPerSecond', 0)
+                # Try different GPU metric keys
+                gpu = (data.get('Device Utilization %', 0) or
+                       data.get('Renderer Utilization %', 0) or
+                       data.get('Tiler Utilization %', 0) or 0)
 
+                # Skip leading samples with FPS=0 (common during startup)
+                if fps == 0 and sample_count < 3:
+                    logger.debug(f"[iOS Perf] Skipping sample {sample_count} with FPS=0")
+                    continue
+
+                fps = int(fps) if isinstance(fps, (int, float)) else 0
+                gpu = float(gpu) if isinstance(gpu, (int, float)) else 0.0
+                # deque.append is atomic, readers take a copy of the buffer instead of a lock
+                self._graphics.append((time.time(), fps, gpu))
+                self._graphics_ready.set()
+        finally:
+            # Close Graphics, ignoring "clear" errors on some iOS versions
             try:
-                from pymobiledevice3.services.dvt.instruments.graphics import Graphics
-
-                logger.debug("[iOS Perf] Starting Graphics data collection...")
-                graphics = Graphics(self._dvt)
-                graphics.__enter__()
-
-                try:
-                    sample_count = 0
-                    for data in graphics:
-                        sample_count += 1
-                        if data:
-                            fps = data.get('CoreAnimationFramesPerSecond', 0)
-                            gpu = data.get('Device Utilization %', 0)
-
-                            # Skip samples with FPS=0 (common when screen is idle or during startup)
-                            # But always accept after sample 3 to avoid getting stuck
-                            if fps == 0 and sample_count < 3:
-                                logger.debug(f"[iOS Perf] Skipping sample {sample_count} with FPS=0")
-                                continue
-
-                            self._graphics_data = data
-                            self._graphics_time = current_time
-                            logger.debug(f"[iOS Perf] Graphics collected: FPS={fps}, GPU={gpu}")
-                            break  # Got sample
-
-                        if sample_count >= 5:  # Give up after 5 samples
-                            logger.warning("[iOS Perf] Graphics returned no valid data after 5 samples")
-                            break
-                finally:
-                    # Close Graphics, ignoring "clear" errors on some iOS versions
-                    try:
-                        graphics.__exit__(None, None, None)
-                    except Exception:
-                        pass
-
-                self._collecting_graphics = False
-                return self._graphics_data
-
-            except Exception as e:
-                self._collecting_graphics = False
-                error_msg = str(e)
-                logger.warning(f"[iOS Perf] Graphics collection failed: {e}")
-                # Close DVT on connection errors to force reconnection
-                if 'Bad file descriptor' in error_msg or 'magic' in error_msg or 'closed' in error_msg.lower():
-                    self._close_dvt()
-                return self._graphics_data
+                graphics.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    def _graphics_samples(self) -> List[Tuple[float, int, float]]:
+        """Buffered (timestamp, fps, gpu) samples, oldest first, starting the stream on first use."""
+        self._start_stream('graphics')
+        if not self._graphics_ready.is_set():
+            self._graphics_ready.wait(self._graphics_wait)
+        return list(self._graphics)
+
+    def get_graphics(self, window: Optional[float] = None) -> Dict[str, Any]:
+        """
+        FPS/GPU of the newest sample, or aggregated over the last `window` seconds.
+        Returns {'fps', 'gpu', 'fps_min', 'fps_max', 'gpu_max', 'samples'}.
+        """
+        samples = self._graphics_samples()
+        if samples and not self._fresh('graphics', samples[-1][0]):
+            return {'fps': 0, 'gpu': 0.0, 'fps_min': 0, 'fps_max': 0, 'gpu_max': 0.0, 'samples': 0}
+        if window is not None and samples:
+            samples = [sample for sample in samples if sample[0] >= samples[-1][0] - window]
+        else:
+            samples = samples[-1:]
+        if not samples:
+            return {'fps': self._cache.fps, 'gpu': self._cache.gpu, 'fps_min': self._cache.fps,
+                    'fps_max': self._cache.fps, 'gpu_max': self._cache.gpu, 'samples': 0}
+        fps = [sample[1] for sample in samples]
+        gpu = [sample[2] for sample in samples]
+        return {'fps': round(sum(fps) / len(fps)), 'gpu': round(sum(gpu) / len(gpu), 2),
+                'fps_min': min(fps), 'fps_max': max(fps), 'gpu_max': max(gpu), 'samples': len(samples)}
+
+    def graphics_since(self, since: float) -> List[Tuple[float, int, float]]:
+        """Every buffered (timestamp, fps, gpu) sample newer than `since`, the full-resolution timeline."""
+        return [sample for sample in self._graphics_samples() if sample[0] > since]
 
     def _find_app_process(self, processes: List[Dict]) -> Optional[Dict]:
         """Find process matching bundle_id using multiple matching strategies."""
@@ -516,17 +727,21 @@ class PMD3PerformanceAdapter:
             logger.debug(f"[iOS Perf] Matched process: {best_match.get('name')} (score={best_score})")
             return best_match
 
-        logger.warning(f"[iOS Perf] No process match for {self.bundle_id}. "
-                      f"Available: {[p.get('name') for p in processes[:15]]}")
+        if time.time() - self._no_match_logged >= 60:
+            self._no_match_logged = time.time()
+            logger.warning(f"[iOS Perf] No process match for {self.bundle_id}. "
+                          f"Available: {[p.get('name') for p in processes[:15]]}")
+        else:
+            logger.debug(f"[iOS Perf] No process match for {self.bundle_id}")
         return None
 
     def _calculate_cpu_from_delta(self, proc: Dict, current_time: float) -> float:
         """Calculate CPU % from cpuTotalUser + cpuTotalSystem delta."""
-        pid = proc.get('pid', 0)
         cpu_user = proc.get('cpuTotalUser', 0) or 0
         cpu_sys = proc.get('cpuTotalSystem', 0) or 0
-        cpu_total = cpu_user + cpu_sys
+        return self._cpu_from_delta(proc.get('pid', 0), cpu_user + cpu_sys, current_time)
 
+    def _cpu_from_delta(self, pid: int, cpu_total: int, current_time: float) -> float:
         if self._last_cpu_time > 0 and pid in self._last_cpu_total:
             dt = current_time - self._last_cpu_time
             if dt > 0:
@@ -550,48 +765,10 @@ class PMD3PerformanceAdapter:
         since the cpuUsage field may not be populated on iOS 17+.
         """
         try:
-            system_data, processes = self._collect_sysmontap_data()
-            current_time = time.time()
-
-            app_cpu = 0.0
-            sys_cpu = 0.0
-            cpu_count = system_data.get('CPUCount', 6) if system_data else 6
-
-            if system_data:
-                # Try System CPU from total load first
-                total_load = system_data.get('CPU_TotalLoad', 0)
-                if total_load and total_load > 0:
-                    sys_cpu = total_load / cpu_count if cpu_count > 1 else total_load
-
-            if processes:
-                # Find target app process
-                app_proc = self._find_app_process(processes)
-                if app_proc:
-                    # Try cpuUsage field first
-                    raw_cpu = app_proc.get('cpuUsage')
-                    if raw_cpu is not None and isinstance(raw_cpu, (int, float)) and raw_cpu > 0:
-                        app_cpu = float(raw_cpu)
-                    else:
-                        # Calculate from cpuTotalUser + cpuTotalSystem delta
-                        app_cpu = self._calculate_cpu_from_delta(app_proc, current_time)
-
-                # Calculate system CPU from all processes if not available
-                if sys_cpu <= 0:
-                    total_cpu = 0.0
-                    for p in processes:
-                        raw = p.get('cpuUsage')
-                        if raw is not None and isinstance(raw, (int, float)) and raw > 0:
-                            total_cpu += float(raw)
-                        else:
-                            # Use delta calculation
-                            total_cpu += self._calculate_cpu_from_delta(p, current_time)
-                    sys_cpu = total_cpu / cpu_count if cpu_count > 0 else total_cpu
-
-            # Update last CPU time for delta calculations
-            self._last_cpu_time = current_time
-
-            self._cache.cpu_app = round(app_cpu, 2)
-            self._cache.cpu_sys = round(min(sys_cpu, 100.0), 2)  # Cap at 100%
+            snapshot = self._sysmon_snapshot()
+            if snapshot is not None:
+                self._cache.cpu_app = snapshot.cpu_app
+                self._cache.cpu_sys = snapshot.cpu_sys
             return (self._cache.cpu_app, self._cache.cpu_sys)
 
         except Exception as e:
@@ -601,25 +778,10 @@ class PMD3PerformanceAdapter:
     def get_memory(self) -> float:
         """Get memory usage in MB."""
         try:
-            _, processes = self._collect_sysmontap_data()
-
-            if processes:
-                app_proc = self._find_app_process(processes)
-                if app_proc:
-                    # physFootprint is the most accurate for app memory
-                    mem_bytes = (app_proc.get('physFootprint', 0) or
-                                app_proc.get('memResidentSize', 0) or
-                                app_proc.get('memVirtualSize', 0) or 0)
-
-                    if isinstance(mem_bytes, (int, float)) and mem_bytes > 0:
-                        # Convert to MB
-                        if mem_bytes > 1000000:  # Bytes
-                            self._cache.memory_mb = round(mem_bytes / (1024 * 1024), 2)
-                        else:  # Already in MB or some other unit
-                            self._cache.memory_mb = round(mem_bytes, 2)
-
-                        logger.debug(f"[iOS Perf] App memory: {self._cache.memory_mb} MB")
-
+            snapshot = self._sysmon_snapshot()
+            if snapshot is not None and snapshot.memory_mb is not None:
+                self._cache.memory_mb = snapshot.memory_mb
+                logger.debug(f"[iOS Perf] App memory: {self._cache.memory_mb} MB")
             return self._cache.memory_mb
 
         except Exception as e:
@@ -629,13 +791,9 @@ class PMD3PerformanceAdapter:
     def get_fps(self) -> int:
         """Get current FPS."""
         try:
-            data = self._collect_graphics_data()
-
-            if data:
-                fps = data.get('CoreAnimationFramesPerSecond', 0)
-                if isinstance(fps, (int, float)):
-                    self._cache.fps = int(fps)
-
+            samples = self._graphics_samples()
+            if samples:
+                self._cache.fps = samples[-1][1] if self._fresh('graphics', samples[-1][0]) else 0
             return self._cache.fps
 
         except Exception as e:
@@ -645,17 +803,9 @@ class PMD3PerformanceAdapter:
     def get_gpu(self) -> float:
         """Get GPU utilization percentage."""
         try:
-            data = self._collect_graphics_data()
-
-            if data:
-                # Try different GPU metric keys
-                gpu = (data.get('Device Utilization %', 0) or
-                       data.get('Renderer Utilization %', 0) or
-                       data.get('Tiler Utilization %', 0) or 0)
-
-                if isinstance(gpu, (int, float)):
-                    self._cache.gpu = float(gpu)
-
+            samples = self._graphics_samples()
+            if samples:
+                self._cache.gpu = samples[-1][2] if self._fresh('graphics', samples[-1][0]) else 0.0
             return self._cache.gpu
 
         except Exception as e:
@@ -668,36 +818,13 @@ class PMD3PerformanceAdapter:
         Returns (download_kb/s, upload_kb/s) - rate per second.
         """
         try:
-            system_data, _ = self._collect_sysmontap_data()
-
-            if system_data:
-                rx_bytes = system_data.get('netBytesIn', 0) or 0
-                tx_bytes = system_data.get('netBytesOut', 0) or 0
-                current_time = time.time()
-
-                logger.debug(f"[iOS Perf] Network raw: rx={rx_bytes}, tx={tx_bytes}")
-
-                if self._cache._last_net_time > 0:
-                    # Calculate delta
-                    time_delta = current_time - self._cache._last_net_time
-                    if time_delta > 0:
-                        rx_delta = max(0, rx_bytes - self._cache._last_net_rx_bytes)
-                        tx_delta = max(0, tx_bytes - self._cache._last_net_tx_bytes)
-
-                        # Convert to KB/s
-                        self._cache.network_rx_kb = round((rx_delta / 1024) / time_delta, 2)
-                        self._cache.network_tx_kb = round((tx_delta / 1024) / time_delta, 2)
-
-                        logger.debug(f"[iOS Perf] Network delta: rx_kb/s={self._cache.network_rx_kb}, tx_kb/s={self._cache.network_tx_kb}")
-                else:
-                    logger.debug("[iOS Perf] Network: first reading, storing baseline")
-
-                # Store for next delta calculation
-                self._cache._last_net_rx_bytes = rx_bytes
-                self._cache._last_net_tx_bytes = tx_bytes
-                self._cache._last_net_time = current_time
+            snapshot = self._sysmon_snapshot()
+            if snapshot is not None and snapshot.network_rx_kb is not None:
+                self._cache.network_rx_kb = snapshot.network_rx_kb
+                self._cache.network_tx_kb = snapshot.network_tx_kb
+                logger.debug(f"[iOS Perf] Network: rx_kb/s={self._cache.network_rx_kb}, tx_kb/s={self._cache.network_tx_kb}")
             else:
-                logger.debug("[iOS Perf] Network: no system_data available")
+                logger.debug("[iOS Perf] Network: no rate available yet")
 
             return (self._cache.network_rx_kb, self._cache.network_tx_kb)
 
@@ -710,22 +837,28 @@ class PMD3PerformanceAdapter:
         return self._init_error
 
     def _close_dvt(self):
-        """Close DVT service."""
+        """Forget the device connection state, the DVT connections themselves belong to the streams."""
         with self._lock:
-            if self._dvt:
-                try:
-                    self._dvt.__exit__(None, None, None)
-                except Exception as e:
-                    logger.debug(f"[iOS Perf] DVT close error: {e}")
-                self._dvt = None
             self._lockdown = None
             self._rsd = None
             self._target_pid = None
-            self._collecting_sysmon = False
-            self._collecting_graphics = False
+            self._target_name = None
+
+    def _close_stream_dvt(self, name: str):
+        """Close a stream's own DVT connection, which also unblocks a stream waiting for data."""
+        dvt = getattr(self, f'_{name}_dvt')
+        setattr(self, f'_{name}_dvt', None)
+        if dvt is not None:
+            try:
+                dvt.__exit__(None, None, None)
+            except Exception as e:
+                logger.debug(f"[iOS Perf] Stream DVT close error: {e}")
 
     def close(self):
         """Clean up resources."""
+        self._streams_stop.set()
+        self._close_stream_dvt('sysmon')
+        self._close_stream_dvt('graphics')
         self._close_dvt()
         logger.info("[iOS Perf] Adapter closed")
 
@@ -734,12 +867,96 @@ class PMD3PerformanceAdapter:
 PyiOSDeviceAdapter = PMD3PerformanceAdapter
 
 
+class AdapterRegistry:
+    """
+    Process-wide PMD3PerformanceAdapter per (device, bundle).
+
+    Every collector of an app shares one adapter, so its DVT channel, caches and CPU/network
+    delta baselines survive between samples. Long-lived owners (a sampling session) hold a
+    reference with acquire/release; one-off samples borrow with get(). An adapter nobody holds
+    is closed after idle_timeout seconds without a sample.
+    """
+
+    def __init__(self, idle_timeout: float = 60.0):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # DVT sockets and the reaper thread do not survive fork, a collector process starts empty
+        self._pid = os.getpid()
+        self._adapters: Dict[Tuple[str, str], List] = {}  # key -> [adapter, refs, last_used]
+        self._reaper: Optional[threading.Thread] = None
+
+    def _entry(self, device_id: str, bundle_id: str) -> List:
+        if self._pid != os.getpid():
+            self._reset()
+        key = (device_id, bundle_id)
+        entry = self._adapters.get(key)
+        if entry is None:
+            entry = self._adapters[key] = [PMD3PerformanceAdapter(device_id, bundle_id), 0, time.time()]
+            logger.info(f"[iOS Perf] Adapter registered: {device_id} {bundle_id}")
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name='magnax-ios-adapters', daemon=True)
+            self._reaper.start()
+        entry[2] = time.time()
+        return entry
+
+    def get(self, device_id: str, bundle_id: str) -> PMD3PerformanceAdapter:
+        """Borrow the adapter of an app for one sample."""
+        with self._lock:
+            return self._entry(device_id, bundle_id)[0]
+
+    def acquire(self, device_id: str, bundle_id: str) -> PMD3PerformanceAdapter:
+        """Hold the adapter of an app open until release(), however long between samples."""
+        with self._lock:
+            entry = self._entry(device_id, bundle_id)
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, device_id: str, bundle_id: str):
+        with self._lock:
+            entry = self._adapters.get((device_id, bundle_id))
+            if entry is not None:
+                entry[1] = max(0, entry[1] - 1)
+                entry[2] = time.time()
+
+    def close(self, device_id: Optional[str] = None):
+        """Close the adapters (of one device) now, held or not, e.g. when the device is unplugged."""
+        with self._lock:
+            keys = [key for key in self._adapters if device_id is None or key[0] == device_id]
+            adapters = [self._adapters.pop(key)[0] for key in keys]
+        for adapter in adapters:
+            adapter.close()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [{'device': key[0], 'bundle': key[1], 'refs': entry[1], 'idle': round(now - entry[2], 1)}
+                    for key, entry in self._adapters.items()]
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 4))
+            now = time.time()
+            with self._lock:
+                idle = [key for key, entry in self._adapters.items()
+                        if entry[1] == 0 and now - entry[2] > self.idle_timeout]
+                adapters = [self._adapters.pop(key)[0] for key in idle]
+            for key, adapter in zip(idle, adapters):
+                logger.info(f"[iOS Perf] Adapter idle, closed: {key[0]} {key[1]}")
+                adapter.close()
+
+
+adapters = AdapterRegistry()
+
+
 # Keep utility functions for external use
 def get_ios_version(device_id: str) -> Optional[str]:
     """Get iOS version for a device."""
     try:
         from pymobiledevice3.lockdown import create_using_usbmux
-        lockdown = create_using_usbmux(serial=device_id)
+        lockdown = _resolve(create_using_usbmux(serial=device_id))
         return lockdown.product_version
     except Exception as e:
         logger.error(f"[iOS Perf] Failed to get iOS version: {e}")
@@ -765,13 +982,13 @@ def get_tunnel_rsd(device_id: str = None):
 
         # Try to get specific device by UDID first
         if device_id:
-            rsd = get_tunneld_device_by_udid(device_id)
+            rsd = _resolve(get_tunneld_device_by_udid(device_id))
             if rsd:
                 logger.info(f"[iOS Perf] Found tunneld device: {rsd.udid}")
                 return rsd
 
         # Fall back to getting all devices
-        devices = get_tunneld_devices()
+        devices = _resolve(get_tunneld_devices())
         if devices:
             for rsd in devices:
                 if device_id is None or device_id in str(rsd.udid):
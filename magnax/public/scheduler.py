@@ -0,0 +1,351 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  in-process sampling scheduler for the web dashboard.
+            One session per (device, package) samples every metric the dashboard asked for on
+            the same aligned tick; /apm/* endpoints only read the latest values, so several
+            browser tabs polling the same device do not multiply the load on it.
+"""
+import datetime
+import math
+import os
+import threading
+import time
+from loguru import logger
+from magnax.public.apm import CPU, Memory, Network, FPS, Battery, GPU, BatchSampler
+from magnax.public.common import Devices, File, Platform
+from magnax.public.device_tracker import tracker
+from magnax.public.ios_perf_adapter import adapters
+
+d = Devices()
+f = File()
+
+# series (legacy log name) of every payload key, the report pipeline reads these
+METRIC_LOGS = {
+    'cpu': {'appCpuRate': 'cpu_app.log', 'systemCpuRate': 'cpu_sys.log'},
+    'mem': {'totalPass': 'mem_total.log', 'swapPass': 'mem_swap.log'},
+    'network': {'upflow': 'upflow.log', 'downflow': 'downflow.log'},
+    'fps': {'fps': 'fps.log', 'jank': 'jank.log'},
+    'gpu': {'gpu': 'gpu.log'},
+    'battery': {'level': 'battery_level.log', 'temperature': 'battery_tem.log', 'current': 'battery_current.log',
+                'voltage': 'battery_voltage.log', 'power': 'battery_power.log'},
+}
+
+# what an endpoint answers before the first tick
+METRIC_DEFAULTS = {
+    'cpu': {'appCpuRate': 0, 'systemCpuRate': 0},
+    'mem': {'totalPass': 0, 'swapPass': 0},
+    'network': {'upflow': 0, 'downflow': 0},
+    'fps': {'fps': 0, 'jank': 0},
+    'gpu': {'gpu': 0},
+    'battery': {'level': 0, 'temperature': 0, 'current': 0, 'voltage': 0, 'power': 0},
+}
+
+# sampled together by one BatchSampler round trip on Android
+BATCH_METRICS = ('cpu', 'network', 'gpu', 'battery')
+
+
+class FrameSubscriber(object):
+    """Latest-frame slot of one stream client, a slow client skips frames instead of queueing them"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self.coalesced = 0
+        self.closed = False
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.coalesced += 1
+            self._frame = frame
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """the newest frame (with how many were skipped before it), None on timeout or close"""
+        with self._cond:
+            if self._frame is None and not self.closed:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                frame = dict(frame, coalesced=self.coalesced)
+                self.coalesced = 0
+            return frame
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class SamplingSession(object):
+    """Sample the enabled metrics of one app on one device at aligned ticks, keep the latest values"""
+
+    def __init__(self, platform, deviceId, pkgName, pid=None, interval=1, idle_timeout=30, log=True):
+        self.platform = platform
+        self.deviceId = deviceId
+        self.pkgName = pkgName
+        self.pid = pid
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.log = log
+        self.metrics = set()
+        self.options = {'wifi': True, 'surfaceview': True}
+        self.latest = {}
+        self.last_access = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._batch = None
+        self._collectors = {}
+        # full-resolution samples of a metric key since the previous tick, logged instead of the tick value
+        self._timelines = {}
+        self._subscribers = set()
+        self._thread = threading.Thread(target=self._run, name=f'magnax-sampler-{deviceId}', daemon=True)
+
+    def start(self):
+        if self.platform == Platform.iOS and self.pkgName:
+            # keep the app's DVT channel warm for the whole session, not just while ticks are close together
+            adapters.acquire(self.deviceId, self.pkgName)
+        self._thread.start()
+        logger.info(f'[Scheduler] session started: {self.deviceId} {self.pkgName}')
+        return self
+
+    def stop(self, timeout=None):
+        """stop sampling; with a timeout, also wait for a tick in flight so nothing is written afterwards"""
+        self._stop.set()
+        if timeout is not None:
+            self.join(timeout)
+
+    def join(self, timeout):
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f'[Scheduler] session still busy after {timeout}s: {self.deviceId} {self.pkgName}')
+
+    def alive(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def enable(self, metric, pid=None, **options):
+        """turn a metric on for the next ticks, options are wifi/surfaceview"""
+        with self._lock:
+            self.last_access = time.time()
+            if pid and pid != self.pid:
+                # the dashboard picked another process, drop collectors bound to the old pid
+                self.pid = pid
+                self._batch = None
+                self._collectors.clear()
+            for key, value in options.items():
+                if value is not None and self.options.get(key) != value:
+                    self.options[key] = value
+                    self._batch = None
+                    self._collectors.clear()
+            self.metrics.add(metric)
+
+    def subscribe(self):
+        """a FrameSubscriber of the session, None when it already stopped"""
+        subscriber = FrameSubscriber()
+        with self._lock:
+            # _run sets the stop flag before it closes the subscribers under this lock, a stream
+            # added after that would never be closed
+            if self._stop.is_set():
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            # a stream counts as a reader until it goes away
+            self.last_access = time.time()
+
+    def read(self, metric):
+        with self._lock:
+            self.last_access = time.time()
+            entry = self.latest.get(metric)
+        return dict(entry[1]) if entry else dict(METRIC_DEFAULTS[metric])
+
+    def _run(self):
+        next_tick = math.ceil(time.time() / self.interval) * self.interval
+        while not self._stop.is_set():
+            if not self._subscribers and time.time() - self.last_access > self.idle_timeout:
+                logger.info(f'[Scheduler] session idle, stopped: {self.deviceId} {self.pkgName}')
+                break
+            if self._stop.wait(max(0, next_tick - time.time())):
+                break
+            self.sample(next_tick)
+            next_tick += self.interval
+            now = time.time()
+            if now > next_tick:
+                # a slow tick skips to the next aligned one instead of bursting to catch up
+                next_tick = math.ceil(now / self.interval) * self.interval
+        self._stop.set()
+        if self.platform == Platform.iOS and self.pkgName:
+            adapters.release(self.deviceId, self.pkgName)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def sample(self, tick):
+        with self._lock:
+            metrics = set(self.metrics)
+        values = {}
+        batched = set()
+        if self.platform == Platform.Android and self.pkgName and metrics & set(BATCH_METRICS):
+            batched = metrics & set(BATCH_METRICS)
+            try:
+                values.update(self._sampleBatch(metrics))
+            except Exception as e:
+                logger.warning(f'[Scheduler] batch sample failed: {e}')
+        for metric in metrics - set(values) - set(batched):
+            try:
+                values[metric] = self._sampleMetric(metric)
+            except Exception as e:
+                logger.warning(f'[Scheduler] {metric} sample failed: {e}')
+        apm_time = datetime.datetime.fromtimestamp(tick).strftime('%H:%M:%S.%f')
+        with self._lock:
+            for metric, payload in values.items():
+                self.latest[metric] = (tick, payload)
+            frame = {'time': apm_time, 'timestamp': tick,
+                     'metrics': {metric: dict(entry[1]) for metric, entry in self.latest.items()}}
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(frame)
+        if self.log:
+            self._writeLogs(tick, values)
+        return values
+
+    def _sampleBatch(self, metrics):
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = BatchSampler(self.pkgName, self.deviceId, pid=self.pid,
+                                               wifi=self.options['wifi'], battery=False, thermal=False)
+        batch.battery = 'battery' in metrics
+        # a restarted app is followed by the batch itself, self.pid stays what the dashboard picked
+        final = batch.sample(noLog=True)
+        values = {}
+        # the first sample only seeds the cpu/network baseline, there is no rate to publish yet
+        if 'cpu' in metrics and final['rated']:
+            values['cpu'] = {'appCpuRate': final['cpu'][0], 'systemCpuRate': final['cpu'][1]}
+        if 'network' in metrics and final['rated']:
+            values['network'] = {'upflow': final['network'][0], 'downflow': final['network'][1]}
+        if 'gpu' in metrics:
+            values['gpu'] = {'gpu': final['gpu']}
+        if 'battery' in metrics:
+            values['battery'] = {'level': final['battery'][0], 'temperature': final['battery'][1]}
+        return values
+
+    def _collector(self, metric):
+        collector = self._collectors.get(metric)
+        if collector is None:
+            match(metric):
+                case 'cpu':
+                    collector = CPU(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+                case 'mem':
+                    collector = Memory(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+                case 'network':
+                    collector = Network(self.pkgName, self.deviceId, self.platform, pid=self.pid)
+                case 'fps':
+                    collector = FPS.getObject(pkgName=self.pkgName, deviceId=self.deviceId,
+                                              surfaceview=self.options['surfaceview'], platform=self.platform)
+                case 'gpu':
+                    collector = GPU(self.pkgName, self.deviceId, self.platform)
+                case 'battery':
+                    collector = Battery(self.deviceId, self.platform)
+                case _:
+                    raise Exception('{} is undefined'.format(metric))
+            self._collectors[metric] = collector
+        return collector
+
+    def _sampleMetric(self, metric):
+        collector = self._collector(metric)
+        match(metric):
+            case 'cpu':
+                appCpuRate, systemCpuRate = collector.getCpuRate(noLog=True)
+                return {'appCpuRate': appCpuRate, 'systemCpuRate': systemCpuRate}
+            case 'mem':
+                totalPass, swapPass = collector.getProcessMemory(noLog=True)
+                return {'totalPass': totalPass, 'swapPass': swapPass}
+            case 'network':
+                upflow, downflow = collector.getNetWorkData(wifi=self.options['wifi'], noLog=True)
+                return {'upflow': upflow, 'downflow': downflow}
+            case 'fps':
+                fps, jank = collector.getFPS(noLog=True)
+                if self.platform == Platform.iOS and self.log:
+                    # the report gets every buffered graphics sample, not one per tick
+                    timeline = collector.getiOSFpsTimeline()
+                    if timeline is not None:
+                        self._timelines['fps'] = timeline
+                return {'fps': fps, 'jank': jank}
+            case 'gpu':
+                return {'gpu': collector.getGPU(noLog=True)}
+            case 'battery':
+                final = collector.getBattery(noLog=True)
+                if self.platform == Platform.Android:
+                    return {'level': final[0], 'temperature': final[1]}
+                return {'temperature': final[0], 'current': final[1], 'voltage': final[2], 'power': final[3]}
+
+    def _writeLogs(self, tick, values):
+        timelines, self._timelines = self._timelines, {}
+        for metric, payload in values.items():
+            for key, value in payload.items():
+                # swap is an Android-only series
+                if key == 'swapPass' and self.platform != Platform.Android:
+                    continue
+                filename = METRIC_LOGS[metric].get(key)
+                if not filename:
+                    continue
+                for timestamp, sample in timelines.get(key, [(tick, value)]):
+                    f.add_log(os.path.join(f.report_dir, filename), timestamp, sample)
+
+
+class SamplingScheduler(object):
+    """Owns the sampling sessions of the web process, keyed by (platform, device, package)"""
+
+    def __init__(self, interval=1, idle_timeout=30):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def session(self, platform, deviceId, pkgName):
+        key = (platform, deviceId, pkgName)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None and not pkgName:
+                # device-wide metrics (battery) join whatever session already runs on the device
+                session = next((s for k, s in self._sessions.items() if k[:2] == key[:2] and s.alive()), None)
+            if session is None or not session.alive():
+                session = SamplingSession(platform, deviceId, pkgName, interval=self.interval,
+                                          idle_timeout=self.idle_timeout).start()
+                self._sessions[key] = session
+        return session
+
+    def read(self, platform, deviceId, pkgName, metric, pid=None, **options):
+        """latest value of a metric, enabling it on the session if this is the first ask"""
+        session = self.session(platform, deviceId, pkgName)
+        session.enable(metric, pid=pid, **options)
+        return session.read(metric)
+
+    def stop(self, deviceId=None, timeout=None):
+        """stop sessions (of one device); with a timeout, wait for their ticks in flight, e.g. before the report moves the log files away"""
+        with self._lock:
+            sessions = [self._sessions.pop(key) for key in list(self._sessions) if deviceId is None or key[1] == deviceId]
+        for session in sessions:
+            session.stop()
+        if timeout is not None:
+            for session in sessions:
+                session.join(timeout)
+
+
+scheduler = SamplingScheduler()
+
+
+def _stop_device_sessions(platform, added, removed):
+    """tracker listener: a disconnected device has nothing left to sample"""
+    for deviceId in removed:
+        scheduler.stop(deviceId)
+
+tracker.add_listener(_stop_device_sessions)
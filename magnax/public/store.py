@@ -0,0 +1,627 @@
+#!/usr/bin/python
+# encoding=utf-8
+
+"""
+@Desc    :  append-only binary time-series store of a test session.
+            Every metric sample is one fixed-width record (float64 epoch, uint32 column, float32 value)
+            appended to a single <report>/apm.mgx file; a 4 KB header holds the schema (record layout
+            and the column names). Column ids are the crc32 of the metric name, so collector processes
+            append to the same file without agreeing on ids first.
+"""
+import collections
+import contextlib
+import datetime
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+import numpy as np
+from loguru import logger
+
+STORE_NAME = 'apm.mgx'
+MAGIC = b'MAGNAXTS'
+VERSION = 1
+HEADER_SIZE = 4096
+RECORD = np.dtype([('time', '<f8'), ('column', '<u4'), ('value', '<f4')])
+
+
+def column_id(name):
+    return zlib.crc32(name.encode('utf-8'))
+
+
+def column_name(filename):
+    """series name of a legacy log file name: cpu_app.log -> cpu_app"""
+    return filename[:-4] if filename.endswith('.log') else filename
+
+
+def store_path(directory):
+    return os.path.join(directory, STORE_NAME)
+
+
+def to_python(values):
+    """values -> python floats, a float32 column with its shortest repr (123.45, not 123.44999694824219)"""
+    if values.dtype == np.float32:
+        return values.astype(str).astype(np.float64).tolist()
+    return values.astype(np.float64).tolist()
+
+
+def format_times(times):
+    """epoch seconds -> local HH:MM:SS.ffffff, the x of every chart point"""
+    if len(times) == 0:
+        return []
+    first = datetime.datetime.fromtimestamp(times[0]).astimezone().utcoffset()
+    last = datetime.datetime.fromtimestamp(times[-1]).astimezone().utcoffset()
+    if first != last:
+        # the session crossed a DST change
+        return [datetime.datetime.fromtimestamp(t).strftime('%H:%M:%S.%f') for t in times.tolist()]
+    local = np.round((times + first.total_seconds()) * 1e6).astype('datetime64[us]')
+    return [text[11:] for text in np.datetime_as_string(local, unit='us').tolist()]
+
+
+def read_text_log(path):
+    """(times, values) of a legacy `HH:MM:SS.ffffff=value` log, parsed in one vectorized pass.
+    The lines carry no date, times are laid on an arbitrary local day and only keep the time of day."""
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = np.array(file.read().split())
+    if len(lines) == 0:
+        return np.empty(0), np.empty(0)
+    parts = np.char.partition(lines, '=')
+    clock = parts[:, 0]
+    values = parts[:, 2].astype(np.float64)
+    # HH:MM:SS[.ffffff] -> seconds of the day
+    seconds = ((np.char.add('1970-01-01T', clock).astype('datetime64[us]') - np.datetime64('1970-01-01', 'us'))
+               / np.timedelta64(1, 's'))
+    # a log that runs past midnight starts over at 00:00
+    seconds = seconds + 86400 * np.cumsum(np.diff(seconds, prepend=seconds[0]) < -43200)
+    return datetime.datetime(2000, 1, 1).timestamp() + seconds, values
+
+
+class HeaderLockTimeout(Exception):
+    """another collector process held the header lock for the whole timeout"""
+
+
+class HeaderLock(object):
+    """Cross-process lock around header writes, a lock file created with O_EXCL"""
+
+    def __init__(self, path, timeout=2, stale=10):
+        self.path = path + '.lock'
+        self.timeout = timeout
+        self.stale = stale
+        self._fd = None
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return self
+            except FileExistsError:
+                try:
+                    # a collector killed while holding the lock leaves it behind
+                    if time.time() - os.path.getmtime(self.path) > self.stale:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.time() > deadline:
+                    # writing the header without the lock would race another process's read-modify-write
+                    raise HeaderLockTimeout(f'header lock timeout: {self.path}')
+                time.sleep(0.01)
+
+    def __exit__(self, *args):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def read_header(path):
+    with open(path, 'rb') as file:
+        return parse_header(file.read(HEADER_SIZE), path)
+
+
+def parse_header(header, path):
+    if header[:8] != MAGIC:
+        raise Exception(f'{path} is not a magnax series store')
+    size = int.from_bytes(header[8:12], 'little')
+    return json.loads(header[12:12 + size].decode('utf-8'))
+
+
+def write_header(file, schema):
+    content = json.dumps(schema, separators=(',', ':')).encode('utf-8')
+    if 12 + len(content) > HEADER_SIZE:
+        raise Exception('series store header is full')
+    file.seek(0)
+    file.write((MAGIC + len(content).to_bytes(4, 'little') + content).ljust(HEADER_SIZE, b'\0'))
+
+
+def new_schema():
+    return {
+        'version': VERSION,
+        'time': 'epoch seconds',
+        'record': [[name, RECORD.fields[name][0].str] for name in RECORD.names],
+        'columns': {},
+    }
+
+
+# durability of flushed batches:
+#   os        written to the OS page cache, survives a crashed collector but not a power loss
+#   periodic  as os, plus an fsync at most every fsync_interval seconds and on close
+#   fsync     every batch is fsynced before the next one is written
+DURABILITY = ('os', 'periodic', 'fsync')
+WRITER_SETTINGS = {
+    'durability': 'periodic',
+    'flush_interval': 0.5,
+    'flush_records': 256,
+    'fsync_interval': 5,
+    'capacity': 65536,
+}
+
+
+def configure(durability=None, flush_interval=None, flush_records=None, fsync_interval=None, capacity=None):
+    """change the settings of writers created later in this process, None keeps the current value"""
+    if durability is not None and durability not in DURABILITY:
+        raise Exception(f'durability must be one of {DURABILITY}')
+    settings = dict(durability=durability, flush_interval=flush_interval, flush_records=flush_records,
+                    fsync_interval=fsync_interval, capacity=capacity)
+    WRITER_SETTINGS.update({key: value for key, value in settings.items() if value is not None})
+
+
+class SeriesWriter(object):
+    """Ring buffer of one session file drained by a background thread, samplers never wait on the disk"""
+
+    def __init__(self, path, durability=None, flush_interval=None, flush_records=None,
+                 fsync_interval=None, capacity=None):
+        self.path = path
+        self.durability = durability or WRITER_SETTINGS['durability']
+        self.flush_interval = flush_interval or WRITER_SETTINGS['flush_interval']
+        self.flush_records = flush_records or WRITER_SETTINGS['flush_records']
+        self.fsync_interval = fsync_interval or WRITER_SETTINGS['fsync_interval']
+        self.capacity = capacity or WRITER_SETTINGS['capacity']
+        self.dropped = 0
+        self._pending = collections.deque(maxlen=self.capacity)
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._columns = set()
+        self._file = None
+        self._last_fsync = time.time()
+
+    def _open(self, lock_timeout):
+        with HeaderLock(self.path, timeout=lock_timeout):
+            if not os.path.exists(self.path):
+                with open(self.path, 'wb') as file:
+                    write_header(file, new_schema())
+            self._columns = set(read_header(self.path)['columns'])
+        self._file = open(self.path, 'ab')
+
+    def _register(self, name, lock_timeout):
+        """add a column name to the header schema, ids never depend on it"""
+        with HeaderLock(self.path, timeout=lock_timeout):
+            schema = read_header(self.path)
+            if name not in schema['columns']:
+                schema['columns'][name] = column_id(name)
+                with open(self.path, 'r+b') as file:
+                    write_header(file, schema)
+        self._columns.add(name)
+
+    def append(self, name, timestamp, value):
+        with self._cond:
+            if self._closed:
+                # a sampler still held this writer while the report closed it, the sample is too late for
+                # this session and must not recreate the file or restart the thread
+                logger.debug(f'[Store] writer closed, sample ignored: {self.path} {name}')
+                return
+            if len(self._pending) == self.capacity:
+                # the disk stalled for a whole ring, the oldest samples are overwritten
+                if self.dropped == 0:
+                    logger.warning(f'[Store] writer buffer full, dropping oldest samples: {self.path}')
+                self.dropped += 1
+            self._pending.append((timestamp, name, value))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='magnax-series-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.flush_records:
+                self._cond.notify()
+
+    def _take(self):
+        batch = list(self._pending)
+        self._pending.clear()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.flush_records:
+                    self._cond.wait(self.flush_interval)
+                batch, closed = self._take(), self._closed
+            try:
+                self._write(batch)
+            except HeaderLockTimeout as e:
+                # nothing of the batch was written, keep it for the next drain (or the flush of close())
+                logger.warning(f'[Store] {e}, batch kept for the next write')
+                self._requeue(batch)
+            except Exception as e:
+                logger.error(f'[Store] write {self.path} failed: {e}')
+            if closed:
+                break
+
+    def _requeue(self, batch):
+        with self._cond:
+            pending = batch + list(self._pending)
+            # ahead of the newer samples; the ring keeps its bound by dropping the oldest
+            self.dropped += max(len(pending) - self.capacity, 0)
+            self._pending = collections.deque(pending, maxlen=self.capacity)
+
+    def flush(self):
+        """write everything buffered so far from the calling thread"""
+        with self._cond:
+            batch = self._take()
+        # longer than HeaderLock.stale: the lock of a killed collector is broken instead of losing the batch
+        self._write(batch, sync=self.durability != 'os', lock_timeout=15)
+
+    def _write(self, batch, sync=False, lock_timeout=2):
+        with self._io_lock:
+            if not batch:
+                return
+            # the report moved or cleaned the file away, start a new one
+            if self._file is not None and not os.path.exists(self.path):
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                self._open(lock_timeout)
+            records = np.empty(len(batch), dtype=RECORD)
+            for i, (timestamp, name, value) in enumerate(batch):
+                if name not in self._columns:
+                    self._register(name, lock_timeout)
+                records[i] = (timestamp, column_id(name), value)
+            self._file.write(records.tobytes())
+            self._file.flush()
+            if sync or self.durability == 'fsync' or \
+                    (self.durability == 'periodic' and time.time() - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = time.time()
+
+    def close(self):
+        """drain the buffer, stop the thread and release the file"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        try:
+            self.flush()
+        finally:
+            with self._io_lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+
+
+class SeriesReader(object):
+    """Columns of one session file as (timestamps, values) numpy arrays over a read-only mmap, nothing is copied
+    until a column is selected"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.schema = parse_header(self._mmap[:HEADER_SIZE], path)
+        # a record torn by a killed writer is ignored
+        count = max(len(self._mmap) - HEADER_SIZE, 0) // RECORD.itemsize
+        self.records = np.frombuffer(self._mmap, dtype=RECORD, count=count, offset=HEADER_SIZE)
+        self._index = None
+
+    def columns(self):
+        return list(self.schema['columns'])
+
+    def has(self, name):
+        return name in self.schema['columns']
+
+    def index(self):
+        """{column id: (offset, count)} of a compacted session, None for a session still in write order"""
+        if self._index is None and self.schema.get('sorted'):
+            columns = self.records['column']
+            if len(columns) == 0:
+                self._index = {}
+            else:
+                # sorted by column: every column starts where the id changes
+                starts = np.flatnonzero(np.concatenate(([True], columns[1:] != columns[:-1])))
+                counts = np.diff(np.append(starts, len(columns)))
+                self._index = {int(columns[start]): (int(start), int(count)) for start, count in zip(starts, counts)}
+        elif self._index is None and 'index' in self.schema:
+            # sessions compacted when the index still lived in the header
+            self._index = {column_id(name): tuple(span) for name, span in self.schema['index'].items()}
+        return self._index
+
+    def _column(self, name):
+        index = self.index()
+        if index is not None:
+            # compacted session: the column is one contiguous, time sorted slice of the map
+            offset, count = index.get(column_id(name), (0, 0))
+            return self.records[offset:offset + count]
+        records = self.records[self.records['column'] == column_id(name)]
+        # collectors flush independently, a column written by several processes can interleave
+        times = records['time']
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            records = records[np.argsort(times, kind='stable')]
+        return records
+
+    def count(self, name):
+        return len(self._column(name))
+
+    def start(self):
+        """earliest timestamp of any column, None for an empty session"""
+        if len(self.records) == 0:
+            return None
+        index = self.index()
+        if index is not None:
+            # compacted: every column slice starts with its earliest sample
+            return float(min(self.records['time'][offset] for offset, count in index.values() if count))
+        return float(self.records['time'].min())
+
+    def bounds(self, name):
+        """(first, last) timestamp of a column, None when it is empty"""
+        records = self._column(name)
+        if len(records) == 0:
+            return None
+        return float(records['time'][0]), float(records['time'][-1])
+
+    def read(self, name, start=None, end=None):
+        """(times, values) of a column, only the [start, end] epoch window when given"""
+        records = self._column(name)
+        times = records['time']
+        lo = 0 if start is None else np.searchsorted(times, start, 'left')
+        hi = len(times) if end is None else np.searchsorted(times, end, 'right')
+        window = records[lo:hi]
+        return np.array(window['time']), np.array(window['value'])
+
+    def close(self):
+        # read() hands out copies, the map can go
+        self.records = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # a view of the records is still alive somewhere, the map is released with the last of them
+            logger.debug(f'[Store] {self.path} still referenced, unmapped on release')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+
+class ReaderPool(object):
+    """
+    One shared SeriesReader per session file for the whole process. Callers lease a reader for the
+    duration of a read, a map is closed only after its last lease ends: when the file changed on disk,
+    or when the scene is released before it is renamed or removed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # path -> [stamp, reader, leases, retired]
+        self._entries = {}
+
+    @contextlib.contextmanager
+    def open(self, path):
+        """lease the reader of a session file, None when the file is missing"""
+        entry = self._acquire(path)
+        try:
+            yield entry[1] if entry else None
+        finally:
+            if entry:
+                self._release(entry)
+
+    def _acquire(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] != stamp:
+                self._retire(path)
+                entry = None
+            if entry is None:
+                entry = self._entries[path] = [stamp, SeriesReader(path), 0, False]
+            entry[2] += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry[2] -= 1
+            if entry[3] and entry[2] == 0:
+                entry[1].close()
+
+    def _retire(self, path):
+        entry = self._entries.pop(path)
+        entry[3] = True
+        if entry[2] == 0:
+            entry[1].close()
+
+    def release(self, directory=None):
+        """unmap the session file (of one directory) once nobody reads it, it can't be renamed or removed on
+        Windows while mapped"""
+        with self._lock:
+            for path in [path for path in self._entries if directory is None or path == store_path(directory)]:
+                self._retire(path)
+
+
+readers = ReaderPool()
+
+
+def compact(directory):
+    """
+    rewrite a finished session sorted by (column, time), a column is then one contiguous slice and a time
+    window a binary search inside it. The header only flags the order, readers derive the column index
+    from the records, so it never competes with the schema for the fixed header space
+    """
+    path = store_path(directory)
+    if not os.path.exists(path):
+        return None
+    with SeriesReader(path) as reader:
+        schema = reader.schema
+        if schema.get('sorted') or 'index' in schema:
+            return path
+        records = reader.records[np.lexsort((reader.records['time'], reader.records['column']))]
+    schema['sorted'] = True
+    with open(path + '.tmp', 'wb') as file:
+        write_header(file, schema)
+        file.write(records.tobytes())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+# pre-aggregated tiers written next to a finished session, bucket width in seconds
+ROLLUP_TIERS = (1, 10, 60)
+# one bucket of one column; min/max keep the time of the sample they come from, so the extremes
+# of a tier are real points a chart can run LTTB on
+ROLLUP = np.dtype([('column', '<u4'), ('time', '<f8'), ('count', '<u4'), ('min', '<f4'), ('max', '<f4'),
+                   ('mean', '<f4'), ('p95', '<f4'), ('min_time', '<f8'), ('max_time', '<f8')])
+
+
+def rollup_path(directory, seconds):
+    return os.path.join(directory, f'rollup_{seconds}s.npy')
+
+
+def rollup(records, seconds):
+    """aggregate store records into `seconds` buckets, sorted by (column, time)"""
+    if len(records) == 0:
+        return np.empty(0, dtype=ROLLUP)
+    bucket = np.floor(records['time'] / seconds)
+    # within a bucket the samples are ordered by value: first is the min, last the max
+    order = np.lexsort((records['value'], bucket, records['column']))
+    column, bucket = records['column'][order], bucket[order]
+    times, values = records['time'][order], records['value'][order].astype(np.float64)
+    change = np.empty(len(order), dtype=bool)
+    change[0] = True
+    change[1:] = (column[1:] != column[:-1]) | (bucket[1:] != bucket[:-1])
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, len(order)))
+    ends = starts + counts - 1
+    result = np.empty(len(starts), dtype=ROLLUP)
+    result['column'] = column[starts]
+    result['time'] = bucket[starts] * seconds
+    result['count'] = counts
+    result['min'], result['min_time'] = values[starts], times[starts]
+    result['max'], result['max_time'] = values[ends], times[ends]
+    result['mean'] = np.add.reduceat(values, starts) / counts
+    # linear interpolation between the closest ranks, as np.percentile does
+    rank = starts + 0.95 * (counts - 1)
+    lower = np.floor(rank).astype(np.int64)
+    upper = np.ceil(rank).astype(np.int64)
+    result['p95'] = values[lower] + (values[upper] - values[lower]) * (rank - lower)
+    return result
+
+
+def build_rollups(directory):
+    """write every rollup tier of the session in directory, returns the written paths"""
+    path = store_path(directory)
+    if not os.path.exists(path):
+        return []
+    paths = []
+    with SeriesReader(path) as reader:
+        for seconds in ROLLUP_TIERS:
+            # np.save writes into a temp name first, a reader never maps half a tier
+            target = rollup_path(directory, seconds)
+            with open(target + '.tmp', 'wb') as file:
+                np.save(file, rollup(reader.records, seconds))
+            os.replace(target + '.tmp', target)
+            paths.append(target)
+    return paths
+
+
+def load_rollup(directory, seconds):
+    """memory-mapped tier, None when the session has no rollups"""
+    path = rollup_path(directory, seconds)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+def rollup_column(tier, name):
+    """buckets of one column, the tier is sorted by column so this is a binary search"""
+    cid = column_id(name)
+    columns = tier['column']
+    return tier[np.searchsorted(columns, cid, 'left'):np.searchsorted(columns, cid, 'right')]
+
+
+def extreme_points(buckets):
+    """(times, values) of the min and max sample of every bucket in time order, the LTTB input of a tier"""
+    times = np.concatenate([buckets['min_time'], buckets['max_time']])
+    values = np.concatenate([buckets['min'], buckets['max']])
+    times, keep = np.unique(times, return_index=True)
+    return times, values[keep]
+
+
+def series_stats(values):
+    """count/sum/mean/min/max/p50/p90/p99/stddev/last of a series in one numpy sweep, None when it is empty"""
+    if len(values) == 0:
+        return None
+    series = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(series, [50, 90, 99]).tolist()
+    # min/max are recorded samples, report them as they were written
+    low, high = to_python(np.array([values.min(), values.max()], dtype=values.dtype))
+    return {
+        'count': len(series),
+        'sum': float(series.sum()),
+        'mean': float(series.mean()),
+        'min': low,
+        'max': high,
+        'p50': p50,
+        'p90': p90,
+        'p99': p99,
+        'stddev': float(series.std()),
+        'last': to_python(values[-1:])[0]
+    }
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+_writers_pid = None
+
+
+def get_writer(directory):
+    """the asynchronous writer of this process for a session directory"""
+    global _writers, _writers_pid
+    path = store_path(directory)
+    with _writers_lock:
+        if _writers_pid != os.getpid():
+            # first use in this process, a forked collector must not share the parent's buffer and file handle
+            _writers, _writers_pid = {}, os.getpid()
+            _register_exit()
+        session = _writers.get(path)
+        if session is None:
+            session = _writers[path] = SeriesWriter(path)
+        return session
+
+
+def close_writers(directory=None):
+    """flush and close writers (of one directory), before the report moves or removes the file"""
+    with _writers_lock:
+        paths = [path for path in _writers if directory is None or path == store_path(directory)]
+        sessions = [_writers.pop(path) for path in paths]
+    for session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            logger.error(f'[Store] close {session.path} failed: {e}')
+
+
+def _register_exit():
+    import atexit
+    from multiprocessing import util
+    atexit.register(close_writers)
+    # pool workers leave through os._exit, only multiprocessing finalizers run there
+    util.Finalize(None, close_writers, exitpriority=10)
@@ -3,13 +3,15 @@ import shutil
 import time
 import requests
 import json
-from flask import request, make_response
+from flask import request, make_response, Response
 from loguru import logger
 from flask import Blueprint
 from magnax import __version__
 from magnax.public.apm import (CPU, Memory, Network, FPS, Battery, GPU, Energy, Disk,ThermalSensor, Target)
 from magnax.public.apm_pk import (CPU_PK, MEM_PK, Flow_PK, FPS_PK)
+from magnax.public.cache import scene_cache
 from magnax.public.common import (Devices, File, Method, Install, Platform, Scrcpy)
+from magnax.public.scheduler import scheduler, METRIC_DEFAULTS
 
 d = Devices()
 f = File()
@@ -219,9 +221,8 @@ def getCpuRate():
                 deviceId = d.getIdbyDevice(device, platform)
                 if process and platform == Platform.Android :
                     pid = process.split(':')[0]
-                cpu = CPU(pkgName=pkgname, deviceId=deviceId, platform=platform, pid=pid)
-                appCpuRate, systemCpuRate = cpu.getCpuRate()
-                result = {'status': 1, 'appCpuRate': appCpuRate, 'systemCpuRate': systemCpuRate}
+                data = scheduler.read(platform, deviceId, pkgname, 'cpu', pid=pid)
+                result = {'status': 1, 'appCpuRate': data['appCpuRate'], 'systemCpuRate': data['systemCpuRate']}
     except Exception as e:
         logger.error('get cpu failed')
         logger.exception(e)
@@ -242,9 +243,10 @@ def getCoreCpuRate():
         deviceId = d.getIdbyDevice(device, platform)
         if process and platform == Platform.Android :
             pid = process.split(':')[0]
-        corecpu = CPU(pkgName=pkgname, deviceId=deviceId, platform=platform, pid=pid)
-        coreCpuRate = corecpu.getCoreCpuRate(cores)
-        result = {'status': 1, 'coreCpuRate': coreCpuRate}
+        corecpu = CPU(pkgName=pkgname, deviceId=deviceId, platform=platform, pid=pid, consumer='api')
+        stats = corecpu.getCoreCpuStats(cores)
+        result = {'status': 1, 'coreCpuRate': stats['rate'], 'coreCpuUsage': stats['usage'],
+                  'coreCpuSystem': stats['system'], 'coreCpuIowait': stats['iowait']}
     except Exception as e:
         logger.error('get core cpu failed')
         logger.exception(e)
@@ -285,9 +287,8 @@ def getMemory():
                 deviceId = d.getIdbyDevice(device, platform)
                 if process and platform == Platform.Android :
                     pid = process.split(':')[0]
-                mem = Memory(pkgName=pkgname, deviceId=deviceId, platform=platform, pid=pid)
-                totalPass, swapPass = mem.getProcessMemory()
-                result = {'status': 1, 'totalPass': totalPass, 'swapPass': swapPass}
+                data = scheduler.read(platform, deviceId, pkgname, 'mem', pid=pid)
+                result = {'status': 1, 'totalPass': data['totalPass'], 'swapPass': data['swapPass']}
     except Exception as e:
         logger.error('get memory data failed')
         logger.exception(e)
@@ -369,9 +370,8 @@ def getNetWorkData():
                 deviceId = d.getIdbyDevice(device, platform)
                 if process and platform == Platform.Android :
                     pid = process.split(':')[0]
-                network = Network(pkgName=pkgname, deviceId=deviceId, platform=platform, pid=pid)
-                data = network.getNetWorkData(wifi=wifi,noLog=False)
-                result = {'status': 1, 'upflow': data[0], 'downflow': data[1]}
+                data = scheduler.read(platform, deviceId, pkgname, 'network', pid=pid, wifi=wifi)
+                result = {'status': 1, 'upflow': data['upflow'], 'downflow': data['downflow']}
     except Exception as e:
         logger.error('get network data failed')
         logger.exception(e)
@@ -406,33 +406,83 @@ def getFps():
                 result = {'status': 1, 'first': first, 'second': second}
             case _:
                 deviceId = d.getIdbyDevice(device, platform)
-                fps_monitor = FPS.getObject(pkgName=pkgname, deviceId=deviceId, surfaceview=surfaceview, platform=platform)
-                fps, jank = fps_monitor.getFPS()
-                result = {'status': 1, 'fps': fps, 'jank': jank}
+                data = scheduler.read(platform, deviceId, pkgname, 'fps', surfaceview=surfaceview)
+                result = {'status': 1, 'fps': data['fps'], 'jank': data['jank']}
     except Exception as e:
         logger.error('get fps failed')
         logger.exception(e)
         result = {'status': 1, 'fps': 0, 'jank': 0, 'first': 0, 'second': 0}
     return result
 
+@api.route('/apm/stream', methods=['get'])
+def streamMetrics():
+    """push one frame with every metric of the session per tick (Server-Sent Events)"""
+    platform = method._request(request, 'platform')
+    pkgname = method._request(request, 'pkgname')
+    device = method._request(request, 'device')
+    process = request.args.get('process')
+    metrics = request.args.get('metrics', 'cpu,mem,network,fps,gpu,battery')
+    wifi_switch = request.args.get('wifi_switch')
+    surv = request.args.get('surv')
+    try:
+        deviceId = d.getIdbyDevice(device, platform)
+        pid = None
+        if process and platform == Platform.Android :
+            pid = process.split(':')[0]
+        wifi = False if wifi_switch == 'false' else True
+        surfaceview = False if surv == 'false' else True
+        subscriber = None
+        # the session can stop (idle, device gone) between lookup and subscribe, take the next one then
+        for _ in range(3):
+            session = scheduler.session(platform, deviceId, pkgname)
+            for metric in metrics.split(','):
+                if metric.strip() in METRIC_DEFAULTS:
+                    session.enable(metric.strip(), pid=pid, wifi=wifi, surfaceview=surfaceview)
+            subscriber = session.subscribe()
+            if subscriber is not None:
+                break
+        if subscriber is None:
+            raise Exception('sampling session stopped')
+    except Exception as e:
+        logger.exception(e)
+        return {'status': 0, 'msg': str(e)}
+
+    def generate():
+        try:
+            while True:
+                frame = subscriber.get(timeout=15)
+                if frame is None:
+                    if subscriber.closed:
+                        break
+                    # comment line, keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                yield 'data: {}\n\n'.format(json.dumps(frame))
+        finally:
+            session.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @api.route('/apm/battery', methods=['post', 'get'])
 def getBattery():
     """get Battery data"""
     platform = method._request(request, 'platform')
+    # the dashboard asks device-wide, without a package: join whatever session runs on the device
+    pkgname = request.values.get('pkgname')
     device = method._request(request, 'device')
     try:
         deviceId = d.getIdbyDevice(device, platform)
-        battery_monitor = Battery(deviceId=deviceId, platform=platform)
-        final = battery_monitor.getBattery()
+        data = scheduler.read(platform, deviceId, pkgname, 'battery')
         if platform == Platform.Android:
-            result = {'status': 1, 'level': final[0], 'temperature': final[1]}
+            result = {'status': 1, 'level': data['level'], 'temperature': data['temperature']}
         else:
             result = {
                 'status': 1,
-                'temperature': final[0],
-                'current': final[1],
-                'voltage': final[2],
-                'power': final[3]}
+                'temperature': data['temperature'],
+                'current': data['current'],
+                'voltage': data['voltage'],
+                'power': data['power']}
     except Exception as e:
         logger.exception(e)
         result = {'status': 1, 'level': 0, 'temperature': 0, 'current':0, 'voltage':0 , 'power':0}
@@ -446,9 +496,8 @@ def getGpu():
     platform = method._request(request, 'platform')
     try:
         deviceId = d.getIdbyDevice(device, platform)
-        gpu = GPU(pkgName=pkgname, deviceId=deviceId, platform=platform)
-        value = gpu.getGPU()
-        result = {'status': 1, 'gpu': value}
+        data = scheduler.read(platform, deviceId, pkgname, 'gpu')
+        result = {'status': 1, 'gpu': data['gpu']}
     except Exception as e:
         logger.exception(e)
         result = {'status': 1, 'gpu': 0}
@@ -540,6 +589,8 @@ def makeReport():
     process = method._request(request, 'process')
     cores = method._request(request, 'cores')
     try:
+        # sessions would keep appending to the logs the report is about to move
+        scheduler.stop(timeout=10)
         video = 0
         if platform == Platform.Android and model == 'normal':
             deviceId = d.getIdbyDevice(devices, platform)
@@ -595,6 +646,7 @@ def editReport():
     else:
         try:
             new_scene = new_scene.replace('/', '_').replace(' ', '').replace('&', '_')
+            f.releaseSeries(old_scene)
             os.rename(os.path.join(report_dir, old_scene), os.path.join(report_dir, new_scene))
             result = {'status': 1}
         except Exception as e:
@@ -629,11 +681,12 @@ def exportAndroidHtml():
     net_recv = method._request(request, 'net_recv')
     gpu = method._request(request, 'gpu')
     try:
+        info = f.sceneSummary(scene).info
         summary_dict = dict()
-        summary_dict['app'] = f.readJson(scene).get('app')
-        summary_dict['platform'] = f.readJson(scene).get('platform')
-        summary_dict['devices'] = f.readJson(scene).get('devices')
-        summary_dict['ctime'] = f.readJson(scene).get('ctime')
+        summary_dict['app'] = info.get('app')
+        summary_dict['platform'] = info.get('platform')
+        summary_dict['devices'] = info.get('devices')
+        summary_dict['ctime'] = info.get('ctime')
         summary_dict['cpu_app'] = cpu_app
         summary_dict['cpu_sys'] = cpu_sys
         summary_dict['mem_total'] = mem_total
@@ -645,14 +698,7 @@ def exportAndroidHtml():
         summary_dict['net_send'] = net_send
         summary_dict['net_recv'] = net_recv
         summary_dict['gpu'] = gpu
-        summary_dict['cpu_charts'] = f.getCpuLog(Platform.Android, scene)
-        summary_dict['mem_charts'] = f.getMemLog(Platform.Android, scene)
-        summary_dict['mem_detail_charts'] = f.getMemDetailLog(Platform.Android, scene)
-        summary_dict['net_charts'] = f.getFlowLog(Platform.Android, scene)
-        summary_dict['battery_charts'] = f.getBatteryLog(Platform.Android, scene)
-        summary_dict['fps_charts'] = f.getFpsLog(Platform.Android, scene)['fps']
-        summary_dict['jank_charts'] = f.getFpsLog(Platform.Android, scene)['jank']
-        summary_dict['gpu_charts'] = f.getGpuLog(Platform.Android, scene)
+        summary_dict.update(f.reportCharts(Platform.Android, scene))
         path = f.make_android_html(scene, summary_dict)
         result = {'status': 1, 'msg':'success', 'path':path}
     except Exception as e:
@@ -675,11 +721,12 @@ def exportiOSHtml():
     net_send = method._request(request, 'net_send')
     net_recv = method._request(request, 'net_recv')
     try:
+        info = f.sceneSummary(scene).info
         summary_dict = dict()
-        summary_dict['app'] = f.readJson(scene).get('app')
-        summary_dict['platform'] = f.readJson(scene).get('platform')
-        summary_dict['devices'] = f.readJson(scene).get('devices')
-        summary_dict['ctime'] = f.readJson(scene).get('ctime')
+        summary_dict['app'] = info.get('app')
+        summary_dict['platform'] = info.get('platform')
+        summary_dict['devices'] = info.get('devices')
+        summary_dict['ctime'] = info.get('ctime')
         summary_dict['cpu_app'] = cpu_app
         summary_dict['cpu_sys'] = cpu_sys
         summary_dict['mem_total'] = mem_total
@@ -691,12 +738,7 @@ def exportiOSHtml():
         summary_dict['power'] = power
         summary_dict['net_send'] = net_send
         summary_dict['net_recv'] = net_recv
-        summary_dict['cpu_charts'] = f.getCpuLog(Platform.iOS, scene)
-        summary_dict['mem_charts'] = f.getMemLog(Platform.iOS, scene)
-        summary_dict['net_charts'] = f.getFlowLog(Platform.iOS, scene)
-        summary_dict['battery_charts'] = f.getBatteryLog(Platform.iOS, scene)
-        summary_dict['fps_charts'] = f.getFpsLog(Platform.iOS, scene)
-        summary_dict['gpu_charts'] = f.getGpuLog(Platform.iOS, scene)
+        summary_dict.update(f.reportCharts(Platform.iOS, scene))
         path = f.make_ios_html(scene, summary_dict)
         result = {'status': 1, 'msg':'success', 'path':path}
     except Exception as e:
@@ -706,25 +748,44 @@ def exportiOSHtml():
 
 @api.route('/apm/log', methods=['post', 'get'])
 def getLogData():
-    """Get apm detailed data with optional downsampling"""
+    """
+    Get apm detailed data with optional downsampling
+    target=cpu: one chart, metrics=cpu,mem: several charts, manifest=1: which charts have data
+    """
     scene = method._request(request, 'scene')
-    target = method._request(request, 'target')
     platform = method._request(request, 'platform')
+    target = request.values.get('target')
+    metrics = request.values.get('metrics')
     # 获取采样参数，默认 1000 点（可选：0 表示不采样）
-    max_points = request.args.get('max_points', 1000, type=int)
-    try:
-        fucDic = {
-            'cpu': f.getCpuLog(platform, scene, max_points=max_points),
-            'mem': f.getMemLog(platform, scene, max_points=max_points),
-            'mem_detail': f.getMemDetailLog(platform, scene, max_points=max_points),
-            'battery': f.getBatteryLog(platform, scene, max_points=max_points),
-            'flow': f.getFlowLog(platform, scene, max_points=max_points),
-            'fps': f.getFpsLog(platform, scene, max_points=max_points),
-            'gpu': f.getGpuLog(platform, scene, max_points=max_points),
-            'disk': f.getDiskLog(platform, scene, max_points=max_points),
-            'cpu_core': f.getCpuCoreLog(platform, scene, max_points=max_points)
-        }
-        result = fucDic[target]
+    max_points = request.values.get('max_points', 1000, type=int)
+    # 可选时间窗口：@epoch 秒、相对场景开始的秒数或 HH:MM:SS
+    start = request.values.get('start')
+    end = request.values.get('end')
+    # 只计算请求的图表
+    fucDic = {
+        'cpu': f.getCpuLog,
+        'mem': f.getMemLog,
+        'mem_detail': f.getMemDetailLog,
+        'battery': f.getBatteryLog,
+        'flow': f.getFlowLog,
+        'fps': f.getFpsLog,
+        'gpu': f.getGpuLog,
+        'disk': f.getDiskLog,
+        'cpu_core': f.getCpuCoreLog
+    }
+    try:
+        if request.values.get('manifest'):
+            result = f.getLogManifest(platform, scene)
+        elif metrics:
+            result = {'status': 1, 'metrics': {}}
+            for metric in metrics.split(','):
+                if metric not in fucDic:
+                    raise Exception('{} is undefined'.format(metric))
+                result['metrics'][metric] = fucDic[metric](platform, scene, max_points=max_points, start=start, end=end)
+        elif target in fucDic:
+            result = fucDic[target](platform, scene, max_points=max_points, start=start, end=end)
+        else:
+            result = {'status': 0, 'msg': 'no target found'}
     except Exception as e:
         logger.exception(e)
         result = {'status': 0, 'msg': str(e)}
@@ -738,23 +799,26 @@ def getLogCompareData():
     target = method._request(request, 'target')
     platform = method._request(request, 'platform')
     # 获取采样参数，默认 1000 点
-    max_points = request.args.get('max_points', 1000, type=int)
+    max_points = request.values.get('max_points', 1000, type=int)
+    # 可选时间窗口：@epoch 秒、相对场景开始的秒数或 HH:MM:SS
+    start = request.values.get('start')
+    end = request.values.get('end')
     try:
         match(target):
             case Target.CPU:
-                result = f.getCpuLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getCpuLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case Target.Memory:
-                result = f.getMemLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getMemLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case Target.Battery:
-                result = f.getBatteryLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getBatteryLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case Target.FPS:
-                result = f.getFpsLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getFpsLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case Target.GPU:
-                result = f.getGpuLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getGpuLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case 'net_send':
-                result = f.getFlowSendLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getFlowSendLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case 'net_recv':
-                result = f.getFlowRecvLogCompare(platform, scene1, scene2, max_points=max_points)
+                result = f.getFlowRecvLogCompare(platform, scene1, scene2, max_points=max_points, start=start, end=end)
             case _:
                 result = {'status': 0, 'msg': 'no target found'}
     except Exception as e:
@@ -769,10 +833,13 @@ def getpkLogData():
     target1 = method._request(request, 'target1')
     target2 = method._request(request, 'target2')
     # 获取采样参数，默认 1000 点
-    max_points = request.args.get('max_points', 1000, type=int)
+    max_points = request.values.get('max_points', 1000, type=int)
+    # 可选时间窗口：@epoch 秒、相对场景开始的秒数或 HH:MM:SS
+    start = request.values.get('start')
+    end = request.values.get('end')
     try:
-        first_data, _, first_total = f.readLog(scene=scene, filename=f'{target1}.log', max_points=max_points)
-        second_data, _, second_total = f.readLog(scene=scene, filename=f'{target2}.log', max_points=max_points)
+        first_data, _, first_total = f.readLog(scene=scene, filename=f'{target1}.log', max_points=max_points, start=start, end=end)
+        second_data, _, second_total = f.readLog(scene=scene, filename=f'{target2}.log', max_points=max_points, start=start, end=end)
         result = {
             'status': 1,
             'first': first_data,
@@ -788,12 +855,25 @@ def getpkLogData():
         result = {'status': 0, 'msg': str(e)}
     return result
 
+@api.route('/apm/cache', methods=['post', 'get'])
+def cacheStats():
+    """Scene cache usage and eviction statistics, clear=1 empties it"""
+    try:
+        if request.args.get('clear'):
+            scene_cache.clear()
+        result = {'status': 1, 'cache': scene_cache.stats()}
+    except Exception as e:
+        logger.exception(e)
+        result = {'status': 0, 'msg': str(e)}
+    return result
+
 @api.route('/apm/remove/report', methods=['post', 'get'])
 def removeReport():
     """Remove test report record"""
     scene = method._request(request, 'scene')
     report_dir = os.path.join(os.getcwd(), 'report')
     try:
+        f.releaseSeries(scene)
         shutil.rmtree(f'{report_dir}/{scene}', True)
         result = {'status': 1}
     except Exception as e:
@@ -811,7 +891,7 @@ def apmCollect():
     try:
         match(target):
             case Target.CPU:
-                cpu = CPU(pkgName=pkgname, deviceId=deviceid, platform=platform)
+                cpu = CPU(pkgName=pkgname, deviceId=deviceid, platform=platform, consumer='api')
                 appCpuRate, systemCpuRate = cpu.getCpuRate(noLog=True)
                 result = {'status': 1, 'appCpuRate': appCpuRate, 'systemCpuRate': systemCpuRate}
             case Target.Memory:
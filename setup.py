@@ -43,6 +43,7 @@ setuptools.setup(
         'pyfiglet',
         'psutil',
         'opencv-python',
+        'numpy',
         'pymobiledevice3>=2.0.0',
     ],
     entry_points={